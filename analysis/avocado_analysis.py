@@ -1,31 +1,49 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
+import io
 import json
+import multiprocessing as mp
 import os
+import pickle
+import resource
 import sqlite3
+import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Iterator
 
+import numpy as np
 import pandas as pd
 
+import avocado_cli
+from avocado_sqlite import SqlFilter, bulk_load_sqlite, sql_clean_category_stats
+from avocado_streaming import IncrementalStats, stream_clean_stats
+
 BASE_DIR = Path(__file__).resolve().parent
 CSV_PATH = BASE_DIR / "avocado.csv"
 JSON_PATH = BASE_DIR / "avocado.json"
 DB_PATH = BASE_DIR / "avocado.sqlite"
+PARQUET_PATH = BASE_DIR / "avocado.parquet"
 TABLE_NAME = "avocado"
 CHART_PATH = BASE_DIR / "avg_price_by_type.png"
 STATS_PATH = BASE_DIR / "category_numeric_stats.csv"
 CONCLUSIONS_PATH = BASE_DIR / "conclusions.md"
 CACHE_DIR = BASE_DIR / ".cache"
-
-# Keep matplotlib cache within the workspace to avoid permission issues.
-CACHE_DIR.mkdir(exist_ok=True)
-os.environ.setdefault("MPLCONFIGDIR", str(CACHE_DIR))
-os.environ.setdefault("XDG_CACHE_HOME", str(CACHE_DIR))
-
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+STAGE_CACHE_PATH = CACHE_DIR / "stages.json"
+APPEND_STATE_PATH = CACHE_DIR / "append_state.pkl"
+CATEGORY_COLUMNS = ["type", "region"]
+STREAM_CHUNK_ROWS = 200_000
+# Bumped when a stage starts producing different output for the same input, so stale cache entries miss.
+STAGE_CACHE_VERSION = 1
+# Arguments that change what the stats stage computes, hashed into its cache key with the input file.
+STAGE_ARGS = ("pipeline", "json", "sqlite", "chunksize", "bounds", "types", "regions", "date_from", "date_to")
+# Appended rows are filtered with the fences of the last full build; past this share of new rows, rebuild.
+APPEND_REBUILD_SHARE = 0.25
+# Bumped when the pickled append state changes shape (including the classes it holds), so old files rebuild.
+APPEND_STATE_VERSION = 2
 
 
 def convert_csv_to_json(csv_path: Path, json_path: Path) -> pd.DataFrame:
@@ -49,18 +67,183 @@ def fetch_from_sqlite(db_path: Path, table_name: str) -> pd.DataFrame:
         return pd.read_sql_query(query, conn)
 
 
-def remove_outliers_iqr(df: pd.DataFrame, numeric_cols: list[str]) -> pd.DataFrame:
-    filtered = df.copy()
+def _typed_csv_options() -> dict[str, Any]:
+    # The unnamed first column is the row number of the original export; it is never parsed.
+    return {
+        "usecols": lambda col: col != "Unnamed: 0",
+        "dtype": {col: "category" for col in CATEGORY_COLUMNS},
+        "parse_dates": ["Date"],
+    }
+
+
+def read_csv_typed(csv_path: Path) -> pd.DataFrame:
+    return pd.read_csv(csv_path, **_typed_csv_options())
+
+
+def iter_csv_chunks(csv_path: Path, chunksize: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    with pd.read_csv(csv_path, chunksize=chunksize, **_typed_csv_options()) as reader:
+        yield from reader
+
 
-    for col in numeric_cols:
-        q1 = filtered[col].quantile(0.25)
-        q3 = filtered[col].quantile(0.75)
+def load_columnar(csv_path: Path, parquet_path: Path, refresh: bool = False) -> pd.DataFrame:
+    """Typed frame parsed from the CSV once and kept as Parquet until the CSV changes."""
+    if not refresh and parquet_path.exists() and parquet_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        return pd.read_parquet(parquet_path)
+
+    df = read_csv_typed(csv_path)
+    df.to_parquet(parquet_path, index=False)
+    return df
+
+
+def _with_text_dates(df: pd.DataFrame) -> pd.DataFrame:
+    # Side outputs keep the plain YYYY-MM-DD dates of the source, like the legacy JSON and SQLite table.
+    return df.assign(Date=df["Date"].dt.strftime("%Y-%m-%d"))
+
+
+def write_json(df: pd.DataFrame, json_path: Path) -> None:
+    _with_text_dates(df).to_json(json_path, orient="records", force_ascii=False)
+
+
+def file_sha256(path: Path, size: int | None = None) -> str:
+    """Hex digest of the file, or of its first `size` bytes."""
+    digest = hashlib.sha256()
+    remaining = path.stat().st_size if size is None else size
+    with path.open("rb") as handle:
+        while remaining > 0:
+            block = handle.read(min(remaining, 2**20))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def read_appended_rows(csv_path: Path, offset: int) -> pd.DataFrame:
+    """Typed rows written after byte `offset` of the CSV, parsed under the file's header line."""
+    with csv_path.open("rb") as handle:
+        header = handle.readline()
+        handle.seek(offset)
+        tail = handle.read()
+    return pd.read_csv(io.BytesIO(header + tail), **_typed_csv_options())
+
+
+class StageCache:
+    """Skips a stage whose parameters (input hashes included) and output files are as it last left them.
+
+    The manifest maps each stage name to the hash of its parameters, the size and mtime of every output
+    and whatever small JSON result the stage returned. `manifest_path=None` disables caching; `force`
+    reruns every stage but still records it.
+    """
+
+    def __init__(self, manifest_path: Path | None, force: bool = False) -> None:
+        self.manifest_path = manifest_path
+        self.force = force
+        self.entries: dict[str, dict[str, Any]] = {}
+        if manifest_path is not None and manifest_path.exists():
+            self.entries = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+    @staticmethod
+    def key(params: dict[str, Any]) -> str:
+        encoded = json.dumps({"version": STAGE_CACHE_VERSION, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _fingerprints(outputs: list[Path]) -> dict[str, list[int] | None]:
+        fingerprints: dict[str, list[int] | None] = {}
+        for path in outputs:
+            stat = path.stat() if path.exists() else None
+            fingerprints[str(path)] = [stat.st_size, stat.st_mtime_ns] if stat else None
+        return fingerprints
+
+    def fresh(self, name: str, params: dict[str, Any], outputs: list[Path]) -> bool:
+        entry = self.entries.get(name)
+        if self.manifest_path is None or self.force or entry is None:
+            return False
+        fingerprints = self._fingerprints(outputs)
+        return (
+            entry["key"] == self.key(params)
+            and None not in fingerprints.values()
+            and entry["outputs"] == fingerprints
+        )
+
+    def result(self, name: str) -> Any:
+        return self.entries[name]["result"]
+
+    def record(self, name: str, params: dict[str, Any], outputs: list[Path], result: Any = None) -> None:
+        if self.manifest_path is None:
+            return
+        self.entries[name] = {"key": self.key(params), "outputs": self._fingerprints(outputs), "result": result}
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+@contextmanager
+def measure_stage(stages: list[dict[str, Any]], pipeline: str, name: str) -> Iterator[None]:
+    """Record wall time and the process peak RSS after the stage.
+
+    The peak only ever grows, so `rss_growth_mb` is how far this stage pushed it; compare pipelines in
+    separate processes (see `compare_pipelines`) or the first one sets the high-water mark for all.
+    """
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    yield
+    rss_after = peak_rss_mb()
+    stages.append(
+        {
+            "pipeline": pipeline,
+            "stage": name,
+            "seconds": round(time.perf_counter() - started, 3),
+            "peak_rss_mb": round(rss_after, 1),
+            "rss_growth_mb": round(rss_after - rss_before, 1),
+        }
+    )
+
+
+def iqr_bounds(values: np.ndarray, numeric_cols: list[str]) -> dict[str, tuple[float, float]]:
+    """1.5 * IQR fences of every column of a float matrix, from one vectorized quantile call."""
+    q1, q3 = np.nanquantile(values, [0.25, 0.75], axis=0)
+    iqr = q3 - q1
+    return dict(zip(numeric_cols, zip(q1 - 1.5 * iqr, q3 + 1.5 * iqr)))
+
+
+def _sequential_fences(values: np.ndarray, numeric_cols: list[str]) -> dict[str, tuple[float, float]]:
+    fences = {}
+    mask = np.ones(len(values), dtype=bool)
+    for col, column in zip(numeric_cols, values.T):
+        kept = column[mask]
+        q1, q3 = np.nanquantile(kept, [0.25, 0.75]) if len(kept) else (np.nan, np.nan)
         iqr = q3 - q1
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        filtered = filtered[filtered[col].between(lower_bound, upper_bound)]
+        fences[col] = (q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+        mask &= (column >= fences[col][0]) & (column <= fences[col][1])
+    return fences
+
 
-    return filtered
+def iqr_fences(df: pd.DataFrame, numeric_cols: list[str], sequential: bool = True) -> dict[str, tuple[float, float]]:
+    """The (lower, upper) fences `iqr_outlier_mask` filters with, per column."""
+    values = df[numeric_cols].to_numpy(dtype=float)
+    return _sequential_fences(values, numeric_cols) if sequential else iqr_bounds(values, numeric_cols)
+
+
+def iqr_outlier_mask(df: pd.DataFrame, numeric_cols: list[str], sequential: bool = True) -> np.ndarray:
+    """Rows inside the 1.5 * IQR fences of every column, computed on one float matrix without copying rows.
+
+    sequential=True takes each column's quartiles over the rows kept by the columns before it, as the
+    column-by-column filter always did; False takes all quartiles at once in a single vectorized pass.
+    """
+    values = df[numeric_cols].to_numpy(dtype=float)
+    fences = _sequential_fences(values, numeric_cols) if sequential else iqr_bounds(values, numeric_cols)
+    lower, upper = np.array(list(fences.values()), dtype=float).reshape(-1, 2).T
+    return ((values >= lower) & (values <= upper)).all(axis=1)
+
+
+def remove_outliers_iqr(df: pd.DataFrame, numeric_cols: list[str], sequential: bool = True) -> pd.DataFrame:
+    return df[iqr_outlier_mask(df, numeric_cols, sequential)]
 
 
 def clean_data(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, int]]:
@@ -92,25 +275,39 @@ def clean_data(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, int]]:
     return work, report
 
 
-def compute_category_stats(df: pd.DataFrame, category_col: str = "type") -> pd.DataFrame:
-    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
+def compute_category_stats(df: pd.DataFrame, category_col: str | list[str] = "type") -> pd.DataFrame:
+    keys = [category_col] if isinstance(category_col, str) else list(category_col)
+    numeric_cols = [col for col in df.select_dtypes(include=["number"]).columns if col not in keys]
     agg_spec = {col: ["count", "mean", "median", "min", "max", "std"] for col in numeric_cols}
-    stats = df.groupby(category_col).agg(agg_spec)
+    stats = df.groupby(keys, observed=True).agg(agg_spec)
 
     # Flatten MultiIndex columns for convenient export
     stats.columns = [f"{col}_{metric}" for col, metric in stats.columns]
     return stats.reset_index()
 
 
-def plot_category_chart(df: pd.DataFrame, chart_path: Path) -> None:
-    avg_price = (
-        df.groupby("type", as_index=False)["AveragePrice"]
-        .mean()
-        .sort_values("AveragePrice", ascending=False)
-    )
+def _pyplot() -> Any:
+    """matplotlib.pyplot on the Agg backend, imported on first use: it doubles the import time of this module."""
+    # Keep matplotlib cache within the workspace to avoid permission issues.
+    CACHE_DIR.mkdir(exist_ok=True)
+    os.environ.setdefault("MPLCONFIGDIR", str(CACHE_DIR))
+    os.environ.setdefault("XDG_CACHE_HOME", str(CACHE_DIR))
+
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def plot_category_chart(stats: pd.DataFrame, chart_path: Path) -> None:
+    # Drawn from the category stats so the streaming pipeline, which never holds the rows, gets it too.
+    plt = _pyplot()
+    avg_price = stats[["type", "AveragePrice_mean"]].sort_values("AveragePrice_mean", ascending=False)
 
     plt.figure(figsize=(8, 5))
-    plt.bar(avg_price["type"], avg_price["AveragePrice"], color=["#2d7f5e", "#8abf26"])
+    plt.bar(avg_price["type"].astype(str), avg_price["AveragePrice_mean"], color=["#2d7f5e", "#8abf26"])
     plt.title("Average avocado price by type (cleaned data)")
     plt.xlabel("Type")
     plt.ylabel("AveragePrice")
@@ -141,20 +338,297 @@ def build_conclusions(report: dict[str, int], stats: pd.DataFrame) -> str:
     )
 
 
-def main() -> None:
-    convert_csv_to_json(CSV_PATH, JSON_PATH)
-    load_json_to_sqlite(JSON_PATH, DB_PATH, TABLE_NAME)
-
-    raw_df = fetch_from_sqlite(DB_PATH, TABLE_NAME)
-    clean_df, report = clean_data(raw_df)
-
-    stats = compute_category_stats(clean_df, category_col="type")
-    stats.to_csv(STATS_PATH, index=False)
-
-    plot_category_chart(clean_df, CHART_PATH)
-    conclusions = build_conclusions(report, stats)
-    CONCLUSIONS_PATH.write_text(conclusions, encoding="utf-8")
-
+def load_raw(
+    pipeline: str,
+    stages: list[dict[str, Any]],
+    json_output: bool = True,
+    sqlite_output: bool = True,
+    refresh: bool = False,
+    label: str | None = None,
+) -> pd.DataFrame:
+    """Source rows as a DataFrame, timed stage by stage.
+
+    legacy: CSV -> indented JSON -> DataFrame -> SQLite -> SELECT *, every step always.
+    columnar: CSV parsed once into typed columns (Parquet cache); JSON and SQLite only on request.
+    """
+    label = label or pipeline
+    if pipeline == "legacy":
+        with measure_stage(stages, label, "csv -> json"):
+            convert_csv_to_json(CSV_PATH, JSON_PATH)
+        with measure_stage(stages, label, "json -> sqlite"):
+            load_json_to_sqlite(JSON_PATH, DB_PATH, TABLE_NAME)
+        with measure_stage(stages, label, "sqlite -> dataframe"):
+            return fetch_from_sqlite(DB_PATH, TABLE_NAME)
+
+    with measure_stage(stages, label, "load columnar"):
+        raw_df = load_columnar(CSV_PATH, PARQUET_PATH, refresh=refresh)
+    if json_output:
+        with measure_stage(stages, label, "write json"):
+            write_json(raw_df, JSON_PATH)
+    if sqlite_output:
+        with measure_stage(stages, label, "write sqlite"):
+            bulk_load_sqlite([raw_df], DB_PATH, TABLE_NAME)
+    return raw_df
+
+
+def analyze(
+    raw_df: pd.DataFrame, stages: list[dict[str, Any]], label: str
+) -> tuple[pd.DataFrame, dict[str, int], pd.DataFrame]:
+    with measure_stage(stages, label, "clean"):
+        clean_df, report = clean_data(raw_df)
+    with measure_stage(stages, label, "category stats"):
+        stats = compute_category_stats(clean_df, category_col="type")
+    return clean_df, report, stats
+
+
+def _load_append_state(csv_path: Path, state_path: Path, keys: list[str]) -> dict[str, Any] | None:
+    """The stored state if it has the current layout and the CSV still starts with exactly its bytes."""
+    if not state_path.exists():
+        return None
+    try:
+        with state_path.open("rb") as handle:
+            state = pickle.load(handle)
+    except Exception:
+        # A truncated file or one pickled by an older layout of the classes it holds; rebuild from the CSV.
+        return None
+    if not isinstance(state, dict) or state.get("version") != APPEND_STATE_VERSION:
+        return None
+    size = state["source_size"]
+    if state["keys"] != keys or csv_path.stat().st_size < size:
+        return None
+    with csv_path.open("rb") as handle:
+        handle.seek(size - 1)
+        # A last line without a newline could have been extended in place rather than followed by new rows.
+        ends_with_newline = handle.read(1) == b"\n"
+    if not ends_with_newline or file_sha256(csv_path, size) != state["source_sha256"]:
+        return None
+    return state
+
+
+def append_clean_stats(
+    csv_path: Path, state_path: Path, keys: list[str], refresh: bool = False
+) -> tuple[pd.DataFrame, dict[str, int], str]:
+    """Category stats that fold only the rows appended to the CSV since the last run into stored aggregates.
+
+    Returns the stats, the pipeline report and what happened: "append" (rows past the stored `Date`
+    watermark merged in), "unchanged" or "full". A full build computes the stats exactly and stores the
+    mergeable state; it happens on the first run, with `refresh`, when earlier bytes of the CSV changed,
+    when appended rows are not past the watermark, and once appended rows exceed `APPEND_REBUILD_SHARE`
+    of the rows at the last build. Appended runs carry the sketch medians of `avocado_streaming`; an
+    "unchanged" run returns exactly what the run before it returned.
+    """
+    state = None if refresh else _load_append_state(csv_path, state_path, keys)
+    mode = "full"
+    if state is not None:
+        incremental = state["stats"]
+        new_rows = read_appended_rows(csv_path, state["source_size"])
+        if not len(new_rows):
+            stats, report = state["result"]
+            return stats, report, "unchanged"
+        seen = incremental.report["rows_before"] + len(new_rows)
+        past_watermark = incremental.watermark is not None and bool((new_rows["Date"] > incremental.watermark).all())
+        if past_watermark and seen <= (1 + APPEND_REBUILD_SHARE) * state["rows_at_build"]:
+            incremental.add(new_rows)
+            mode = "append"
+
+    if mode == "full":
+        raw_df = read_csv_typed(csv_path)
+        clean_df, report = clean_data(raw_df)
+        stats = compute_category_stats(clean_df, keys)
+        value_cols = [col for col in raw_df.select_dtypes(include=["number"]).columns if col not in keys]
+        filter_cols = [col for col in value_cols if col != "year"]
+        incremental = IncrementalStats(keys, iqr_fences(raw_df.drop_duplicates(), filter_cols), value_cols)
+        incremental.add(raw_df)
+        state = {"version": APPEND_STATE_VERSION, "keys": keys, "rows_at_build": len(raw_df), "stats": incremental}
+    else:
+        stats = incremental.stats()
+        report = dict(incremental.report)
+
+    report = {key: int(value) for key, value in report.items()}
+    state["result"] = (stats, report)
+    state["source_size"] = csv_path.stat().st_size
+    state["source_sha256"] = file_sha256(csv_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with state_path.open("wb") as handle:
+        pickle.dump(state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    return stats, report, mode
+
+
+def _profile_pipeline(pipeline: str, refresh: bool, label: str) -> tuple[list[dict[str, Any]], pd.DataFrame]:
+    stages: list[dict[str, Any]] = []
+    # Side outputs off for columnar: the comparison is against what the legacy path has to do before analysis.
+    raw_df = load_raw(pipeline, stages, json_output=False, sqlite_output=False, refresh=refresh, label=label)
+    _, _, stats = analyze(raw_df, stages, label)
+    stats["type"] = stats["type"].astype(str)
+    return stages, stats
+
+
+def compare_pipelines() -> tuple[list[dict[str, Any]], bool]:
+    """Legacy, columnar from the CSV and columnar from the Parquet cache, each in a fresh process."""
+    runs = [
+        ("legacy", False, "legacy"),
+        ("columnar", True, "columnar (csv)"),
+        ("columnar", False, "columnar (parquet)"),
+    ]
+    stages: list[dict[str, Any]] = []
+    results = []
+    with mp.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        for run in runs:
+            run_stages, stats = pool.apply(_profile_pipeline, run)
+            stages.extend(run_stages)
+            results.append(stats)
+    identical = all(stats.equals(results[0]) for stats in results[1:])
+    return stages, identical
+
+
+def print_stages(stages: list[dict[str, Any]]) -> None:
+    print(f"{'pipeline':<20} {'stage':<20} {'seconds':>8} {'peak rss MB':>12} {'rss growth MB':>14}")
+    totals: dict[str, float] = {}
+    for stage in stages:
+        totals[stage["pipeline"]] = totals.get(stage["pipeline"], 0.0) + stage["seconds"]
+        print(
+            f"{stage['pipeline']:<20} {stage['stage']:<20} {stage['seconds']:>8.3f} "
+            f"{stage['peak_rss_mb']:>12.1f} {stage['rss_growth_mb']:>14.1f}"
+        )
+    for pipeline, seconds in totals.items():
+        print(f"{pipeline:<20} {'total':<20} {seconds:>8.3f}")
+
+
+def run_pipeline(args: argparse.Namespace, stages: list[dict[str, Any]]) -> tuple[pd.DataFrame, dict[str, int]]:
+    if args.pipeline == "streaming":
+        with measure_stage(stages, args.pipeline, "stream clean + stats"):
+            return stream_clean_stats(
+                lambda: iter_csv_chunks(CSV_PATH, args.chunksize), category_col="type", bounds=args.bounds
+            )
+    if args.pipeline == "sqlite":
+        with measure_stage(stages, args.pipeline, "bulk load sqlite"):
+            bulk_load_sqlite(iter_csv_chunks(CSV_PATH), DB_PATH, TABLE_NAME)
+        filters = SqlFilter(args.types, args.regions, None, args.date_from, args.date_to)
+        with measure_stage(stages, args.pipeline, "sql clean + stats"):
+            return sql_clean_category_stats(DB_PATH, TABLE_NAME, ["type"], filters)
+    if args.pipeline == "append":
+        with measure_stage(stages, args.pipeline, "append clean + stats"):
+            stats, report, mode = append_clean_stats(CSV_PATH, APPEND_STATE_PATH, ["type"], refresh=args.refresh)
+        print(f"Append state: {mode}")
+        return stats, report
+
+    raw_df = load_raw(args.pipeline, stages, json_output=args.json, sqlite_output=args.sqlite, refresh=args.refresh)
+    _, report, stats = analyze(raw_df, stages, args.pipeline)
+    return stats, report
+
+
+def stats_outputs(args: argparse.Namespace) -> list[Path]:
+    """Files the stats stage writes for this pipeline; if any is missing or touched, the stage reruns."""
+    outputs = [STATS_PATH]
+    if args.pipeline == "legacy" or args.json:
+        outputs.append(JSON_PATH)
+    if args.pipeline in ("legacy", "sqlite") or args.sqlite:
+        outputs.append(DB_PATH)
+    if args.pipeline == "append":
+        outputs.append(APPEND_STATE_PATH)
+    return outputs
+
+
+def run_cached(
+    cache: StageCache,
+    stages: list[dict[str, Any]],
+    pipeline: str,
+    name: str,
+    params: dict[str, Any],
+    outputs: list[Path],
+    func: Callable[[], Any],
+) -> Any:
+    """`func()` unless the cache says its outputs are current; returns the stage's result either way."""
+    if cache.fresh(name, params, outputs):
+        stages.append(
+            {
+                "pipeline": pipeline,
+                "stage": f"{name} (cached)",
+                "seconds": 0.0,
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+                "rss_growth_mb": 0.0,
+            }
+        )
+        return cache.result(name)
+    result = func()
+    cache.record(name, params, outputs, result)
+    return result
+
+
+def open_stage_cache(args: argparse.Namespace) -> StageCache:
+    return StageCache(None if args.no_cache else STAGE_CACHE_PATH, force=args.refresh)
+
+
+def convert_stage(args: argparse.Namespace, cache: StageCache, stages: list[dict[str, Any]]) -> Path:
+    """CSV -> typed Parquet, or -> compact JSON records; returns the file written."""
+    output = JSON_PATH if args.format == "json" else PARQUET_PATH
+
+    def convert() -> None:
+        with measure_stage(stages, "convert", f"csv -> {args.format}"):
+            df = load_columnar(CSV_PATH, PARQUET_PATH, refresh=args.refresh)
+            if args.format == "json":
+                write_json(df, JSON_PATH)
+
+    params = {"source": file_sha256(CSV_PATH), "format": args.format}
+    run_cached(cache, stages, "convert", f"convert {args.format}", params, [output], convert)
+    return output
+
+
+def load_stage(args: argparse.Namespace, cache: StageCache, stages: list[dict[str, Any]]) -> Path:
+    """CSV -> typed, indexed SQLite table in bounded chunks."""
+    def load() -> None:
+        with measure_stage(stages, "load", "bulk load sqlite"):
+            bulk_load_sqlite(iter_csv_chunks(CSV_PATH, args.chunksize), DB_PATH, TABLE_NAME)
+
+    run_cached(cache, stages, "load", "load", {"source": file_sha256(CSV_PATH)}, [DB_PATH], load)
+    return DB_PATH
+
+
+def stats_stage(
+    args: argparse.Namespace, cache: StageCache, stages: list[dict[str, Any]]
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    """Category stats of the chosen pipeline, written to the stats CSV unless the cache has them."""
+    params = {"source": file_sha256(CSV_PATH), **{name: getattr(args, name) for name in STAGE_ARGS}}
+
+    def compute() -> dict[str, int]:
+        stats, report = run_pipeline(args, stages)
+        stats.to_csv(STATS_PATH, index=False)
+        return report
+
+    report = run_cached(cache, stages, args.pipeline, "stats", params, stats_outputs(args), compute)
+    # Read back on both paths, so a cached run prints and plots exactly what a fresh one wrote.
+    return pd.read_csv(STATS_PATH), report
+
+
+def chart_stage(args: argparse.Namespace, cache: StageCache, stages: list[dict[str, Any]], stats: pd.DataFrame) -> None:
+    def chart() -> None:
+        with measure_stage(stages, args.pipeline, "chart"):
+            plot_category_chart(stats, CHART_PATH)
+
+    run_cached(cache, stages, args.pipeline, "chart", {"stats": file_sha256(STATS_PATH)}, [CHART_PATH], chart)
+
+
+def conclusions_stage(
+    args: argparse.Namespace,
+    cache: StageCache,
+    stages: list[dict[str, Any]],
+    stats: pd.DataFrame,
+    report: dict[str, int],
+) -> bool:
+    """Write the conclusions; False when a --type filter left only one of the two types they compare."""
+    if not {"conventional", "organic"} <= set(stats["type"].astype(str)):
+        return False
+
+    def conclusions() -> None:
+        with measure_stage(stages, args.pipeline, "conclusions"):
+            CONCLUSIONS_PATH.write_text(build_conclusions(report, stats), encoding="utf-8")
+
+    params = {"stats": file_sha256(STATS_PATH), "report": report}
+    run_cached(cache, stages, args.pipeline, "conclusions", params, [CONCLUSIONS_PATH], conclusions)
+    return True
+
+
+def print_results(report: dict[str, int], stats: pd.DataFrame) -> None:
     print("=== PIPELINE REPORT ===")
     for key, value in report.items():
         print(f"{key}: {value}")
@@ -162,12 +636,27 @@ def main() -> None:
     print("\n=== CATEGORY STATS (type) ===")
     print(stats.to_string(index=False))
 
+
+def print_saved_files(args: argparse.Namespace, chart: bool = False, conclusions: bool = False) -> None:
     print("\nSaved files:")
-    print(f"- JSON: {JSON_PATH}")
-    print(f"- SQLite DB: {DB_PATH}")
+    if args.pipeline == "columnar":
+        print(f"- Parquet: {PARQUET_PATH}")
+    if args.pipeline == "legacy" or args.json:
+        print(f"- JSON: {JSON_PATH}")
+    if args.pipeline in ("legacy", "sqlite") or args.sqlite:
+        print(f"- SQLite DB: {DB_PATH}")
+    if args.pipeline == "append":
+        print(f"- Append state: {APPEND_STATE_PATH}")
     print(f"- Stats CSV: {STATS_PATH}")
-    print(f"- Chart: {CHART_PATH}")
-    print(f"- Conclusions: {CONCLUSIONS_PATH}")
+    if chart:
+        print(f"- Chart: {CHART_PATH}")
+    if conclusions:
+        print(f"- Conclusions: {CONCLUSIONS_PATH}")
+
+
+def main() -> None:
+    """`python avocado_analysis.py [options]` as before the subcommands: the same as `avocado_cli.py report`."""
+    avocado_cli.main(["report", *sys.argv[1:]])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+"""Avocado analysis from the command line: convert, load, stats, chart and report.
+
+Only the standard library is imported at startup. Each subcommand imports pandas, matplotlib and the
+pipeline modules when it runs, so `--help`, argument errors and the commands that draw nothing do not pay
+for the libraries they never use. `import_benchmark.py` shows the `-X importtime` breakdown.
+
+Every subcommand goes through the stage cache, so `chart` after `stats` reuses the stats it wrote.
+"""
+
+from __future__ import annotations
+
+import argparse
+from typing import Any
+
+PIPELINES = ("legacy", "columnar", "streaming", "sqlite", "append")
+# Same default as avocado_analysis.STREAM_CHUNK_ROWS, repeated so building the parser imports nothing heavy.
+STREAM_CHUNK_ROWS = 200_000
+
+
+def add_cache_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="rerun every stage; columnar also re-parses the CSV into Parquet, append rebuilds its stored state",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="neither skip nor record stages in the stage cache")
+
+
+def add_pipeline_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--pipeline", choices=PIPELINES, default="legacy")
+    parser.add_argument("--json", action="store_true", help="columnar pipeline: also write the JSON side output")
+    parser.add_argument("--sqlite", action="store_true", help="columnar pipeline: also write the SQLite side output")
+    add_cache_args(parser)
+    parser.add_argument("--compare", action="store_true", help="time the exact pipelines up to the stats and exit")
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNK_ROWS, help="streaming pipeline: rows per chunk")
+    parser.add_argument(
+        "--bounds",
+        choices=["joint", "sequential"],
+        default="joint",
+        help="streaming pipeline: IQR bounds from one pass, or one pass per column like the exact path",
+    )
+    parser.add_argument("--type", action="append", dest="types", help="sqlite pipeline: keep this type (repeatable)")
+    parser.add_argument("--region", action="append", dest="regions", help="sqlite pipeline: keep this region")
+    parser.add_argument("--date-from", help="sqlite pipeline: first Date to keep, YYYY-MM-DD")
+    parser.add_argument("--date-to", help="sqlite pipeline: last Date to keep, YYYY-MM-DD")
+
+
+def convert_command(args: argparse.Namespace) -> None:
+    from avocado_analysis import convert_stage, open_stage_cache, print_stages
+
+    stages: list[dict[str, Any]] = []
+    output = convert_stage(args, open_stage_cache(args), stages)
+    print_stages(stages)
+    print(f"\nSaved: {output}")
+
+
+def load_command(args: argparse.Namespace) -> None:
+    from avocado_analysis import load_stage, open_stage_cache, print_stages
+
+    stages: list[dict[str, Any]] = []
+    output = load_stage(args, open_stage_cache(args), stages)
+    print_stages(stages)
+    print(f"\nSaved: {output}")
+
+
+def compare_command() -> None:
+    from avocado_analysis import compare_pipelines, print_stages
+
+    stages, identical = compare_pipelines()
+    print_stages(stages)
+    print(f"\nCategory stats identical across pipelines: {identical}")
+
+
+def stats_command(args: argparse.Namespace) -> None:
+    if args.compare:
+        compare_command()
+        return
+    from avocado_analysis import open_stage_cache, print_results, print_saved_files, print_stages, stats_stage
+
+    stages: list[dict[str, Any]] = []
+    stats, report = stats_stage(args, open_stage_cache(args), stages)
+    print_results(report, stats)
+    print("\n=== STAGES ===")
+    print_stages(stages)
+    print_saved_files(args)
+
+
+def chart_command(args: argparse.Namespace) -> None:
+    from avocado_analysis import chart_stage, open_stage_cache, print_saved_files, print_stages, stats_stage
+
+    stages: list[dict[str, Any]] = []
+    cache = open_stage_cache(args)
+    stats, _ = stats_stage(args, cache, stages)
+    chart_stage(args, cache, stages, stats)
+    print_stages(stages)
+    print_saved_files(args, chart=True)
+
+
+def report_command(args: argparse.Namespace) -> None:
+    if args.compare:
+        compare_command()
+        return
+    from avocado_analysis import (
+        chart_stage,
+        conclusions_stage,
+        open_stage_cache,
+        print_results,
+        print_saved_files,
+        print_stages,
+        stats_stage,
+    )
+
+    stages: list[dict[str, Any]] = []
+    cache = open_stage_cache(args)
+    stats, report = stats_stage(args, cache, stages)
+    chart_stage(args, cache, stages, stats)
+    written = conclusions_stage(args, cache, stages, stats, report)
+    print_results(report, stats)
+    print("\n=== STAGES ===")
+    print_stages(stages)
+    print_saved_files(args, chart=True, conclusions=written)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Avocado dataset: clean, category stats, chart and conclusions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="parse the CSV into typed Parquet or compact JSON")
+    convert.add_argument("--format", choices=["parquet", "json"], default="parquet")
+    add_cache_args(convert)
+    convert.set_defaults(handler=convert_command)
+
+    load = commands.add_parser("load", help="bulk load the CSV into a typed, indexed SQLite table")
+    load.add_argument("--chunksize", type=int, default=STREAM_CHUNK_ROWS, help="rows per insert batch")
+    add_cache_args(load)
+    load.set_defaults(handler=load_command)
+
+    for name, handler, help_text in (
+        ("stats", stats_command, "clean the data and write the category stats CSV"),
+        ("chart", chart_command, "stats, then the average price chart"),
+        ("report", report_command, "stats, chart and conclusions"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        add_pipeline_args(command)
+        command.set_defaults(handler=handler)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Typed SQLite store for the avocado data: a tuned bulk loader and queries that aggregate inside SQLite.
+
+`sql_clean_category_stats` is `compute_category_stats(clean_data(df))` pushed down into SQL: duplicates,
+IQR fences and per-group aggregates are computed by SQLite, and only one row per group reaches pandas.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+COLUMN_TYPES = {"Date": "TEXT", "type": "TEXT", "region": "TEXT", "year": "INTEGER"}
+INDEXED_COLUMNS = ["type", "region", "Date"]
+LOAD_BATCH_ROWS = 50_000
+
+
+class SqlFilter(NamedTuple):
+    types: list[str] | None = None
+    regions: list[str] | None = None
+    years: list[int] | None = None
+    date_from: str | None = None
+    date_to: str | None = None
+
+
+def quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sqlite_rows(chunk: pd.DataFrame) -> Iterable[tuple]:
+    if pd.api.types.is_datetime64_any_dtype(chunk["Date"]):
+        chunk = chunk.assign(Date=chunk["Date"].dt.strftime("%Y-%m-%d"))
+    # Series.tolist gives plain Python scalars (sqlite3 cannot bind numpy integers) about 3x faster than
+    # itertuples, which is slow on categorical columns.
+    return zip(*(chunk[col].tolist() for col in chunk.columns))
+
+
+def bulk_load_sqlite(chunks: Iterable[pd.DataFrame], db_path: Path, table_name: str) -> int:
+    """Replace `table_name` with the rows of `chunks` in one transaction and index it afterwards.
+
+    synchronous=OFF only lasts for the load: a crash mid-load can lose the table being built, never a
+    committed one, because the old table is dropped inside the same transaction.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA cache_size=-262144")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("BEGIN")
+        conn.execute(f"DROP TABLE IF EXISTS {quote(table_name)}")
+        loaded = 0
+        insert = None
+        for chunk in chunks:
+            if insert is None:
+                columns = ", ".join(f"{quote(col)} {_column_type(col, chunk[col])}" for col in chunk.columns)
+                conn.execute(f"CREATE TABLE {quote(table_name)} ({columns})")
+                placeholders = ", ".join("?" * len(chunk.columns))
+                insert = f"INSERT INTO {quote(table_name)} VALUES ({placeholders})"
+            for start in range(0, len(chunk), LOAD_BATCH_ROWS):
+                conn.executemany(insert, _sqlite_rows(chunk.iloc[start : start + LOAD_BATCH_ROWS]))
+            loaded += len(chunk)
+        # Indexes are built once over the loaded table instead of being maintained row by row.
+        for col in INDEXED_COLUMNS:
+            index_name = quote(f"{table_name}_{col}_idx".lower())
+            conn.execute(f"CREATE INDEX {index_name} ON {quote(table_name)} ({quote(col)})")
+        conn.execute("COMMIT")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"ANALYZE {quote(table_name)}")
+        return loaded
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def _column_type(col: str, values: pd.Series) -> str:
+    if col in COLUMN_TYPES:
+        return COLUMN_TYPES[col]
+    if pd.api.types.is_integer_dtype(values):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(values):
+        return "REAL"
+    return "TEXT"
+
+
+def numeric_columns(conn: sqlite3.Connection, table_name: str) -> list[str]:
+    return [
+        row[1]
+        for row in conn.execute(f"PRAGMA table_info({quote(table_name)})")
+        if row[2].upper() in ("REAL", "INTEGER")
+    ]
+
+
+def _conditions(
+    filters: SqlFilter | None = None, bounds: dict[str, tuple[float, float]] | None = None
+) -> tuple[list[str], list[Any]]:
+    filters = filters or SqlFilter()
+    conditions: list[str] = []
+    params: list[Any] = []
+    for col, values in (("type", filters.types), ("region", filters.regions), ("year", filters.years)):
+        if values:
+            conditions.append(f"{quote(col)} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if filters.date_from:
+        conditions.append('"Date" >= ?')
+        params.append(filters.date_from)
+    if filters.date_to:
+        conditions.append('"Date" <= ?')
+        params.append(filters.date_to)
+    for col, (lower, upper) in (bounds or {}).items():
+        conditions.append(f"{quote(col)} BETWEEN ? AND ?")
+        params.extend([lower, upper])
+    return conditions, params
+
+
+def where_clause(
+    filters: SqlFilter | None = None, bounds: dict[str, tuple[float, float]] | None = None
+) -> tuple[str, list[Any]]:
+    """WHERE for the row filters (served by the type/region/Date indexes) and the IQR fences."""
+    conditions, params = _conditions(filters, bounds)
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def _source(table_name: str, distinct: bool, filters: SqlFilter | None) -> tuple[str, list[Any]]:
+    # Deduplicate before any fence or aggregate, as clean_data does before filtering.
+    where, params = where_clause(filters)
+    select = "SELECT DISTINCT *" if distinct else "SELECT *"
+    return f"{select} FROM {quote(table_name)} {where}", params
+
+
+def sql_quantiles(
+    conn: sqlite3.Connection,
+    source: str,
+    params: list[Any],
+    col: str,
+    quantiles: list[float],
+    bounds: dict[str, tuple[float, float]] | None = None,
+) -> list[float]:
+    """Linear-interpolated quantiles like pandas, read with ORDER BY/LIMIT instead of fetching the column."""
+    column = quote(col)
+    conditions, bound_params = _conditions(bounds=bounds)
+    where = "WHERE " + " AND ".join(conditions + [f"{column} IS NOT NULL"])
+    params = params + bound_params
+    (count,) = conn.execute(f"SELECT COUNT(*) FROM ({source}) {where}", params).fetchone()
+    if not count:
+        return [float("nan")] * len(quantiles)
+    result = []
+    for q in quantiles:
+        position = q * (count - 1)
+        offset = int(position)
+        rows = conn.execute(
+            f"SELECT {column} FROM ({source}) {where} ORDER BY {column} LIMIT 2 OFFSET ?", params + [offset]
+        ).fetchall()
+        low = rows[0][0]
+        high = rows[1][0] if len(rows) > 1 else low
+        result.append(low + (high - low) * (position - offset))
+    return result
+
+
+def sql_iqr_bounds(
+    conn: sqlite3.Connection,
+    table_name: str,
+    cols: list[str],
+    filters: SqlFilter | None = None,
+    distinct: bool = True,
+    sequential: bool = True,
+) -> dict[str, tuple[float, float]]:
+    """1.5 * IQR fences computed inside SQLite; sequential matches the column-by-column in-memory filter."""
+    source, params = _source(table_name, distinct, filters)
+    bounds: dict[str, tuple[float, float]] = {}
+    for col in cols:
+        q1, q3 = sql_quantiles(conn, source, params, col, [0.25, 0.75], bounds if sequential else None)
+        iqr = q3 - q1
+        bounds[col] = (q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+    return bounds
+
+
+def sql_category_stats(
+    conn: sqlite3.Connection,
+    table_name: str,
+    keys: list[str],
+    filters: SqlFilter | None = None,
+    bounds: dict[str, tuple[float, float]] | None = None,
+    distinct: bool = True,
+    value_cols: list[str] | None = None,
+) -> pd.DataFrame:
+    """Same columns as `compute_category_stats`, aggregated by SQLite; one row per group comes back."""
+    if value_cols is None:
+        value_cols = [col for col in numeric_columns(conn, table_name) if col not in keys]
+    source, params = _source(table_name, distinct, filters)
+    fences, fence_params = where_clause(bounds=bounds)
+    group_by = ", ".join(quote(key) for key in keys)
+    join = " AND ".join(f"f.{quote(key)} IS m.{quote(key)}" for key in keys)
+    cte = f"WITH filtered AS (SELECT * FROM ({source}) {fences})"
+
+    # Two passes (group means first) keep the variance stable for large volumes, unlike sum(x*x) - n*mean**2.
+    means = ", ".join(f"AVG({quote(col)}) AS {quote(col + '_mean')}" for col in value_cols)
+    aggregates = []
+    for col in value_cols:
+        value, mean = f"f.{quote(col)}", f"m.{quote(col + '_mean')}"
+        aggregates += [
+            f"COUNT({value}) AS {quote(col + '_count')}",
+            f"{mean} AS {quote(col + '_mean')}",
+            f"MIN({value}) AS {quote(col + '_min')}",
+            f"MAX({value}) AS {quote(col + '_max')}",
+            f"SUM(({value} - {mean}) * ({value} - {mean})) / (COUNT({value}) - 1) AS {quote(col + '_var')}",
+        ]
+    keys_select = ", ".join(f"f.{quote(key)}" for key in keys)
+    query = (
+        f"{cte}, means AS (SELECT {group_by}, {means} FROM filtered GROUP BY {group_by}) "
+        f"SELECT {keys_select}, {', '.join(aggregates)} FROM filtered f JOIN means m ON {join} "
+        f"GROUP BY {keys_select} ORDER BY {keys_select}"
+    )
+    stats = pd.read_sql_query(query, conn, params=params + fence_params)
+
+    # Median per group: the middle one or two rows by ROW_NUMBER, so only those rows are returned.
+    for col in value_cols:
+        column = quote(col)
+        median = pd.read_sql_query(
+            f"{cte} SELECT {group_by}, AVG({column}) AS median FROM ("
+            f"SELECT {group_by}, {column}, ROW_NUMBER() OVER (PARTITION BY {group_by} ORDER BY {column}) AS rn, "
+            f"COUNT(*) OVER (PARTITION BY {group_by}) AS n FROM filtered WHERE {column} IS NOT NULL"
+            f") WHERE rn IN ((n + 1) / 2, (n + 2) / 2) GROUP BY {group_by}",
+            conn,
+            params=params + fence_params,
+        )
+        stats = stats.merge(median.rename(columns={"median": f"{col}_median"}), on=keys, how="left")
+        stats[f"{col}_std"] = np.sqrt(stats.pop(f"{col}_var"))
+
+    metrics = ["count", "mean", "median", "min", "max", "std"]
+    return stats[keys + [f"{col}_{metric}" for col in value_cols for metric in metrics]]
+
+
+def sql_clean_category_stats(
+    db_path: Path, table_name: str, keys: list[str], filters: SqlFilter | None = None
+) -> tuple[pd.DataFrame, dict[str, int]]:
+    """`clean_data` + `compute_category_stats` pushed down: DISTINCT, sequential IQR fences, grouped stats."""
+    with sqlite3.connect(db_path) as conn:
+        source, params = _source(table_name, False, filters)
+        (rows_before,) = conn.execute(f"SELECT COUNT(*) FROM ({source})", params).fetchone()
+        # Every fence and aggregate below reads the filtered, deduplicated rows; materialize them once.
+        distinct_source, distinct_params = _source(table_name, True, filters)
+        conn.execute(f"CREATE TEMP TABLE clean_rows AS {distinct_source}", distinct_params)
+        try:
+            numeric = numeric_columns(conn, table_name)
+            (rows_distinct,) = conn.execute("SELECT COUNT(*) FROM clean_rows").fetchone()
+            bounds = sql_iqr_bounds(conn, "clean_rows", [col for col in numeric if col != "year"], distinct=False)
+            fences, fence_params = where_clause(bounds=bounds)
+            (rows_kept,) = conn.execute(f"SELECT COUNT(*) FROM clean_rows {fences}", fence_params).fetchone()
+            value_cols = [col for col in numeric if col not in keys]
+            stats = sql_category_stats(conn, "clean_rows", keys, bounds=bounds, distinct=False, value_cols=value_cols)
+        finally:
+            conn.execute("DROP TABLE temp.clean_rows")
+    report = {
+        "rows_before": rows_before,
+        "rows_after_drop_duplicates": rows_distinct,
+        "duplicates_removed": rows_before - rows_distinct,
+        "rows_after_outlier_filter": rows_kept,
+        "outliers_removed": rows_distinct - rows_kept,
+    }
+    return stats, report
@@ -0,0 +1,58 @@
+"""Streaming deduplication cost per chunk as the number of stored row hashes grows.
+
+The sorted-runs HashDeduplicator against re-sorting one array of every hash seen so far (`np.union1d`), the
+layout it replaced. The chunks hold synthetic distinct hashes, so only the seen-set bookkeeping is timed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from avocado_streaming import HashDeduplicator
+
+
+class UnionDeduplicator:
+    """The replaced layout: one sorted array, rebuilt with np.union1d on every chunk."""
+
+    def __init__(self) -> None:
+        self._seen = np.empty(0, dtype=np.uint64)
+
+    def add_unique(self, unique: np.ndarray) -> np.ndarray:
+        positions = np.searchsorted(self._seen, unique)
+        already_seen = positions < len(self._seen)
+        already_seen[already_seen] = self._seen[positions[already_seen]] == unique[already_seen]
+        self._seen = np.union1d(self._seen, unique[~already_seen])
+        return ~already_seen
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seen-hash bookkeeping per chunk: sorted runs vs union1d")
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument("--chunks", type=int, default=50)
+    parser.add_argument("--report-every", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    layouts = {"sorted runs": HashDeduplicator(), "union1d": UnionDeduplicator()}
+    totals = dict.fromkeys(layouts, 0.0)
+    print(f"{'stored hashes':>14} " + " ".join(f"{name + ' ms/chunk':>20}" for name in layouts))
+    for index in range(1, args.chunks + 1):
+        unique = np.unique(rng.integers(0, np.iinfo(np.uint64).max, args.chunk_rows, dtype=np.uint64))
+        timings = {}
+        for name, layout in layouts.items():
+            started = time.perf_counter()
+            layout.add_unique(unique)
+            timings[name] = time.perf_counter() - started
+            totals[name] += timings[name]
+        if index % args.report_every == 0:
+            stored = index * args.chunk_rows
+            print(f"{stored:>14} " + " ".join(f"{timings[name] * 1000:>20.1f}" for name in layouts))
+    print("\ntotal: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
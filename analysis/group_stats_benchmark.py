@@ -0,0 +1,134 @@
+"""Multi-key group stats: the single-process in-memory path against partition files in a process pool."""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from avocado_analysis import CSV_PATH, compute_category_stats, iqr_bounds, iqr_outlier_mask, read_csv_typed
+from avocado_streaming import parallel_group_stats, parallel_iqr_bounds
+
+
+def write_partitions(rows: int, partitions: int, data_dir: Path, seed: int) -> list[Path]:
+    """avocado.csv replicated to `rows` rows over Parquet files, one partition in memory at a time."""
+    source = read_csv_typed(CSV_PATH)
+    measures = [col for col in source.select_dtypes(include=["number"]).columns if col != "year"]
+    rng = np.random.default_rng(seed)
+    per_partition = math.ceil(rows / partitions)
+    paths = []
+    for index in range(partitions):
+        start = index * per_partition
+        count = min(per_partition, rows - start)
+        part = source.iloc[np.arange(start, start + count) % len(source)].reset_index(drop=True)
+        # Jitter the measures so replicas stay distinct rows with the same distribution.
+        part[measures] = part[measures].to_numpy() * rng.uniform(0.9, 1.1, size=(count, len(measures)))
+        path = data_dir / f"avocado-{index:03d}.parquet"
+        part.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def column_by_column(df: pd.DataFrame, numeric_cols: list[str]) -> pd.DataFrame:
+    """The filter remove_outliers_iqr ran before the vectorized mask: a quantile and a filtered copy per column."""
+    filtered = df.copy()
+    for col in numeric_cols:
+        q1 = filtered[col].quantile(0.25)
+        q3 = filtered[col].quantile(0.75)
+        iqr = q3 - q1
+        filtered = filtered[filtered[col].between(q1 - 1.5 * iqr, q3 + 1.5 * iqr)]
+    return filtered
+
+
+def timed(func: Callable[..., Any], *args: Any, **kwargs: Any) -> tuple[Any, float]:
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def max_scaled_difference(exact: pd.DataFrame, other: pd.DataFrame, metric: str) -> float:
+    """Largest difference as a share of that column's largest value, so groups near 0 do not dominate."""
+    cols = [col for col in exact.columns if col.endswith(f"_{metric}")]
+    expected = exact[cols].to_numpy(dtype=float)
+    actual = other[cols].to_numpy(dtype=float)
+    scale = np.maximum(np.nanmax(np.abs(expected), axis=0), 1e-9)
+    return float(np.nanmax(np.abs(actual - expected) / scale))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Group stats per key set: single process vs process pool")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--keys", nargs="+", default=["region", "year", "type"])
+    parser.add_argument("--data-dir", type=Path, help="keep the generated partitions here instead of a temp dir")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or Path(tmp)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        paths, seconds = timed(write_partitions, args.rows, args.partitions, data_dir, args.seed)
+        print(f"{args.rows} rows in {len(paths)} partitions, {args.workers} workers, keys={args.keys}")
+        print(f"generated in {seconds:.1f}s\n")
+
+        rows: list[tuple[str, float, int]] = []
+        df, load_seconds = timed(lambda: pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True))
+        rows.append(("single: load partitions", load_seconds, len(df)))
+        filter_cols = [col for col in df.select_dtypes(include=["number"]).columns if col not in args.keys + ["year"]]
+
+        kept, filter_seconds = timed(column_by_column, df, filter_cols)
+        rows.append(("single: column-by-column filter", filter_seconds, len(kept)))
+        baseline, baseline_seconds = timed(compute_category_stats, kept, args.keys)
+        rows.append(("single: group stats (column filter)", baseline_seconds, len(baseline)))
+        del kept, baseline
+        mask, seconds = timed(iqr_outlier_mask, df, filter_cols, True)
+        rows.append(("single: sequential mask", seconds, int(mask.sum())))
+        mask, mask_seconds = timed(iqr_outlier_mask, df, filter_cols, False)
+        rows.append(("single: joint mask", mask_seconds, int(mask.sum())))
+        exact, stats_seconds = timed(compute_category_stats, df[mask], args.keys)
+        rows.append(("single: group stats (joint mask)", stats_seconds, len(exact)))
+        exact_bounds = iqr_bounds(df[filter_cols].to_numpy(dtype=float), filter_cols)
+        del df, mask
+
+        bounds, bounds_seconds = timed(parallel_iqr_bounds, paths, filter_cols, args.workers)
+        rows.append(("pool: joint bounds (sketches)", bounds_seconds, len(bounds)))
+        # Same fences as the single path, so the comparison below isolates the partial/merge step.
+        merged, merge_seconds = timed(
+            parallel_group_stats, paths, args.keys, bounds=exact_bounds, workers=args.workers
+        )
+        rows.append(("pool: partial stats + merge", merge_seconds, len(merged)))
+
+    print(f"{'stage':<36} {'seconds':>8} {'rows':>10}")
+    for name, seconds, count in rows:
+        print(f"{name:<36} {seconds:>8.2f} {count:>10}")
+    # The single-process baseline is the column-by-column filter the pipeline used to run; the joint mask
+    # applies the same fences as the pool, so it is reported on its own rather than as the baseline.
+    single = load_seconds + filter_seconds + baseline_seconds
+    joint = load_seconds + mask_seconds + stats_seconds
+    pool = bounds_seconds + merge_seconds
+    print(
+        f"\nend to end: single {single:.2f}s, single with joint mask {joint:.2f}s, pool {pool:.2f}s "
+        f"({single / pool:.1f}x, joint mask {joint / pool:.1f}x)"
+    )
+
+    shift = max(
+        abs(bound - exact_bound) / (exact_bounds[col][1] - exact_bounds[col][0])
+        for col in filter_cols
+        for bound, exact_bound in zip(bounds[col], exact_bounds[col])
+        if exact_bounds[col][1] > exact_bounds[col][0]
+    )
+    print(f"largest sketch fence shift: {shift:.4f} of the exact fence width")
+    for metric in ("count", "mean", "std", "median"):
+        print(f"max scaled difference of {metric}: {max_scaled_difference(exact, merged, metric):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Startup cost of the analysis entry points, from `python -X importtime`, to catch heavy imports creeping back."""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+BASE_DIR = Path(__file__).resolve().parent
+TARGETS = {
+    "cli --help": ["avocado_cli.py", "--help"],
+    "cli stats --help": ["avocado_cli.py", "stats", "--help"],
+    "import avocado_analysis": ["-c", "import avocado_analysis"],
+    "import avocado_streaming": ["-c", "import avocado_streaming"],
+    "import avocado_sqlite": ["-c", "import avocado_sqlite"],
+    "chart dependencies": ["-c", "import avocado_analysis; avocado_analysis._pyplot()"],
+}
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> list[ImportRecord]:
+    """Rows of the `-X importtime` report; depth 0 is a module imported by the program itself."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # the header row
+        # One space after the bar at the top level, two more per nesting level.
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        records.append(ImportRecord(name.strip(), depth, int(self_us), int(cumulative_us)))
+    return records
+
+
+def run_target(args: list[str]) -> tuple[float, list[ImportRecord]]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=BASE_DIR, capture_output=True, text=True, check=True
+    )
+    return time.perf_counter() - started, parse_importtime(result.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the analysis entry points")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--repeat", type=int, default=5, help="runs per target; the median is reported")
+    parser.add_argument("--top", type=int, default=8, help="heaviest top-level imports listed per target")
+    parser.add_argument(
+        "--budget-ms", type=float, help="exit 1 if `cli --help` imports take longer than this (median)"
+    )
+    args = parser.parse_args()
+
+    imports_ms: dict[str, float] = {}
+    for label in args.targets:
+        runs = [run_target(TARGETS[label]) for _ in range(args.repeat)]
+        wall_ms = statistics.median(seconds for seconds, _ in runs) * 1000
+        imports_ms[label] = statistics.median(
+            sum(record.cumulative_us for record in records if record.depth == 0) for _, records in runs
+        ) / 1000
+        # The top-level rows of the median-wall-time run; smaller imports vary too much between runs to rank.
+        records = sorted(runs, key=lambda run: run[0])[len(runs) // 2][1]
+        top_level = sorted((r for r in records if r.depth == 0), key=lambda r: r.cumulative_us, reverse=True)
+
+        print(f"== {label}: {wall_ms:.0f} ms wall, {imports_ms[label]:.0f} ms in imports, {len(records)} modules")
+        for record in top_level[: args.top]:
+            print(f"   {record.cumulative_us / 1000:>8.1f} ms  {record.module}")
+
+    if args.budget_ms is not None and "cli --help" in imports_ms:
+        spent = imports_ms["cli --help"]
+        print(f"\ncli --help imports: {spent:.0f} ms, budget {args.budget_ms:.0f} ms")
+        if spent > args.budget_ms:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+from typing import Any, NamedTuple
+
+SCHEMA_V1 = 1
+SCHEMA_V2 = 2
+
+# Logical field -> document path for every schema version the repository can query.
+FIELD_PATHS: dict[int, dict[str, str]] = {
+    SCHEMA_V1: {
+        "order_id": "order_id",
+        "created_at": "order.created_at",
+        "status": "order.status",
+        "status_changed_at": "order.status_changed_at",
+        "channel": "order.channel",
+        "customer_id": "customer.id",
+        "country": "customer.profile.geo.country",
+        "amount": "order.total.amount",
+        "items": "order.items",
+        "item_sku": "order.items.sku",
+        "item_quantity": "order.items.quantity",
+        "item_unit_price": "order.items.unit_price",
+        "risk_score": "risk.score",
+        "timeline": "order.timeline",
+        "notes": "order.notes",
+        "schema_version": "meta.schema_version",
+    },
+    SCHEMA_V2: {
+        "order_id": "oid",
+        "created_at": "ca",
+        "status": "st",
+        "status_changed_at": "sca",
+        "channel": "ch",
+        "customer_id": "cid",
+        "country": "cc",
+        "amount": "amt",
+        "items": "o.it",
+        "item_sku": "o.it.s",
+        "item_quantity": "o.it.q",
+        "item_unit_price": "o.it.p",
+        "risk_score": "rs",
+        "timeline": "o.tl",
+        "notes": "o.n",
+        "schema_version": "meta.schema_version",
+    },
+}
+
+# Timeline entries pushed by status updates, per schema version.
+TIMELINE_KEYS: dict[int, dict[str, str]] = {
+    SCHEMA_V1: {"at": "at", "status": "status", "source": "source"},
+    SCHEMA_V2: {"at": "at", "status": "s", "source": "src"},
+}
+
+# v1 path -> v2 path. Hot fields used by filters, sorts and group keys are hoisted to the top level.
+V2_SCALAR_PATHS = [
+    ("order_id", "oid"),
+    ("order.created_at", "ca"),
+    ("order.status", "st"),
+    ("order.status_changed_at", "sca"),
+    ("order.channel", "ch"),
+    ("customer.id", "cid"),
+    ("customer.profile.geo.country", "cc"),
+    ("order.total.amount", "amt"),
+    ("risk.score", "rs"),
+    ("customer.profile.segment", "c.sg"),
+    ("customer.profile.contacts.email", "c.em"),
+    ("customer.profile.contacts.phones", "c.ph"),
+    ("customer.profile.geo.city", "c.ci"),
+    ("customer.profile.geo.timezone", "c.tz"),
+    ("customer.profile.geo.location.lat", "c.la"),
+    ("customer.profile.geo.location.lon", "c.lo"),
+    ("customer.profile.preferences.language", "c.lg"),
+    ("customer.profile.preferences.marketing_opt_in", "c.mo"),
+    ("order.currency", "o.cur"),
+    ("order.total.subtotal", "o.sub"),
+    ("order.total.shipping", "o.shc"),
+    ("order.shipping.carrier", "o.sh.cr"),
+    ("order.shipping.promised_date", "o.sh.pd"),
+    ("order.shipping.delivered_date", "o.sh.dd"),
+    ("order.shipping.address.country", "o.sh.cc"),
+    ("order.shipping.address.city", "o.sh.ci"),
+    ("order.shipping.address.street", "o.sh.st"),
+    ("order.shipping.address.postal_code", "o.sh.pc"),
+    ("order.notes", "o.n"),
+    ("risk.rules.fraud.ip_velocity", "r.iv"),
+    ("risk.rules.fraud.device_reputation", "r.dr"),
+    ("risk.rules.chargeback.previous_disputes", "r.pd"),
+    ("risk.rules.chargeback.country_mismatch", "r.cm"),
+    ("tags", "tg"),
+    ("meta.source", "meta.src"),
+    ("meta.created_at", "meta.at"),
+]
+
+# Arrays of sub-documents: v1 path -> (v2 path, item field mapping).
+V2_ARRAY_PATHS = [
+    (
+        "order.items",
+        "o.it",
+        [
+            ("sku", "s"),
+            ("category", "c"),
+            ("quantity", "q"),
+            ("unit_price", "p"),
+            ("net_unit_price", "np"),
+            ("discount.percent", "dp"),
+            ("discount.campaign", "dc"),
+            ("attributes.color", "co"),
+            ("attributes.warehouse", "wh"),
+        ],
+    ),
+    (
+        "order.payments",
+        "o.pay",
+        [("method", "m"), ("paid_at", "at"), ("provider", "pr"), ("state", "s")],
+    ),
+    (
+        "order.timeline",
+        "o.tl",
+        [("at", "at"), ("status", "s"), ("source", "src")],
+    ),
+]
+
+# Fields the codec does not know about are kept under this key in their v1 shape.
+EXTRA_KEY = "x"
+
+# Precomputed once: a mapping holds the split (source, target, item mapping) moves and a tree of the
+# source paths it consumes, so the codec never splits dotted paths or copies whole documents per call.
+_MISSING = object()
+_ARRAY = object()
+
+
+class _Mapping(NamedTuple):
+    moves: list[tuple[tuple[str, ...], tuple[str, ...], _Mapping | None]]
+    tree: dict[str, Any]
+
+
+def _compile(paths: list[tuple[str, str, _Mapping | None]], dropped: tuple[str, ...] = ()) -> _Mapping:
+    moves = [(tuple(source.split(".")), tuple(target.split(".")), items) for source, target, items in paths]
+    tree: dict[str, Any] = {}
+    consumed = [(parts, _ARRAY if items is not None else None) for parts, _, items in moves]
+    for parts, leaf in consumed + [(tuple(path.split(".")), None) for path in dropped]:
+        node = tree
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = leaf
+    return _Mapping(moves, tree)
+
+
+def _compile_schema(reverse: bool) -> _Mapping:
+    def pair(v1_path: str, v2_path: str) -> tuple[str, str]:
+        return (v2_path, v1_path) if reverse else (v1_path, v2_path)
+
+    dropped = ("meta.schema_version", EXTRA_KEY) if reverse else ("meta.schema_version",)
+    arrays = []
+    for v1_path, v2_path, item_paths in V2_ARRAY_PATHS:
+        item_mapping = _compile(
+            [(*pair(full, short), None) for full, short in item_paths], (EXTRA_KEY,) if reverse else ()
+        )
+        arrays.append((*pair(v1_path, v2_path), item_mapping))
+    scalars = [(*pair(v1_path, v2_path), None) for v1_path, v2_path in V2_SCALAR_PATHS]
+    return _compile([("_id", "_id", None), *arrays, *scalars], dropped)
+
+
+def _lookup(document: dict[str, Any], parts: tuple[str, ...]) -> Any:
+    node: Any = document
+    for part in parts:
+        if not isinstance(node, dict) or part not in node:
+            return _MISSING
+        node = node[part]
+    return node
+
+
+def _assign(document: dict[str, Any], parts: tuple[str, ...], value: Any) -> None:
+    node = document
+    for part in parts[:-1]:
+        node = node.setdefault(part, {})
+    node[parts[-1]] = value
+
+
+def _unmapped(document: dict[str, Any], tree: dict[str, Any]) -> dict[str, Any]:
+    """Return the fields of ``document`` the mapping does not consume, copying only the dicts on mapped paths."""
+    rest: dict[str, Any] = {}
+    for key, value in document.items():
+        branch = tree.get(key, _MISSING)
+        if branch is _MISSING or (branch is _ARRAY and not isinstance(value, list)):
+            rest[key] = value
+        elif isinstance(branch, dict):
+            if not isinstance(value, dict):
+                rest[key] = value
+                continue
+            # Containers emptied by the mapping are dropped; ones that were already empty are kept.
+            inner = _unmapped(value, branch)
+            if inner or not value:
+                rest[key] = inner
+    return rest
+
+
+def _deep_merge(target: dict[str, Any], extra: dict[str, Any]) -> None:
+    for key, value in extra.items():
+        current = target.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            # Copy before merging so sub-documents shared with the input are never modified.
+            target[key] = merged = dict(current)
+            _deep_merge(merged, value)
+        else:
+            target[key] = value
+
+
+def _moved(document: dict[str, Any], mapping: _Mapping, convert: Any) -> dict[str, Any]:
+    target: dict[str, Any] = {}
+    for source, destination, items in mapping.moves:
+        value = _lookup(document, source)
+        if value is _MISSING:
+            continue
+        if items is not None:
+            if not isinstance(value, list):
+                continue
+            value = [convert(item, items) if isinstance(item, dict) else item for item in value]
+        _assign(target, destination, value)
+    return target
+
+
+def _encode(document: dict[str, Any], mapping: _Mapping) -> dict[str, Any]:
+    compact = _moved(document, mapping, _encode)
+    rest = _unmapped(document, mapping.tree)
+    if rest:
+        compact[EXTRA_KEY] = rest
+    return compact
+
+
+def _decode(document: dict[str, Any], mapping: _Mapping) -> dict[str, Any]:
+    full = _moved(document, mapping, _decode)
+    _deep_merge(full, _unmapped(document, mapping.tree))
+    _deep_merge(full, document.get(EXTRA_KEY, {}))
+    return full
+
+
+_ENCODE_V2 = _compile_schema(reverse=False)
+_DECODE_V2 = _compile_schema(reverse=True)
+
+
+def projection_for(v1_paths: list[str], schema_version: int) -> dict[str, int]:
+    if schema_version != SCHEMA_V2:
+        return {path: 1 for path in v1_paths}
+
+    mapped = list(V2_SCALAR_PATHS) + [(v1_path, v2_path) for v1_path, v2_path, _ in V2_ARRAY_PATHS]
+    projection: dict[str, int] = {}
+    for path in v1_paths:
+        covering = [v2_path for v1_path, v2_path in mapped if path == v1_path or path.startswith(f"{v1_path}.")]
+        if covering:
+            projection[covering[0]] = 1
+            continue
+        # A parent path is split between hoisted children and leftovers under the extra key.
+        projection.update({v2_path: 1 for v1_path, v2_path in mapped if v1_path.startswith(f"{path}.")})
+        projection[EXTRA_KEY] = 1
+    # decode_v2 relies on the version marker.
+    projection["meta.schema_version"] = 1
+    return projection
+
+
+def schema_version_of(document: dict[str, Any]) -> int:
+    return int(document.get("meta", {}).get("schema_version", SCHEMA_V1))
+
+
+
+def encode_v2(document: dict[str, Any]) -> dict[str, Any]:
+    """Return the v2 layout of a v1 document; unmapped values are shared with ``document``, not copied."""
+    if schema_version_of(document) == SCHEMA_V2:
+        return document
+
+    compact = _encode(document, _ENCODE_V2)
+    _assign(compact, ("meta", "schema_version"), SCHEMA_V2)
+    return compact
+
+
+def decode_v2(document: dict[str, Any]) -> dict[str, Any]:
+    """Return the v1 layout of a v2 document without modifying or deep-copying the one the driver returned."""
+    if schema_version_of(document) != SCHEMA_V2:
+        return document
+
+    full = _decode(document, _DECODE_V2)
+    _assign(full, ("meta", "schema_version"), SCHEMA_V1)
+    return full
@@ -1,105 +1,238 @@
 from __future__ import annotations
 
-from datetime import datetime
+import copy
+import heapq
+import re
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, time, timedelta
+from pathlib import Path
+from time import monotonic, sleep
 from typing import Any
+from uuid import uuid4
 
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne
 from pymongo.collection import Collection
 from pymongo.database import Database
 
+from mongo_order_id_filter import RedisBloomFilter
+from mongo_order_schema import FIELD_PATHS, SCHEMA_V1, SCHEMA_V2, TIMELINE_KEYS, decode_v2, encode_v2, projection_for
+from mongo_result_cache import AggregationResultCache, closed_date_bucket
 
-class OrdersRepository:
-    def __init__(self, db: Database, collection_name: str = "customer_orders") -> None:
-        self.collection: Collection = db[collection_name]
+# Plan stages that have to consume their whole input before returning the first document.
+BLOCKING_PLAN_STAGES = {"SORT", "GROUP", "HASH_AGG"}
+BLOCKING_PIPELINE_STAGES = {"$sort", "$group", "$bucket", "$bucketAuto", "$facet", "$sortByCount"}
 
-    def create_indexes(self) -> None:
-        self.collection.create_index([("order_id", ASCENDING)], unique=True, name="ux_order_id")
-        self.collection.create_index(
-            [("order.created_at", DESCENDING), ("order.status", ASCENDING)],
+# Commands tagged with this comment prefix are captured by the profiler filter set in enable_stats_profiling.
+STATS_COMMENT_PREFIX = "orders-repo:"
+
+# One entry per collection ("<collection>:v2") records the v2 migration; readers take the layout from it.
+SCHEMA_MIGRATIONS_COLLECTION = "schema_migrations"
+# How long a repository that reads the layout from schema_migrations trusts what it read last.
+SCHEMA_REFRESH_SECONDS = 5.0
+
+
+def order_indexes(fields: dict[str, str]) -> list[IndexModel]:
+    return [
+        IndexModel([(fields["order_id"], ASCENDING)], unique=True, name="ux_order_id"),
+        IndexModel(
+            [(fields["created_at"], DESCENDING), (fields["status"], ASCENDING)],
             name="idx_created_status",
-        )
-        self.collection.create_index(
-            [("customer.id", ASCENDING), ("order.created_at", DESCENDING)],
+        ),
+        IndexModel(
+            [(fields["customer_id"], ASCENDING), (fields["created_at"], DESCENDING)],
             name="idx_customer_created",
-        )
-        self.collection.create_index([("order.items.sku", ASCENDING)], name="idx_items_sku")
-        self.collection.create_index(
+        ),
+        IndexModel([(fields["item_sku"], ASCENDING)], name="idx_items_sku"),
+        IndexModel(
             [
-                ("customer.profile.geo.country", ASCENDING),
-                ("order.channel", ASCENDING),
-                ("order.created_at", DESCENDING),
+                (fields["country"], ASCENDING),
+                (fields["channel"], ASCENDING),
+                (fields["created_at"], DESCENDING),
             ],
             name="idx_country_channel_created",
-        )
+        ),
+    ]
 
-    def replace_all(self, documents: list[dict[str, Any]]) -> int:
-        self.collection.drop()
-        self.create_indexes()
-        if not documents:
-            return 0
-        result = self.collection.insert_many(documents)
-        return len(result.inserted_ids)
 
-    def get_by_order_id(self, order_id: str) -> dict[str, Any] | None:
-        return self.collection.find_one({"order_id": order_id}, {"_id": 0})
+ORDER_INDEXES = order_indexes(FIELD_PATHS[SCHEMA_V1])
+ORDER_INDEXES_V2 = order_indexes(FIELD_PATHS[SCHEMA_V2])
 
-    def find_customer_orders(
+
+def query_shapes(fields: dict[str, str]) -> list[dict[str, Any]]:
+    """Query shapes issued by the repository in ESR terms (equality, sort, range), used by the index advisor."""
+    return [
+        {"name": "get_by_order_id", "equality": [fields["order_id"]], "sort": [], "range": []},
+        {
+            "name": "find_customer_orders",
+            "equality": [fields["customer_id"]],
+            "sort": [(fields["created_at"], DESCENDING)],
+            "range": [fields["created_at"], fields["status"]],
+        },
+        {"name": "gmv_by_day", "equality": [], "sort": [], "range": [fields["created_at"], fields["status"]]},
+        {"name": "top_skus_by_revenue", "equality": [], "sort": [], "range": [fields["created_at"], fields["status"]]},
+        {
+            "name": "country_channel_efficiency",
+            "equality": [fields["country"]],
+            "sort": [],
+            "range": [fields["created_at"]],
+        },
+        {"name": "set_order_status", "equality": [fields["order_id"]], "sort": [], "range": []},
+        {"name": "add_order_note", "equality": [fields["order_id"]], "sort": [], "range": []},
+    ]
+
+
+def write_shapes(fields: dict[str, str]) -> dict[str, list[str]]:
+    """Fields modified by each repository write; "*" means every index is maintained (inserts)."""
+    return {
+        "insert": ["*"],
+        "set_order_status": [fields["status"], fields["status_changed_at"], fields["timeline"]],
+        "add_order_note": [fields["notes"]],
+    }
+
+
+QUERY_SHAPES = query_shapes(FIELD_PATHS[SCHEMA_V1])
+WRITE_SHAPES = write_shapes(FIELD_PATHS[SCHEMA_V1])
+
+
+def stored_layouts(collection: Collection) -> tuple[int, ...]:
+    """Layouts the documents of `collection` are in, newest first, according to its schema_migrations entry.
+
+    No entry means v1. An entry with completed_at means v2. Otherwise a migration has started (or was
+    interrupted) and documents of both layouts exist.
+    """
+    entry = collection.database[SCHEMA_MIGRATIONS_COLLECTION].find_one({"_id": f"{collection.name}:v{SCHEMA_V2}"})
+    if entry is None:
+        return (SCHEMA_V1,)
+    if entry.get("completed_at") is not None:
+        return (SCHEMA_V2,)
+    return (SCHEMA_V2, SCHEMA_V1)
+
+
+def split_window(
+    created_from: datetime,
+    created_to: datetime,
+    segments: int,
+) -> list[tuple[datetime, datetime, bool]]:
+    """Split [created_from, created_to] into half-open sub-ranges; only the last one keeps the inclusive end."""
+    if segments <= 1 or created_to <= created_from:
+        return [(created_from, created_to, True)]
+
+    step = (created_to - created_from) / segments
+    cuts: list[datetime] = []
+    for i in range(1, segments):
+        cut = created_from + step * i
+        if step >= timedelta(days=1):
+            # Day-aligned cuts keep every (day, status) group of gmv_by_day inside one segment.
+            cut = datetime.combine(cut.date(), time.min, tzinfo=cut.tzinfo)
+        if cut <= created_from or (cuts and cut <= cuts[-1]):
+            continue
+        cuts.append(cut)
+
+    bounds = [created_from, *cuts, created_to]
+    return [(bounds[i], bounds[i + 1], i == len(bounds) - 2) for i in range(len(bounds) - 1)]
+
+
+def merge_gmv_by_day(parts: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    merged: dict[tuple[str, str], dict[str, Any]] = {}
+    for rows in parts:
+        for row in rows:
+            key = (row["_id"]["day"], row["_id"]["status"])
+            total = merged.setdefault(key, {"_id": dict(row["_id"]), "orders": 0, "gmv": 0})
+            total["orders"] += row["orders"]
+            total["gmv"] += row["gmv"]
+    return [merged[key] for key in sorted(merged)]
+
+
+def merge_top_skus(parts: list[list[dict[str, Any]]], limit: int) -> list[dict[str, Any]]:
+    merged: dict[str, dict[str, Any]] = {}
+    for rows in parts:
+        for row in rows:
+            total = merged.setdefault(row["_id"], {"_id": row["_id"], "units": 0, "revenue": 0})
+            total["units"] += row["units"]
+            total["revenue"] += row["revenue"]
+    # Ties break on the SKU like the single-query $sort, so both paths cut the same rows.
+    return sorted(merged.values(), key=lambda row: (-row["revenue"], row["_id"]))[:limit]
+
+
+def merge_country_channel(parts: list[list[dict[str, Any]]]) -> list[dict[str, Any]]:
+    # Segment averages are re-weighted by their order counts to get the average over the whole window.
+    totals: dict[str, dict[str, float]] = {}
+    for rows in parts:
+        for row in rows:
+            total = totals.setdefault(row["_id"], {"orders": 0, "amount": 0.0, "high_risk": 0.0})
+            total["orders"] += row["orders"]
+            total["amount"] += row["avg_check"] * row["orders"]
+            total["high_risk"] += row["high_risk_share"] * row["orders"]
+
+    merged = [
+        {
+            "_id": channel,
+            "orders": total["orders"],
+            "avg_check": total["amount"] / total["orders"],
+            "high_risk_share": total["high_risk"] / total["orders"],
+        }
+        for channel, total in totals.items()
+        if total["orders"]
+    ]
+    return sorted(merged, key=lambda row: (-row["orders"], row["_id"]))
+
+
+class OrdersQueryBuilder:
+    """Filters, pipelines and explain helpers shared by the sync and async repositories."""
+
+    collection_name: str
+    schema_version: int = SCHEMA_V1
+
+    @property
+    def fields(self) -> dict[str, str]:
+        return FIELD_PATHS[self.schema_version]
+
+    @property
+    def indexes(self) -> list[IndexModel]:
+        return ORDER_INDEXES_V2 if self.schema_version == SCHEMA_V2 else ORDER_INDEXES
+
+    def encode_document(self, document: dict[str, Any]) -> dict[str, Any]:
+        return encode_v2(document) if self.schema_version == SCHEMA_V2 else document
+
+    def decode_document(self, document: dict[str, Any] | None) -> dict[str, Any] | None:
+        return decode_v2(document) if document is not None else None
+
+    @staticmethod
+    def _created_range(created_from: datetime, created_to: datetime, end_inclusive: bool = True) -> dict[str, Any]:
+        return {"$gte": created_from, "$lte" if end_inclusive else "$lt": created_to}
+
+    def _customer_orders_filter(
         self,
         customer_id: str,
         created_from: datetime,
         created_to: datetime,
-        statuses: list[str] | None = None,
-        limit: int = 50,
-    ) -> list[dict[str, Any]]:
+        statuses: list[str] | None,
+    ) -> dict[str, Any]:
+        f = self.fields
         query: dict[str, Any] = {
-            "customer.id": customer_id,
-            "order.created_at": {"$gte": created_from, "$lte": created_to},
+            f["customer_id"]: customer_id,
+            f["created_at"]: self._created_range(created_from, created_to),
         }
         if statuses:
-            query["order.status"] = {"$in": statuses}
-
-        cursor = (
-            self.collection.find(query, {"_id": 0})
-            .hint("idx_customer_created")
-            .sort("order.created_at", DESCENDING)
-            .limit(limit)
-        )
-        return list(cursor)
-
-    def set_order_status(self, order_id: str, new_status: str, changed_at: datetime) -> bool:
-        result = self.collection.update_one(
-            {"order_id": order_id},
-            {
-                "$set": {"order.status": new_status, "order.status_changed_at": changed_at},
-                "$push": {
-                    "order.timeline": {
-                        "at": changed_at,
-                        "status": new_status,
-                        "source": "system",
-                    }
-                },
-            },
-        )
-        return result.modified_count > 0
-
-    def add_order_note(self, order_id: str, note: dict[str, Any]) -> bool:
-        result = self.collection.update_one({"order_id": order_id}, {"$push": {"order.notes": note}})
-        return result.modified_count > 0
+            query[f["status"]] = {"$in": statuses}
+        return query
 
-    def gmv_by_day(
+    def _gmv_by_day_pipeline(
         self,
         created_from: datetime,
         created_to: datetime,
-        statuses: list[str] | None = None,
-        explain: bool = False,
-    ) -> dict[str, Any] | list[dict[str, Any]]:
+        statuses: list[str] | None,
+        end_inclusive: bool = True,
+    ) -> list[dict[str, Any]]:
+        f = self.fields
         match_filter: dict[str, Any] = {
-            "order.created_at": {"$gte": created_from, "$lte": created_to},
+            f["created_at"]: self._created_range(created_from, created_to, end_inclusive),
         }
         if statuses:
-            match_filter["order.status"] = {"$in": statuses}
+            match_filter[f["status"]] = {"$in": statuses}
 
-        pipeline = [
+        return [
             {"$match": match_filter},
             {
                 "$group": {
@@ -107,105 +240,144 @@ class OrdersRepository:
                         "day": {
                             "$dateToString": {
                                 "format": "%Y-%m-%d",
-                                "date": "$order.created_at",
+                                "date": f"${f['created_at']}",
                             }
                         },
-                        "status": "$order.status",
+                        "status": f"${f['status']}",
                     },
                     "orders": {"$sum": 1},
-                    "gmv": {"$sum": "$order.total.amount"},
+                    "gmv": {"$sum": f"${f['amount']}"},
                 }
             },
             {"$sort": {"_id.day": 1, "_id.status": 1}},
         ]
-        return self._run_aggregate_with_optional_explain(pipeline, "idx_created_status", explain)
 
-    def top_skus_by_revenue(
+    def _top_skus_pipeline(
         self,
         created_from: datetime,
         created_to: datetime,
-        limit: int = 10,
-        explain: bool = False,
-    ) -> dict[str, Any] | list[dict[str, Any]]:
-        pipeline = [
+        limit: int | None,
+        end_inclusive: bool = True,
+    ) -> list[dict[str, Any]]:
+        f = self.fields
+        pipeline: list[dict[str, Any]] = [
             {
                 "$match": {
-                    "order.created_at": {"$gte": created_from, "$lte": created_to},
-                    "order.status": {"$in": ["paid", "shipped", "delivered"]},
+                    f["created_at"]: self._created_range(created_from, created_to, end_inclusive),
+                    f["status"]: {"$in": ["paid", "shipped", "delivered"]},
                 }
             },
-            {"$unwind": "$order.items"},
+            {"$unwind": f"${f['items']}"},
             {
                 "$group": {
-                    "_id": "$order.items.sku",
-                    "units": {"$sum": "$order.items.quantity"},
+                    "_id": f"${f['item_sku']}",
+                    "units": {"$sum": f"${f['item_quantity']}"},
                     "revenue": {
                         "$sum": {
                             "$multiply": [
-                                "$order.items.quantity",
-                                "$order.items.unit_price",
+                                f"${f['item_quantity']}",
+                                f"${f['item_unit_price']}",
                             ]
                         }
                     },
                 }
             },
-            {"$sort": {"revenue": -1}},
-            {"$limit": limit},
         ]
-        return self._run_aggregate_with_optional_explain(pipeline, "idx_created_status", explain)
+        # Scatter segments skip the top-N cut: revenue has to be merged across segments first.
+        if limit is not None:
+            pipeline += [{"$sort": {"revenue": -1, "_id": 1}}, {"$limit": limit}]
+        return pipeline
 
-    def country_channel_efficiency(
+    def _country_channel_pipeline(
         self,
         created_from: datetime,
         created_to: datetime,
         country: str,
-        explain: bool = False,
-    ) -> dict[str, Any] | list[dict[str, Any]]:
-        pipeline = [
+        end_inclusive: bool = True,
+    ) -> list[dict[str, Any]]:
+        f = self.fields
+        return [
             {
                 "$match": {
-                    "customer.profile.geo.country": country,
-                    "order.created_at": {"$gte": created_from, "$lte": created_to},
+                    f["country"]: country,
+                    f["created_at"]: self._created_range(created_from, created_to, end_inclusive),
                 }
             },
             {
                 "$group": {
-                    "_id": "$order.channel",
+                    "_id": f"${f['channel']}",
                     "orders": {"$sum": 1},
-                    "avg_check": {"$avg": "$order.total.amount"},
+                    "avg_check": {"$avg": f"${f['amount']}"},
                     "high_risk_share": {
                         "$avg": {
-                            "$cond": [{"$gte": ["$risk.score", 70]}, 1, 0]
+                            "$cond": [{"$gte": [f"${f['risk_score']}", 70]}, 1, 0]
                         }
                     },
                 }
             },
-            {"$sort": {"orders": -1}},
+            {"$sort": {"orders": -1, "_id": 1}},
         ]
-        return self._run_aggregate_with_optional_explain(
-            pipeline,
-            "idx_country_channel_created",
-            explain,
-        )
 
-    def _run_aggregate_with_optional_explain(
-        self,
-        pipeline: list[dict[str, Any]],
-        hint_name: str,
-        explain: bool,
-    ) -> dict[str, Any] | list[dict[str, Any]]:
-        if explain:
-            return self.collection.database.command(
-                {
-                    "aggregate": self.collection.name,
-                    "pipeline": pipeline,
-                    "cursor": {},
-                    "hint": hint_name,
-                    "explain": True,
+    def _aggregate_command(self, pipeline: list[dict[str, Any]], hint_name: str) -> dict[str, Any]:
+        return {
+            "aggregate": self.collection_name,
+            "pipeline": pipeline,
+            "cursor": {},
+            "hint": hint_name,
+        }
+
+    def _status_update(self, new_status: str, changed_at: datetime) -> dict[str, Any]:
+        f = self.fields
+        timeline_keys = TIMELINE_KEYS[self.schema_version]
+        return {
+            "$set": {f["status"]: new_status, f["status_changed_at"]: changed_at},
+            "$push": {
+                f["timeline"]: {
+                    timeline_keys["at"]: changed_at,
+                    timeline_keys["status"]: new_status,
+                    timeline_keys["source"]: "system",
                 }
-            )
+            },
+        }
 
-        return list(self.collection.aggregate(pipeline, hint=hint_name, allowDiskUse=True))
+    def _profile_commands(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        order_id: str,
+        customer_id: str,
+        country: str,
+        statuses: list[str] | None,
+    ) -> dict[str, dict[str, Any]]:
+        return {
+            "get_by_order_id": {
+                "find": self.collection_name,
+                "filter": {self.fields["order_id"]: order_id},
+                "projection": {"_id": 0},
+                "limit": 1,
+                "singleBatch": True,
+            },
+            "find_customer_orders": {
+                "find": self.collection_name,
+                "filter": self._customer_orders_filter(customer_id, created_from, created_to, statuses),
+                "projection": {"_id": 0},
+                "sort": {self.fields["created_at"]: DESCENDING},
+                "limit": 50,
+                "hint": "idx_customer_created",
+            },
+            "gmv_by_day": self._aggregate_command(
+                self._gmv_by_day_pipeline(created_from, created_to, statuses),
+                "idx_created_status",
+            ),
+            "top_skus_by_revenue": self._aggregate_command(
+                self._top_skus_pipeline(created_from, created_to, 10),
+                "idx_created_status",
+            ),
+            "country_channel_efficiency": self._aggregate_command(
+                self._country_channel_pipeline(created_from, created_to, country),
+                "idx_country_channel_created",
+            ),
+        }
 
     @staticmethod
     def extract_used_indexes(explain_doc: dict[str, Any]) -> list[str]:
@@ -227,3 +399,603 @@ class OrdersRepository:
 
         walk(explain_doc)
         return sorted(indexes)
+
+    @staticmethod
+    def analyze_plan(explain_doc: dict[str, Any]) -> dict[str, Any]:
+        stats_docs: list[dict[str, Any]] = []
+        plan_stages: set[str] = set()
+        blocking: list[str] = []
+
+        def walk(node: Any, in_rejected: bool = False) -> None:
+            if isinstance(node, dict):
+                stage = node.get("stage")
+                if isinstance(stage, str) and not in_rejected:
+                    plan_stages.add(stage)
+                    if stage in BLOCKING_PLAN_STAGES and stage not in blocking:
+                        blocking.append(stage)
+                for name in BLOCKING_PIPELINE_STAGES.intersection(node):
+                    if name not in blocking:
+                        blocking.append(name)
+                for key, value in node.items():
+                    if key == "executionStats" and isinstance(value, dict):
+                        stats_docs.append(value)
+                    walk(value, in_rejected or key in {"rejectedPlans", "allPlansExecution"})
+                return
+
+            if isinstance(node, list):
+                for item in node:
+                    walk(item, in_rejected)
+
+        walk(explain_doc)
+
+        keys_examined = sum(int(doc.get("totalKeysExamined", 0)) for doc in stats_docs)
+        docs_examined = sum(int(doc.get("totalDocsExamined", 0)) for doc in stats_docs)
+        n_matched = sum(int(doc.get("nReturned", 0)) for doc in stats_docs)
+        execution_ms = sum(int(doc.get("executionTimeMillis", 0)) for doc in stats_docs)
+
+        # Aggregations report documents leaving the last pipeline stage separately from the query layer.
+        n_returned = n_matched
+        stages = explain_doc.get("stages")
+        if isinstance(stages, list) and stages and isinstance(stages[-1], dict) and "nReturned" in stages[-1]:
+            n_returned = int(stages[-1]["nReturned"])
+
+        scanned = max(keys_examined, docs_examined)
+        return {
+            "used_indexes": OrdersQueryBuilder.extract_used_indexes(explain_doc),
+            "collscan": "COLLSCAN" in plan_stages,
+            "keys_examined": keys_examined,
+            "docs_examined": docs_examined,
+            "n_matched": n_matched,
+            "n_returned": n_returned,
+            "execution_time_ms": execution_ms,
+            "blocking_stages": blocking,
+            "selectivity": round(n_matched / scanned, 4) if scanned else None,
+            "docs_examined_per_matched": round(docs_examined / n_matched, 2) if n_matched else None,
+        }
+
+    @staticmethod
+    def summarize_profile_entries(entries: list[dict[str, Any]]) -> dict[str, Any]:
+        if not entries:
+            return {"source": "mongo", "profiled": False}
+
+        # getMore entries continue the original aggregate and carry no plan summary of their own.
+        plan_summary = next((e["planSummary"] for e in entries if e.get("planSummary")), "")
+        keys_examined = sum(int(e.get("keysExamined", 0)) for e in entries)
+        docs_examined = sum(int(e.get("docsExamined", 0)) for e in entries)
+        n_returned = sum(int(e.get("nreturned", 0)) for e in entries)
+        blocking = ["SORT"] if any(e.get("hasSortStage") for e in entries) else []
+
+        return {
+            "source": "mongo",
+            "profiled": True,
+            "plan_summary": plan_summary,
+            "used_indexes": OrdersQueryBuilder.index_names_from_plan_summary(plan_summary),
+            "collscan": "COLLSCAN" in plan_summary,
+            "keys_examined": keys_examined,
+            "docs_examined": docs_examined,
+            "n_returned": n_returned,
+            "execution_time_ms": sum(int(e.get("millis", 0)) for e in entries),
+            "blocking_stages": blocking,
+            "used_disk": any(e.get("usedDisk") for e in entries),
+        }
+
+    @staticmethod
+    def index_names_from_plan_summary(plan_summary: str) -> list[str]:
+        patterns = {}
+        for model in ORDER_INDEXES + ORDER_INDEXES_V2:
+            key_pattern = ", ".join(f"{field}: {direction}" for field, direction in model.document["key"].items())
+            patterns[key_pattern] = model.document["name"]
+        names = {
+            patterns.get(match.strip(), match.strip())
+            for match in re.findall(r"IXSCAN \{ (.*?) \}", plan_summary)
+        }
+        return sorted(names)
+
+
+class OrdersRepository(OrdersQueryBuilder):
+    """Orders in either document layout; with schema_version=None the layout comes from schema_migrations.
+
+    While a v2 migration is under way, reads go to both layouts and are merged, so documents are found
+    whichever side of the migration they are on. Hints still name the v1 index set until the migration
+    completes, so reads of migrated documents scan the hinted index instead of seeking it.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        collection_name: str = "customer_orders",
+        result_cache: AggregationResultCache | None = None,
+        schema_version: int | None = None,
+        parallel_segments: int = 1,
+        order_id_filter: RedisBloomFilter | None = None,
+    ) -> None:
+        self.collection: Collection = db[collection_name]
+        self.collection_name = collection_name
+        self.result_cache = result_cache
+        self._schema_version = schema_version
+        self._stored_layouts: tuple[int, ...] = ()
+        self._layouts_read_at = float("-inf")
+        self.parallel_segments = parallel_segments
+        self.order_id_filter = order_id_filter
+
+    @property
+    def layouts(self) -> tuple[int, ...]:
+        """Document layouts reads have to cover, newest first."""
+        if self._schema_version is not None:
+            return (self._schema_version,)
+        if monotonic() - self._layouts_read_at >= SCHEMA_REFRESH_SECONDS:
+            self._stored_layouts = stored_layouts(self.collection)
+            self._layouts_read_at = monotonic()
+        return self._stored_layouts
+
+    @property
+    def schema_version(self) -> int:
+        """The layout new documents are written in."""
+        return self.layouts[0]
+
+    @property
+    def migrating(self) -> bool:
+        return len(self.layouts) > 1
+
+    def _layout_views(self) -> list[OrdersRepository]:
+        if not self.migrating:
+            return [self]
+        # One single-layout copy per layout. Results covering only part of the collection must not be cached.
+        views = []
+        for version in self.layouts:
+            view = copy.copy(self)
+            view._schema_version = version
+            view.result_cache = None
+            views.append(view)
+        return views
+
+    def _merge_layouts(
+        self,
+        read: Callable[[OrdersRepository], Any],
+        merge: Callable[[list[list[dict[str, Any]]]], list[dict[str, Any]]],
+        explain: bool,
+        with_stats: bool,
+    ) -> dict[str, Any] | list[dict[str, Any]] | tuple[list[dict[str, Any]], dict[str, Any]]:
+        parts = {view.schema_version: read(view) for view in self._layout_views()}
+        if explain:
+            return {"layouts": parts}
+        if with_stats:
+            rows = merge([rows for rows, _ in parts.values()])
+            return rows, {"layouts": {version: stats for version, (_, stats) in parts.items()}}
+        return merge(list(parts.values()))
+
+    def _record_layout(self, version: int) -> None:
+        entries = self.collection.database[SCHEMA_MIGRATIONS_COLLECTION]
+        entry_id = f"{self.collection_name}:v{SCHEMA_V2}"
+        if version == SCHEMA_V2:
+            now = datetime.now(UTC)
+            entries.update_one(
+                {"_id": entry_id},
+                {"$set": {"started_at": now, "completed_at": now}, "$unset": {"last_id": ""}},
+                upsert=True,
+            )
+        else:
+            entries.delete_one({"_id": entry_id})
+        self._layouts_read_at = float("-inf")
+
+    def create_indexes(self) -> None:
+        self.collection.create_indexes(self.indexes)
+
+    def replace_all(self, documents: list[dict[str, Any]]) -> int:
+        # The filter is updated before the writes: an id in the filter without a document only costs a query,
+        # a document missing from the filter would be unreachable through get_by_order_id.
+        if self.order_id_filter is not None:
+            self.order_id_filter.rebuild(doc["order_id"] for doc in documents)
+        version = self.schema_version
+        self.collection.drop()
+        self._record_layout(version)
+        self.create_indexes()
+        if not documents:
+            return 0
+        result = self.collection.insert_many([self.encode_document(doc) for doc in documents])
+        return len(result.inserted_ids)
+
+    def insert_orders(self, documents: list[dict[str, Any]]) -> int:
+        if not documents:
+            return 0
+        if self.order_id_filter is not None:
+            self.order_id_filter.add_many(doc["order_id"] for doc in documents)
+        result = self.collection.insert_many([self.encode_document(doc) for doc in documents])
+        return len(result.inserted_ids)
+
+    def rebuild_order_id_filter(self, batch_size: int = 10000) -> int:
+        if self.order_id_filter is None:
+            raise ValueError("OrdersRepository was created without an order_id_filter")
+        # Mid-migration the ids of both layouts go in, or unmigrated orders would become unreachable.
+        fields = [FIELD_PATHS[version]["order_id"] for version in self.layouts]
+        cursor = self.collection.find({}, {"_id": 0, **{field: 1 for field in fields}}).batch_size(batch_size)
+        ids = (doc[field] for doc in cursor for field in fields if field in doc)
+        return self.order_id_filter.rebuild(ids, batch_size)
+
+    def get_by_order_id(self, order_id: str) -> dict[str, Any] | None:
+        if self.order_id_filter is not None and not self.order_id_filter.might_contain(order_id):
+            return None
+        for view in self._layout_views():
+            document = view.collection.find_one({view.fields["order_id"]: order_id}, {"_id": 0})
+            if document is not None:
+                return self.decode_document(document)
+        return None
+
+    def find_customer_orders(
+        self,
+        customer_id: str,
+        created_from: datetime,
+        created_to: datetime,
+        statuses: list[str] | None = None,
+        limit: int = 50,
+    ) -> list[dict[str, Any]]:
+        if self.migrating:
+            orders = [
+                order
+                for view in self._layout_views()
+                for order in view.find_customer_orders(customer_id, created_from, created_to, statuses, limit)
+            ]
+            return sorted(orders, key=lambda order: order["order"]["created_at"], reverse=True)[:limit]
+
+        query = self._customer_orders_filter(customer_id, created_from, created_to, statuses)
+        cursor = (
+            self.collection.find(query, {"_id": 0})
+            .hint("idx_customer_created")
+            .sort(self.fields["created_at"], DESCENDING)
+            .limit(limit)
+        )
+        return [self.decode_document(doc) for doc in cursor]
+
+    def iter_orders(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        paths: list[str],
+        batch_size: int = 5000,
+    ) -> Iterator[dict[str, Any]]:
+        if self.migrating:
+            # Each layout streams in created_at order; merging on it keeps the combined stream in order.
+            created_at = FIELD_PATHS[SCHEMA_V1]["created_at"]
+            if not any(created_at == path or created_at.startswith(f"{path}.") for path in paths):
+                paths = [*paths, created_at]
+            streams = [view.iter_orders(created_from, created_to, paths, batch_size) for view in self._layout_views()]
+            yield from heapq.merge(*streams, key=lambda order: order["order"]["created_at"])
+            return
+
+        cursor = (
+            self.collection.find(
+                {self.fields["created_at"]: self._created_range(created_from, created_to)},
+                {"_id": 0, **projection_for(paths, self.schema_version)},
+            )
+            .hint("idx_created_status")
+            .sort(self.fields["created_at"], ASCENDING)
+            .batch_size(batch_size)
+        )
+        for document in cursor:
+            yield self.decode_document(document)
+
+    def export_parquet(
+        self,
+        output_dir: Path,
+        created_from: datetime,
+        created_to: datetime,
+        batch_size: int = 5000,
+        compression: str = "zstd",
+        progress: Callable[[dict[str, Any]], None] | None = None,
+    ) -> dict[str, Any]:
+        # pyarrow is only needed for exports, keep it out of the import path of the repository.
+        from mongo_orders_export import export_orders_parquet
+
+        return export_orders_parquet(self, output_dir, created_from, created_to, batch_size, compression, progress)
+
+    def set_order_status(self, order_id: str, new_status: str, changed_at: datetime) -> bool:
+        for view in self._layout_views():
+            # The creation time comes back with the update and tells whether cached closed days just changed.
+            before = view.collection.find_one_and_update(
+                {view.fields["order_id"]: order_id},
+                view._status_update(new_status, changed_at),
+                projection={"_id": 0, view.fields["created_at"]: 1, "meta.schema_version": 1},
+            )
+            if before is not None:
+                created_at = view.decode_document(before)["order"]["created_at"]
+                if self.result_cache is not None and closed_date_bucket(created_at, created_at) is not None:
+                    self.result_cache.invalidate(self.collection.full_name)
+                return True
+        return False
+
+    def add_order_note(self, order_id: str, note: dict[str, Any]) -> bool:
+        return any(
+            view.collection.update_one(
+                {view.fields["order_id"]: order_id},
+                {"$push": {view.fields["notes"]: note}},
+            ).modified_count
+            > 0
+            for view in self._layout_views()
+        )
+
+    def migrate_to_v2(
+        self,
+        batch_size: int = 500,
+        max_batches: int | None = None,
+        announce_wait_seconds: float = SCHEMA_REFRESH_SECONDS,
+    ) -> dict[str, Any]:
+        checkpoints = self.collection.database[SCHEMA_MIGRATIONS_COLLECTION]
+        checkpoint_id = f"{self.collection_name}:v{SCHEMA_V2}"
+        checkpoint = checkpoints.find_one({"_id": checkpoint_id}) or {}
+        last_id = checkpoint.get("last_id")
+        migrated = 0
+        batches = 0
+        self._prepare_unique_indexes_for_migration()
+        if "started_at" not in checkpoint:
+            # Announce the migration and give repositories reading the layout from schema_migrations one
+            # refresh to start reading both layouts before the first document changes shape.
+            checkpoints.update_one({"_id": checkpoint_id}, {"$set": {"started_at": datetime.now(UTC)}}, upsert=True)
+            sleep(announce_wait_seconds)
+
+        while max_batches is None or batches < max_batches:
+            query: dict[str, Any] = {"meta.schema_version": {"$ne": SCHEMA_V2}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = list(self.collection.find(query).sort("_id", ASCENDING).limit(batch_size))
+            if not batch:
+                break
+
+            # The version guard keeps a rerun after a crash from re-encoding already migrated documents.
+            self.collection.bulk_write(
+                [
+                    ReplaceOne({"_id": doc["_id"], "meta.schema_version": {"$ne": SCHEMA_V2}}, encode_v2(doc))
+                    for doc in batch
+                ],
+                ordered=False,
+            )
+            last_id = batch[-1]["_id"]
+            migrated += len(batch)
+            batches += 1
+            checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "updated_at": datetime.now(UTC)}, "$inc": {"migrated": len(batch)}},
+                upsert=True,
+            )
+
+        remaining = self.collection.count_documents({"meta.schema_version": {"$ne": SCHEMA_V2}})
+        if remaining == 0:
+            # v1 and v2 indexes share names, so the old set has to go before the compact one is built.
+            self.collection.drop_indexes()
+            self.collection.create_indexes(ORDER_INDEXES_V2)
+            checkpoints.update_one({"_id": checkpoint_id}, {"$set": {"completed_at": datetime.now(UTC)}}, upsert=True)
+            if self._schema_version is not None:
+                self._schema_version = SCHEMA_V2
+            self._layouts_read_at = float("-inf")
+
+        return {"migrated": migrated, "batches": batches, "remaining": remaining, "last_id": last_id}
+
+    def _prepare_unique_indexes_for_migration(self) -> None:
+        # A plain unique index treats the missing v1 order_id of migrated documents as duplicate nulls,
+        # so uniqueness is enforced by partial indexes on both layouts until the migration completes.
+        existing = self.collection.index_information()
+        if "ux_order_id" in existing and "partialFilterExpression" not in existing["ux_order_id"]:
+            self.collection.drop_index("ux_order_id")
+        self.collection.create_indexes(
+            [
+                IndexModel(
+                    [(FIELD_PATHS[SCHEMA_V1]["order_id"], ASCENDING)],
+                    unique=True,
+                    name="ux_order_id",
+                    partialFilterExpression={FIELD_PATHS[SCHEMA_V1]["order_id"]: {"$exists": True}},
+                ),
+                IndexModel(
+                    [(FIELD_PATHS[SCHEMA_V2]["order_id"], ASCENDING)],
+                    unique=True,
+                    name="ux_order_id_v2",
+                    partialFilterExpression={FIELD_PATHS[SCHEMA_V2]["order_id"]: {"$exists": True}},
+                ),
+            ]
+        )
+
+    def gmv_by_day(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        statuses: list[str] | None = None,
+        explain: bool = False,
+        with_stats: bool = False,
+    ) -> dict[str, Any] | list[dict[str, Any]] | tuple[list[dict[str, Any]], dict[str, Any]]:
+        if self.migrating:
+            return self._merge_layouts(
+                lambda view: view.gmv_by_day(created_from, created_to, statuses, explain, with_stats),
+                merge_gmv_by_day,
+                explain,
+                with_stats,
+            )
+        pipeline = self._gmv_by_day_pipeline(created_from, created_to, statuses)
+        return self._run_aggregate(
+            pipeline,
+            "idx_created_status",
+            explain,
+            with_stats,
+            closed_date_bucket(created_from, created_to),
+            lambda: merge_gmv_by_day(
+                self._scatter(
+                    lambda start, end, inclusive: self._gmv_by_day_pipeline(start, end, statuses, inclusive),
+                    "idx_created_status",
+                    created_from,
+                    created_to,
+                )
+            ),
+        )
+
+    def top_skus_by_revenue(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        limit: int = 10,
+        explain: bool = False,
+        with_stats: bool = False,
+    ) -> dict[str, Any] | list[dict[str, Any]] | tuple[list[dict[str, Any]], dict[str, Any]]:
+        if self.migrating:
+            return self._merge_layouts(
+                lambda view: view.top_skus_by_revenue(created_from, created_to, limit, explain, with_stats),
+                lambda parts: merge_top_skus(parts, limit),
+                explain,
+                with_stats,
+            )
+        pipeline = self._top_skus_pipeline(created_from, created_to, limit)
+        return self._run_aggregate(
+            pipeline,
+            "idx_created_status",
+            explain,
+            with_stats,
+            closed_date_bucket(created_from, created_to),
+            lambda: merge_top_skus(
+                self._scatter(
+                    lambda start, end, inclusive: self._top_skus_pipeline(start, end, None, inclusive),
+                    "idx_created_status",
+                    created_from,
+                    created_to,
+                ),
+                limit,
+            ),
+        )
+
+    def country_channel_efficiency(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        country: str,
+        explain: bool = False,
+        with_stats: bool = False,
+    ) -> dict[str, Any] | list[dict[str, Any]] | tuple[list[dict[str, Any]], dict[str, Any]]:
+        if self.migrating:
+            return self._merge_layouts(
+                lambda view: view.country_channel_efficiency(created_from, created_to, country, explain, with_stats),
+                merge_country_channel,
+                explain,
+                with_stats,
+            )
+        pipeline = self._country_channel_pipeline(created_from, created_to, country)
+        return self._run_aggregate(
+            pipeline,
+            "idx_country_channel_created",
+            explain,
+            with_stats,
+            closed_date_bucket(created_from, created_to),
+            lambda: merge_country_channel(
+                self._scatter(
+                    lambda start, end, inclusive: self._country_channel_pipeline(start, end, country, inclusive),
+                    "idx_country_channel_created",
+                    created_from,
+                    created_to,
+                )
+            ),
+        )
+
+    def profile_queries(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        order_id: str,
+        customer_id: str,
+        country: str,
+        statuses: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        commands = self._profile_commands(created_from, created_to, order_id, customer_id, country, statuses)
+        report = []
+        for name, command in commands.items():
+            explain_doc = self.explain_command(command, verbosity="executionStats")
+            report.append({"query": name, **self.analyze_plan(explain_doc)})
+        return report
+
+    def explain_command(self, command: dict[str, Any], verbosity: str = "executionStats") -> dict[str, Any]:
+        return self.collection.database.command({"explain": command, "verbosity": verbosity})
+
+    def enable_stats_profiling(self) -> None:
+        comment_filter = {"$regex": f"^{re.escape(STATS_COMMENT_PREFIX)}"}
+        self.collection.database.command(
+            {
+                "profile": 1,
+                "filter": {
+                    "$or": [
+                        {"command.comment": comment_filter},
+                        {"originatingCommand.comment": comment_filter},
+                    ]
+                },
+            }
+        )
+
+    def aggregate_with_stats(
+        self,
+        pipeline: list[dict[str, Any]],
+        hint_name: str,
+    ) -> tuple[list[dict[str, Any]], dict[str, Any]]:
+        comment = f"{STATS_COMMENT_PREFIX}{uuid4().hex}"
+        rows = list(
+            self.collection.aggregate(pipeline, hint=hint_name, allowDiskUse=True, comment=comment)
+        )
+        entries = list(
+            self.collection.database["system.profile"].find(
+                {"$or": [{"command.comment": comment}, {"originatingCommand.comment": comment}]},
+                {"command.pipeline": 0, "originatingCommand.pipeline": 0},
+            )
+        )
+        return rows, self.summarize_profile_entries(entries)
+
+    def _run_aggregate(
+        self,
+        pipeline: list[dict[str, Any]],
+        hint_name: str,
+        explain: bool,
+        with_stats: bool,
+        date_bucket: str | None,
+        scatter_gather: Callable[[], list[dict[str, Any]]] | None = None,
+    ) -> dict[str, Any] | list[dict[str, Any]] | tuple[list[dict[str, Any]], dict[str, Any]]:
+        if explain:
+            return self._run_aggregate_with_optional_explain(pipeline, hint_name, explain)
+
+        cache_key = None
+        if self.result_cache is not None and date_bucket is not None:
+            cache_key = self.result_cache.make_key(
+                pipeline, date_bucket, namespace=self.collection.full_name, hint=hint_name
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return (cached, {"source": "cache"}) if with_stats else cached
+
+        if with_stats:
+            rows, stats = self.aggregate_with_stats(pipeline, hint_name)
+        elif scatter_gather is not None and self.parallel_segments > 1:
+            rows = scatter_gather()
+        else:
+            rows = self._run_aggregate_with_optional_explain(pipeline, hint_name, explain=False)
+
+        if cache_key is not None:
+            self.result_cache.set(cache_key, rows)
+        return (rows, stats) if with_stats else rows
+
+    def _scatter(
+        self,
+        build_pipeline: Callable[[datetime, datetime, bool], list[dict[str, Any]]],
+        hint_name: str,
+        created_from: datetime,
+        created_to: datetime,
+    ) -> list[list[dict[str, Any]]]:
+        segments = split_window(created_from, created_to, self.parallel_segments)
+
+        def run(segment: tuple[datetime, datetime, bool]) -> list[dict[str, Any]]:
+            pipeline = build_pipeline(*segment)
+            return list(self.collection.aggregate(pipeline, hint=hint_name, allowDiskUse=True))
+
+        with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+            return list(pool.map(run, segments))
+
+    def _run_aggregate_with_optional_explain(
+        self,
+        pipeline: list[dict[str, Any]],
+        hint_name: str,
+        explain: bool,
+    ) -> dict[str, Any] | list[dict[str, Any]]:
+        if explain:
+            return self.collection.database.command(
+                {**self._aggregate_command(pipeline, hint_name), "explain": True}
+            )
+
+        return list(self.collection.aggregate(pipeline, hint=hint_name, allowDiskUse=True))
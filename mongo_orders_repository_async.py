@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from pymongo import DESCENDING
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
+
+from mongo_order_schema import SCHEMA_V1
+from mongo_orders_repository import OrdersQueryBuilder
+
+
+class AsyncOrdersRepository(OrdersQueryBuilder):
+    def __init__(
+        self,
+        db: AsyncDatabase,
+        collection_name: str = "customer_orders",
+        schema_version: int = SCHEMA_V1,
+    ) -> None:
+        self.collection: AsyncCollection = db[collection_name]
+        self.collection_name = collection_name
+        self.schema_version = schema_version
+
+    async def create_indexes(self) -> None:
+        await self.collection.create_indexes(self.indexes)
+
+    async def replace_all(self, documents: list[dict[str, Any]]) -> int:
+        await self.collection.drop()
+        await self.create_indexes()
+        if not documents:
+            return 0
+        result = await self.collection.insert_many([self.encode_document(doc) for doc in documents])
+        return len(result.inserted_ids)
+
+    async def get_by_order_id(self, order_id: str) -> dict[str, Any] | None:
+        document = await self.collection.find_one({self.fields["order_id"]: order_id}, {"_id": 0})
+        return self.decode_document(document)
+
+    async def find_customer_orders(
+        self,
+        customer_id: str,
+        created_from: datetime,
+        created_to: datetime,
+        statuses: list[str] | None = None,
+        limit: int = 50,
+    ) -> list[dict[str, Any]]:
+        query = self._customer_orders_filter(customer_id, created_from, created_to, statuses)
+        cursor = (
+            self.collection.find(query, {"_id": 0})
+            .hint("idx_customer_created")
+            .sort(self.fields["created_at"], DESCENDING)
+            .limit(limit)
+        )
+        return [self.decode_document(doc) for doc in await cursor.to_list()]
+
+    async def set_order_status(self, order_id: str, new_status: str, changed_at: datetime) -> bool:
+        result = await self.collection.update_one(
+            {self.fields["order_id"]: order_id},
+            self._status_update(new_status, changed_at),
+        )
+        return result.modified_count > 0
+
+    async def add_order_note(self, order_id: str, note: dict[str, Any]) -> bool:
+        result = await self.collection.update_one(
+            {self.fields["order_id"]: order_id},
+            {"$push": {self.fields["notes"]: note}},
+        )
+        return result.modified_count > 0
+
+    async def gmv_by_day(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        statuses: list[str] | None = None,
+        explain: bool = False,
+    ) -> dict[str, Any] | list[dict[str, Any]]:
+        pipeline = self._gmv_by_day_pipeline(created_from, created_to, statuses)
+        return await self._run_aggregate_with_optional_explain(pipeline, "idx_created_status", explain)
+
+    async def top_skus_by_revenue(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        limit: int = 10,
+        explain: bool = False,
+    ) -> dict[str, Any] | list[dict[str, Any]]:
+        pipeline = self._top_skus_pipeline(created_from, created_to, limit)
+        return await self._run_aggregate_with_optional_explain(pipeline, "idx_created_status", explain)
+
+    async def country_channel_efficiency(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        country: str,
+        explain: bool = False,
+    ) -> dict[str, Any] | list[dict[str, Any]]:
+        pipeline = self._country_channel_pipeline(created_from, created_to, country)
+        return await self._run_aggregate_with_optional_explain(
+            pipeline,
+            "idx_country_channel_created",
+            explain,
+        )
+
+    async def profile_queries(
+        self,
+        created_from: datetime,
+        created_to: datetime,
+        order_id: str,
+        customer_id: str,
+        country: str,
+        statuses: list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        commands = self._profile_commands(created_from, created_to, order_id, customer_id, country, statuses)
+        report = []
+        for name, command in commands.items():
+            explain_doc = await self.explain_command(command, verbosity="executionStats")
+            report.append({"query": name, **self.analyze_plan(explain_doc)})
+        return report
+
+    async def explain_command(self, command: dict[str, Any], verbosity: str = "executionStats") -> dict[str, Any]:
+        return await self.collection.database.command({"explain": command, "verbosity": verbosity})
+
+    async def _run_aggregate_with_optional_explain(
+        self,
+        pipeline: list[dict[str, Any]],
+        hint_name: str,
+        explain: bool,
+    ) -> dict[str, Any] | list[dict[str, Any]]:
+        if explain:
+            return await self.collection.database.command(
+                {**self._aggregate_command(pipeline, hint_name), "explain": True}
+            )
+
+        cursor = await self.collection.aggregate(pipeline, hint=hint_name, allowDiskUse=True)
+        return await cursor.to_list()
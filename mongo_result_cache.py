@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import UTC, datetime, time
+from time import monotonic
+from typing import Any
+
+from bson import json_util
+
+
+def closed_date_bucket(
+    created_from: datetime,
+    created_to: datetime,
+    now: datetime | None = None,
+) -> str | None:
+    """Return a cache bucket for windows that end before today (UTC), otherwise None."""
+    now = now or datetime.now(UTC)
+    today_start = datetime.combine(now.astimezone(UTC).date(), time.min, tzinfo=UTC)
+    window_end = created_to if created_to.tzinfo else created_to.replace(tzinfo=UTC)
+    if window_end >= today_start:
+        return None
+    return f"{created_from:%Y-%m-%d}..{created_to:%Y-%m-%d}"
+
+
+class AggregationResultCache:
+    """LRU of aggregation rows for closed-day windows, optionally backed by a shared Redis tier.
+
+    Closed days are not immutable: a late status change (a refund, a cancellation) on an old order changes
+    the GMV and SKU results of every bucket covering its day. Writers call `invalidate(namespace)`, which drops
+    all cached results of that collection rather than only the affected buckets: the buckets are arbitrary
+    date ranges, and finding the ones covering a day would mean indexing keys by day. The cost is a cold cache
+    for the collection after each late change. The shared Redis entries are deleted through a per-collection
+    key index, but only this process's local tier is cleared: other processes keep serving their local copies
+    for up to `local_ttl_seconds`. Writes that bypass `invalidate` stay visible only after `redis_ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        redis_client: Any | None = None,
+        redis_ttl_seconds: int = 7 * 24 * 3600,
+        key_prefix: str = "orders:agg:",
+        local_ttl_seconds: float = 300.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self.redis_ttl_seconds = redis_ttl_seconds
+        self.key_prefix = key_prefix
+        self.local_ttl_seconds = local_ttl_seconds
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+        # key -> (monotonic expiry, rows)
+        self._entries: OrderedDict[str, tuple[float, list[dict[str, Any]]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, pipeline: list[dict[str, Any]], date_bucket: str, *, namespace: str, hint: str | None) -> str:
+        # Repositories sharing the Redis tier share the prefix too: the namespace ("db.collection") keeps their
+        # results apart, and the hint is part of the query that produced the rows. The pipeline keeps its key
+        # order, which is meaningful in $sort and $project; only the outer payload has a fixed order.
+        payload = {"hint": hint, "namespace": namespace, "pipeline": pipeline}
+        digest = hashlib.sha256(json_util.dumps(payload).encode("utf-8")).hexdigest()
+        return f"{self._namespace_prefix(namespace)}{date_bucket}:{digest}"
+
+    def get(self, key: str) -> list[dict[str, Any]] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["local_hits"] += 1
+                return copy.deepcopy(entry[1])
+
+        if self.redis_client is not None:
+            raw = self.redis_client.get(key)
+            if raw is not None:
+                rows = json_util.loads(raw)
+                self._store_local(key, rows)
+                with self._lock:
+                    self.stats["redis_hits"] += 1
+                return copy.deepcopy(rows)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, rows: list[dict[str, Any]]) -> None:
+        self._store_local(key, copy.deepcopy(rows))
+        if self.redis_client is not None:
+            index_key = self._index_key(key)
+            self.redis_client.setex(key, self.redis_ttl_seconds, json_util.dumps(rows))
+            self.redis_client.sadd(index_key, key)
+            self.redis_client.expire(index_key, self.redis_ttl_seconds)
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop every cached result of the collection `namespace` ("db.collection")."""
+        prefix = self._namespace_prefix(namespace)
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+        if self.redis_client is not None:
+            index_key = f"{prefix}keys"
+            keys = self.redis_client.smembers(index_key)
+            self.redis_client.delete(index_key, *keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _namespace_prefix(self, namespace: str) -> str:
+        return f"{self.key_prefix}{namespace}:"
+
+    def _index_key(self, key: str) -> str:
+        # Keys are "<prefix><namespace>:<bucket>:<digest>"; the index of their namespace sits next to them.
+        return f"{key.rsplit(':', 2)[0]}:keys"
+
+    def _store_local(self, key: str, rows: list[dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (monotonic() + self.local_ttl_seconds, rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
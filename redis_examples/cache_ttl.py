@@ -1,33 +1,409 @@
 import argparse
+import math
+import random
+import threading
 import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+from uuid import uuid4
 
 import redis
 
+# Deletes the lock only if it still holds our token, so a caller whose lock expired cannot release someone else's.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+TRACKING_CHANNEL = "__redis__:invalidate"
+INVALIDATION_MODES = ("tracking", "pubsub")
+
+
+def should_refresh_early(delta_seconds: float, ttl_remaining_seconds: float, beta: float, rand: float) -> bool:
+    """XFetch: recompute before expiry with a probability that grows as the key ages and with recompute cost."""
+    # rand is uniform in (0, 1]; -log(rand) is an exponential sample, so the expected head start is delta * beta.
+    return delta_seconds * beta * -math.log(rand) >= ttl_remaining_seconds
+
+
+class LocalLRU:
+    """Size- and TTL-bounded in-process tier; entries are dropped on invalidation messages."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        # Keys being read from Redis; an invalidation that lands mid-read drops the token so the
+        # value read before the write is not cached.
+        self._pending: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def begin(self, key: str) -> object:
+        token = object()
+        with self._lock:
+            self._pending[key] = token
+        return token
+
+    def store(self, key: str, value: str, token: object, ttl_seconds: float | None = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else min(self.ttl_seconds, ttl_seconds)
+        with self._lock:
+            if self._pending.get(key) is not token:
+                return
+            del self._pending[key]
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def abandon(self, key: str, token: object) -> None:
+        """End a read that stores nothing (a miss or a key without TTL), so its token does not linger."""
+        with self._lock:
+            if self._pending.get(key) is token:
+                del self._pending[key]
+
+    def evict(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._pending.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class RedisTTLCache:
-    def __init__(self, redis_url: str) -> None:
-        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+    def __init__(
+        self,
+        redis_url: str,
+        near_cache_size: int = 0,
+        near_cache_ttl: float = 5.0,
+        invalidation: str = "tracking",
+        invalidation_channel: str = "cache:invalidate",
+        tracking_prefixes: tuple[str, ...] = (),
+        client: redis.Redis | None = None,
+        listener_pool: redis.ConnectionPool | None = None,
+    ) -> None:
+        if invalidation not in INVALIDATION_MODES:
+            raise ValueError(f"invalidation must be one of {INVALIDATION_MODES}, got {invalidation!r}")
+        # Callers normally pass a shared client (see redis_clients.get_client); it must decode responses.
+        self._owns_client = client is None
+        self.client = client if client is not None else redis.Redis.from_url(redis_url, decode_responses=True)
+        self._release_lock = self.client.register_script(RELEASE_LOCK_SCRIPT)
+        self.invalidation = invalidation
+        self.invalidation_channel = invalidation_channel
+        self.tracking_prefixes = tracking_prefixes
+        self.stats = {"local_hits": 0, "local_misses": 0, "redis_hits": 0, "redis_misses": 0}
+        self._stats_lock = threading.Lock()
+        self.local = LocalLRU(near_cache_size, near_cache_ttl) if near_cache_size > 0 else None
+        self._listening = threading.Event()
+        self._closed = threading.Event()
+        self._listener: threading.Thread | None = None
+        self._owns_listener_pool = listener_pool is None
+        if self.local is not None:
+            # Listener connections stay on RESP2 so invalidations arrive as ordinary pub/sub messages
+            # (tracking REDIRECT to __redis__:invalidate) regardless of the protocol the main client negotiates.
+            # A pool passed in must be set up the same way.
+            self._listener_pool = listener_pool or redis.ConnectionPool.from_url(
+                redis_url, decode_responses=True, protocol=2
+            )
+            self._listener = threading.Thread(target=self._listen, name="cache-invalidation", daemon=True)
+            self._listener.start()
+            self._listening.wait(timeout=2.0)
 
     def set(self, key: str, value: str, ttl_seconds: int) -> None:
         self.client.setex(key, ttl_seconds, value)
+        self._invalidate([key])
 
     def get(self, key: str) -> str | None:
-        return self.client.get(key)
+        local = self._local_tier()
+        if local is None:
+            value = self.client.get(key)
+            self._count("redis", value is not None)
+            return value
+        return self.get_many([key])[key]
+
+    def get_many(self, keys: list[str]) -> dict[str, str | None]:
+        if not keys:
+            return {}
+        local = self._local_tier()
+        if local is None:
+            values = self.client.mget(keys)
+            for value in values:
+                self._count("redis", value is not None)
+            return dict(zip(keys, values))
+
+        found: dict[str, str | None] = {}
+        tokens: dict[str, object] = {}
+        for key in keys:
+            value = local.get(key)
+            self._count("local", value is not None)
+            if value is not None:
+                found[key] = value
+            else:
+                tokens[key] = local.begin(key)
+        if tokens:
+            # PTTL rides along so local copies never outlive the Redis key (expiry sends no pub/sub message).
+            pipe = self.client.pipeline(transaction=False)
+            pipe.mget(list(tokens))
+            for key in tokens:
+                pipe.pttl(key)
+            try:
+                values, *ttls_ms = pipe.execute()
+            except BaseException:
+                for key, token in tokens.items():
+                    local.abandon(key, token)
+                raise
+            for (key, token), value, ttl_ms in zip(tokens.items(), values, ttls_ms):
+                self._count("redis", value is not None)
+                found[key] = value
+                # Like get_or_compute: a key without TTL (or one expiring between MGET and PTTL) stays remote.
+                if value is not None and ttl_ms > 0:
+                    local.store(key, value, token, ttl_ms / 1000)
+                else:
+                    local.abandon(key, token)
+        return {key: found[key] for key in keys}
+
+    def set_many(self, items: dict[str, str], ttl_seconds: int) -> None:
+        # MSET has no TTL, so SET EX calls are pipelined into one round trip instead.
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, value, ex=ttl_seconds)
+        pipe.execute()
+        self._invalidate(list(items))
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], str],
+        ttl_seconds: int,
+        beta: float = 1.0,
+        lock_timeout_ms: int = 10000,
+        wait_timeout: float = 5.0,
+    ) -> str:
+        local = self._local_tier()
+        if local is not None:
+            value = local.get(key)
+            self._count("local", value is not None)
+            if value is not None:
+                return value
+            read_token = local.begin(key)
+
+        try:
+            value, delta, ttl_ms = self._read_with_metadata(key)
+        except BaseException:
+            if local is not None:
+                local.abandon(key, read_token)
+            raise
+        self._count("redis", value is not None)
+        if local is not None:
+            if value is not None and ttl_ms > 0:
+                local.store(key, value, read_token, ttl_ms / 1000)
+            else:
+                local.abandon(key, read_token)
+        if value is not None:
+            if delta is None or ttl_ms <= 0:
+                return value
+            if not should_refresh_early(delta, ttl_ms / 1000, beta, 1.0 - random.random()):
+                return value
+            # Early refresh: one caller recomputes, everyone else keeps serving the still-valid value.
+            token = self._acquire_lock(key, lock_timeout_ms)
+            if token is None:
+                return value
+            return self._compute_and_store(key, compute, ttl_seconds, token)
+
+        token = self._acquire_lock(key, lock_timeout_ms)
+        if token is not None:
+            return self._compute_and_store(key, compute, ttl_seconds, token)
+
+        # Another caller is computing this key; wait for its result instead of stampeding the backend.
+        deadline = time.monotonic() + wait_timeout
+        pause = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(pause)
+            value = self.client.get(key)
+            if value is not None:
+                return value
+            pause = min(pause * 2, 0.1)
+        return compute()
+
+    def _read_with_metadata(self, key: str) -> tuple[str | None, float | None, int]:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.get(self._delta_key(key))
+        pipe.pttl(key)
+        value, delta, ttl_ms = pipe.execute()
+        return value, float(delta) if delta is not None else None, int(ttl_ms)
+
+    def _compute_and_store(self, key: str, compute: Callable[[], str], ttl_seconds: int, token: str) -> str:
+        try:
+            started = time.perf_counter()
+            value = compute()
+            delta = time.perf_counter() - started
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(key, value, ex=ttl_seconds)
+            pipe.set(self._delta_key(key), f"{delta:.6f}", ex=ttl_seconds)
+            pipe.execute()
+            self._invalidate([key])
+            return value
+        finally:
+            self._release_lock(keys=[self._lock_key(key)], args=[token])
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.join(timeout=2.0)
+            if self._owns_listener_pool:
+                self._listener_pool.disconnect()
+        if self._owns_client:
+            self.client.close()
+
+    def _local_tier(self) -> LocalLRU | None:
+        # Without a live invalidation subscription the local tier could serve stale values, so it is bypassed.
+        if self.local is None or not self._listening.is_set():
+            return None
+        return self.local
+
+    def _count(self, tier: str, hit: bool) -> None:
+        with self._stats_lock:
+            self.stats[f"{tier}_hits" if hit else f"{tier}_misses"] += 1
+
+    def _invalidate(self, keys: list[str]) -> None:
+        if self.local is not None:
+            self.local.evict(keys)
+        if self.invalidation == "pubsub":
+            # Other processes drop their local copies; with tracking the server sends these messages itself.
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.publish(self.invalidation_channel, key)
+            pipe.execute()
+
+    def _listen(self) -> None:
+        pool = self._listener_pool
+        while not self._closed.is_set():
+            subscriber = pool.make_connection()
+            tracker = None
+            try:
+                subscriber.connect()
+                channel = self.invalidation_channel
+                if self.invalidation == "tracking":
+                    # BCAST + REDIRECT: one tracking connection makes the server push every write to a
+                    # tracked prefix to our subscriber, whichever pooled connection did the read.
+                    subscriber.send_command("CLIENT", "ID")
+                    subscriber_id = subscriber.read_response()
+                    tracker = pool.make_connection()
+                    prefixes = [arg for prefix in self.tracking_prefixes for arg in ("PREFIX", prefix)]
+                    try:
+                        tracker.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", subscriber_id, "BCAST", *prefixes)
+                        tracker.read_response()
+                        channel = TRACKING_CHANNEL
+                    except redis.ResponseError:
+                        # Servers before 6.0 have no client tracking; fall back to explicit invalidation messages.
+                        self.invalidation = "pubsub"
+                subscriber.send_command("SUBSCRIBE", channel)
+                subscriber.read_response()
+                self._listening.set()
+                while not self._closed.is_set():
+                    if not subscriber.can_read(timeout=0.5):
+                        continue
+                    message = subscriber.read_response()
+                    if message[0] != "message":
+                        continue
+                    payload = message[2]
+                    if payload is None:
+                        # FLUSHDB/FLUSHALL arrive as an invalidation without keys.
+                        self.local.clear()
+                    else:
+                        self.local.evict([payload] if isinstance(payload, str) else payload)
+            except (redis.ConnectionError, redis.TimeoutError):
+                # Invalidations may have been missed while disconnected, so nothing local can be trusted.
+                self._listening.clear()
+                self.local.clear()
+                self._closed.wait(1.0)
+            finally:
+                self._listening.clear()
+                subscriber.disconnect()
+                if tracker is not None:
+                    tracker.disconnect()
+
+    def _acquire_lock(self, key: str, lock_timeout_ms: int) -> str | None:
+        token = uuid4().hex
+        if self.client.set(self._lock_key(key), token, nx=True, px=lock_timeout_ms):
+            return token
+        return None
+
+    @staticmethod
+    def _delta_key(key: str) -> str:
+        return f"{key}:xfetch:delta"
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"{key}:xfetch:lock"
 
 
 def main() -> None:
+    # Sibling import kept local: the class above is also imported as redis_examples.cache_ttl.
+    from redis_clients import get_client
+
     parser = argparse.ArgumentParser(description="Redis TTL cache demo")
     parser.add_argument("--redis-url", default="redis://localhost:6379/0")
     parser.add_argument("--key", default="demo:cache:key")
     parser.add_argument("--value", default="cached-value")
     parser.add_argument("--ttl", type=int, default=5)
+    parser.add_argument("--near-cache-size", type=int, default=0, help="local LRU entries, 0 disables the tier")
+    parser.add_argument("--near-cache-ttl", type=float, default=5.0)
+    parser.add_argument("--invalidation", choices=INVALIDATION_MODES, default="tracking")
+    parser.add_argument("--auto-pipeline", action="store_true", help="coalesce concurrent commands into pipelines")
     args = parser.parse_args()
 
-    cache = RedisTTLCache(args.redis_url)
+    cache = RedisTTLCache(
+        args.redis_url,
+        near_cache_size=args.near_cache_size,
+        near_cache_ttl=args.near_cache_ttl,
+        invalidation=args.invalidation,
+        client=get_client(args.redis_url, decode_responses=True, auto_pipeline=args.auto_pipeline),
+    )
     cache.set(args.key, args.value, args.ttl)
     print(f"SET key={args.key!r}, value={args.value!r}, ttl={args.ttl}s")
     print(f"GET right after set: {cache.get(args.key)!r}")
 
+    batch = {f"{args.key}:{i}": f"{args.value}-{i}" for i in range(3)}
+    cache.set_many(batch, args.ttl)
+    print(f"GET_MANY after set_many: {cache.get_many([*batch, f'{args.key}:missing'])}")
+
+    def slow_compute() -> str:
+        time.sleep(0.2)
+        return f"computed at {time.strftime('%H:%M:%S')}"
+
+    computed_key = f"{args.key}:computed"
+    print(f"GET_OR_COMPUTE (miss): {cache.get_or_compute(computed_key, slow_compute, args.ttl)!r}")
+    print(f"GET_OR_COMPUTE (hit):  {cache.get_or_compute(computed_key, slow_compute, args.ttl)!r}")
+
+    if cache.local is not None:
+        cache.get(args.key)
+        # A write through another client must evict the local copy via the invalidation channel.
+        writer = RedisTTLCache(args.redis_url, invalidation=cache.invalidation)
+        writer.set(args.key, f"{args.value}-updated", args.ttl)
+        time.sleep(0.05)
+        print(f"GET after another client's write: {cache.get(args.key)!r}")
+        writer.close()
+    print(f"Tier stats: {cache.stats}")
+
     print(f"Sleeping {args.ttl + 1}s to wait for expiration...")
     time.sleep(args.ttl + 1)
     print(f"GET after expiration: {cache.get(args.key)!r}")
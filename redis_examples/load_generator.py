@@ -0,0 +1,155 @@
+import argparse
+import random
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from queue_metrics import histogram_quantile, merged_buckets, parse_metrics
+from queue_producer import build_task, push_batches
+from redis_clients import get_client
+from task_queues import open_queue
+
+TICK_SECONDS = 0.1
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel"]
+
+
+def random_task(sleep_share: float) -> dict:
+    if random.random() < sleep_share:
+        task = build_task("sleep")
+        task.update({"type": "sleep", "seconds": 1})
+        return task
+    verb = random.choice(["upper ", "reverse ", ""])
+    return build_task(verb + " ".join(random.choices(WORDS, k=4)))
+
+
+def start_workers(args: argparse.Namespace) -> list[subprocess.Popen]:
+    worker_script = Path(__file__).with_name("queue_worker.py")
+    workers = []
+    for index in range(args.workers):
+        command = [
+            sys.executable,
+            str(worker_script),
+            "--redis-url", args.redis_url,
+            "--queue", args.queue,
+            "--backend", args.backend,
+            "--mode", args.mode,
+            "--concurrency", str(args.concurrency),
+            "--prefetch", str(args.prefetch),
+            "--timeout", "1",
+            "--metrics-port", str(args.metrics_port + index),
+            "--quiet",
+        ]
+        workers.append(subprocess.Popen(command, stdout=subprocess.DEVNULL))
+    return workers
+
+
+def scrape(ports: list[int]) -> dict[str, list[tuple[dict[str, str], float]]]:
+    merged: dict[str, list[tuple[dict[str, str], float]]] = {}
+    for port in ports:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2) as response:
+                text = response.read().decode("utf-8")
+        except OSError:
+            continue
+        for name, samples in parse_metrics(text).items():
+            merged.setdefault(name, []).extend(samples)
+    return merged
+
+
+def wait_for_endpoints(ports: list[int], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(scrape([port]) for port in ports):
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f"workers did not expose metrics on ports {ports}")
+
+
+def format_ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}ms"
+
+
+def summarize(samples: dict[str, list[tuple[dict[str, str], float]]]) -> str:
+    # Every worker reports the same queue depth, so take one reading instead of summing.
+    depth = max((value for _, value in samples.get("queue_worker_queue_depth", [])), default=0)
+    delayed = max((value for _, value in samples.get("queue_worker_delayed_depth", [])), default=0)
+    rate = sum(value for _, value in samples.get("queue_worker_tasks_per_second", []))
+    done = sum(value for _, value in samples.get("queue_worker_tasks_total", []))
+    lag = merged_buckets(samples, "queue_worker_lag_seconds")
+    return (
+        f"depth={depth:.0f} delayed={delayed:.0f} done={done:.0f} tasks/s={rate:.0f} "
+        f"lag p50={format_ms(histogram_quantile(0.5, lag))} p95={format_ms(histogram_quantile(0.95, lag))}"
+    )
+
+
+def print_handler_latencies(samples: dict[str, list[tuple[dict[str, str], float]]]) -> None:
+    task_types = sorted({labels["type"] for labels, _ in samples.get("queue_worker_handler_seconds_count", [])})
+    print(f"{'type':>10} {'count':>8} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for task_type in task_types:
+        buckets = merged_buckets(samples, "queue_worker_handler_seconds", type=task_type)
+        quantiles = [format_ms(histogram_quantile(q, buckets)) for q in (0.5, 0.95, 0.99)]
+        print(f"{task_type:>10} {buckets[-1][1]:>8} {quantiles[0]:>10} {quantiles[1]:>10} {quantiles[2]:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drive the task queue at a fixed rate and report worker metrics")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--queue", default="load:tasks")
+    parser.add_argument("--backend", choices=["list", "stream"], default="list")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mode", choices=["thread", "process", "asyncio"], default="thread")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--prefetch", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=500.0, help="tasks per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load")
+    parser.add_argument("--sleep-share", type=float, default=0.02, help="share of delayed sleep tasks")
+    parser.add_argument("--codec", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--metrics-port", type=int, default=9400, help="first worker metrics port")
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    queue = open_queue(get_client(args.redis_url), args.backend, args.queue)
+    queue.clear()
+    ports = [args.metrics_port + index for index in range(args.workers)]
+    workers = start_workers(args)
+    try:
+        wait_for_endpoints(ports, timeout=15)
+        print(f"{args.workers} {args.mode} workers up, producing {args.rate:g} tasks/s for {args.duration:g}s")
+
+        started = time.monotonic()
+        next_report = started + args.report_interval
+        produced = 0
+        carry = 0.0
+        while time.monotonic() - started < args.duration:
+            tick_started = time.monotonic()
+            carry += args.rate * TICK_SECONDS
+            count, carry = int(carry), carry - int(carry)
+            tasks = [random_task(args.sleep_share) for _ in range(count)]
+            produced += push_batches(queue, tasks, max(count, 1), args.codec, "none")["tasks"]
+            if tick_started >= next_report:
+                print(f"[{tick_started - started:5.1f}s] produced={produced} {summarize(scrape(ports))}")
+                next_report += args.report_interval
+            time.sleep(max(0.0, TICK_SECONDS - (time.monotonic() - tick_started)))
+
+        drain_deadline = time.monotonic() + args.drain_timeout
+        while queue.depth() and time.monotonic() < drain_deadline:
+            time.sleep(0.2)
+        # Let delayed sleep tasks come back and finish.
+        time.sleep(1.5)
+
+        samples = scrape(ports)
+        print(f"[final] produced={produced} {summarize(samples)}")
+        print_handler_latencies(samples)
+    finally:
+        for worker in workers:
+            worker.send_signal(signal.SIGTERM)
+        for worker in workers:
+            worker.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,14 @@
 import argparse
+import sys
 
 import redis
 
+from pubsub_fanout import publish_batches
+from redis_clients import get_client
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Redis pub/sub publisher")
-    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
-    parser.add_argument("--channel", default="demo:chat")
-    args = parser.parse_args()
 
-    client = redis.Redis.from_url(args.redis_url, decode_responses=True)
-    print(f"Publishing to channel {args.channel!r}. Type 'exit' to stop.")
+def run_interactive(client: redis.Redis, channel: str) -> None:
+    print(f"Publishing to channel {channel!r}. Type 'exit' to stop.")
 
     while True:
         message = input("> ").strip()
@@ -20,9 +18,40 @@ def main() -> None:
             print("Publisher stopped.")
             break
 
-        receivers = client.publish(args.channel, message)
+        receivers = client.publish(channel, message)
         print(f"sent={message!r}, subscribers={receivers}")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis pub/sub publisher")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--channel", default="demo:chat")
+    parser.add_argument("--input", help="file with one message per line, '-' for stdin")
+    parser.add_argument("--count", type=int, default=0, help="publish N generated messages instead")
+    parser.add_argument("--batch-size", type=int, default=500, help="messages per pipelined round trip")
+    args = parser.parse_args()
+
+    client = get_client(args.redis_url, decode_responses=True)
+    if args.input is None and args.count <= 0:
+        run_interactive(client, args.channel)
+        return
+
+    if args.count > 0:
+        messages = (f"message-{i}" for i in range(args.count))
+        result = publish_batches(client, args.channel, messages, max(1, args.batch_size))
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        try:
+            lines = (line.rstrip("\n") for line in source if line.strip())
+            result = publish_batches(client, args.channel, lines, max(1, args.batch_size))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+    print(
+        f"published {result['messages']} messages ({result['receivers']} deliveries) "
+        f"in {result['seconds']}s, {result['messages_per_second']} messages/s"
+    )
+
+
 if __name__ == "__main__":
     main()
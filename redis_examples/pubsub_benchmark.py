@@ -0,0 +1,143 @@
+import argparse
+import asyncio
+import multiprocessing as mp
+import statistics
+import time
+
+from pubsub_fanout import FanoutSubscriber, Message, publish_batches
+from redis_clients import get_client, make_async_client
+
+PATTERN = "bench:pubsub:*"
+CHANNEL = "bench:pubsub:events"
+
+
+def latency_ms(data: bytes, now: float) -> float:
+    # Messages carry their publish time, so delivery latency is measured end to end.
+    return (now - float(data.split(b"|", 1)[0])) * 1000
+
+
+def subscribe_sync(redis_url: str, received, ready, stop, results, handler_ms: float) -> None:
+    """Baseline: the original subscriber loop, one message and one handler call at a time."""
+    pubsub = get_client(redis_url).pubsub()
+    pubsub.psubscribe(PATTERN)
+    pubsub.get_message(timeout=1)
+    ready.set()
+    latencies = []
+    while not stop.is_set():
+        event = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+        if event is None:
+            continue
+        if handler_ms:
+            time.sleep(handler_ms / 1000)
+        latencies.append(latency_ms(event["data"], time.time()))
+        with received.get_lock():
+            received.value += 1
+    pubsub.close()
+    results.put({"latencies": latencies, "dropped": 0, "avg_batch": 1.0})
+
+
+def subscribe_asyncio(
+    redis_url: str, received, ready, stop, results, handler_ms: float, queue_size: int, batch_size: int
+) -> None:
+    async def run() -> None:
+        client = make_async_client(redis_url)
+        subscriber = FanoutSubscriber(client, queue_size=queue_size, batch_size=batch_size)
+        latencies = []
+
+        @subscriber.handler(PATTERN)
+        async def count(batch: list[Message]) -> None:
+            if handler_ms:
+                # The same simulated I/O as the baseline, paid once per batch (e.g. one bulk write).
+                await asyncio.sleep(handler_ms / 1000)
+            now = time.time()
+            latencies.extend(latency_ms(message.data, now) for message in batch)
+            with received.get_lock():
+                received.value += len(batch)
+
+        task = asyncio.create_task(subscriber.run())
+        await subscriber.wait_subscribed()
+        ready.set()
+        await asyncio.to_thread(stop.wait)
+        subscriber.stop()
+        await task
+        await client.aclose()
+        snapshot = subscriber.metrics.snapshot()
+        results.put({"latencies": latencies, "dropped": snapshot["dropped"], "avg_batch": snapshot["avg_batch"]})
+
+    asyncio.run(run())
+
+
+def run_case(args: argparse.Namespace, subscriber: str, batch_size: int) -> dict:
+    received = mp.Value("q", 0)
+    ready, stop = mp.Event(), mp.Event()
+    results = mp.Queue()
+    if subscriber == "sync":
+        process = mp.Process(target=subscribe_sync, args=(args.redis_url, received, ready, stop, results, args.handler_ms))
+    else:
+        process = mp.Process(
+            target=subscribe_asyncio,
+            args=(
+                args.redis_url, received, ready, stop, results, args.handler_ms, args.queue_size, args.handler_batch
+            ),
+        )
+    process.start()
+    ready.wait(timeout=10)
+
+    client = get_client(args.redis_url)
+    started = time.monotonic()
+    padding = "x" * args.payload_bytes
+    messages = (f"{time.time():.6f}|{padding}" for _ in range(args.messages))
+    published = publish_batches(client, CHANNEL, messages, batch_size)
+
+    deadline = time.monotonic() + args.drain_timeout
+    last, last_change = -1, time.monotonic()
+    while received.value < args.messages and time.monotonic() < deadline:
+        time.sleep(0.05)
+        if received.value != last:
+            last, last_change = received.value, time.monotonic()
+        elif time.monotonic() - last_change > 1.0:
+            break  # nothing more is arriving, the rest was dropped
+    elapsed = (last_change if received.value < args.messages else time.monotonic()) - started
+    stop.set()
+    result = results.get(timeout=30)
+    process.join()
+
+    latencies = sorted(result["latencies"]) or [0.0]
+    return {
+        "publish_rate": published["messages_per_second"],
+        "delivery_rate": received.value / elapsed,
+        "received": received.value,
+        "dropped": result["dropped"],
+        "avg_batch": result["avg_batch"],
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local pub/sub throughput: sync listen() vs batched asyncio fan-out")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--payload-bytes", type=int, default=64)
+    parser.add_argument("--publish-batches", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--subscribers", nargs="+", choices=["sync", "asyncio"], default=["sync", "asyncio"])
+    parser.add_argument("--handler-ms", type=float, default=0.0, help="simulated I/O per handler call")
+    parser.add_argument("--queue-size", type=int, default=100000)
+    parser.add_argument("--handler-batch", type=int, default=500)
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages of {args.payload_bytes} bytes, handler I/O {args.handler_ms}ms per call")
+    header = f"{'subscriber':>10} {'pub batch':>9} {'publish/s':>10} {'deliver/s':>10} {'received':>9} {'dropped':>8}"
+    print(f"{header} {'avg batch':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for subscriber in args.subscribers:
+        for batch_size in args.publish_batches:
+            r = run_case(args, subscriber, batch_size)
+            print(
+                f"{subscriber:>10} {batch_size:>9} {r['publish_rate']:>10.0f} {r['delivery_rate']:>10.0f} "
+                f"{r['received']:>9} {r['dropped']:>8} {r['avg_batch']:>9} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Iterable, NamedTuple
+
+import redis
+import redis.asyncio as aioredis
+
+DROP_POLICIES = ("oldest", "newest")
+# A broken handler usually fails on every batch, so after its first error it is logged at most this often.
+HANDLER_ERROR_LOG_INTERVAL = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class Message(NamedTuple):
+    channel: str | bytes
+    pattern: str | bytes | None
+    data: str | bytes
+    received_at: float
+
+
+Handler = Callable[[list[Message]], Awaitable[None]]
+
+
+class FanoutMetrics:
+    def __init__(self) -> None:
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.batches = 0
+        self.handler_errors = 0
+        self.queue_high_water = 0
+        self.lag_seconds_last = 0.0
+        self.lag_seconds_max = 0.0
+
+    def observe_batch(self, size: int, lag_seconds: float) -> None:
+        self.batches += 1
+        self.delivered += size
+        self.lag_seconds_last = lag_seconds
+        self.lag_seconds_max = max(self.lag_seconds_max, lag_seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "avg_batch": round(self.delivered / self.batches, 1) if self.batches else 0.0,
+            "handler_errors": self.handler_errors,
+            "queue_high_water": self.queue_high_water,
+            "lag_ms_last": round(self.lag_seconds_last * 1000, 2),
+            "lag_ms_max": round(self.lag_seconds_max * 1000, 2),
+        }
+
+
+class FanoutSubscriber:
+    """Pattern subscriber that hands micro-batches to async handlers.
+
+    The reader only moves messages from the socket into a bounded queue and never waits on handlers: a
+    subscriber that stops reading makes Redis buffer the backlog on its side until the pubsub
+    client-output-buffer-limit disconnects it. When handlers fall behind, the queue overflows locally
+    and `drop` decides which messages go, every one of them counted in `metrics.dropped`.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        batch_interval: float = 0.005,
+        drop: str = "oldest",
+        error_log_interval: float = HANDLER_ERROR_LOG_INTERVAL,
+    ) -> None:
+        if drop not in DROP_POLICIES:
+            raise ValueError(f"drop must be one of {DROP_POLICIES}, got {drop!r}")
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.drop = drop
+        self.error_log_interval = error_log_interval
+        self.metrics = FanoutMetrics()
+        self._handlers: dict[str, list[Handler]] = {}
+        self._queue: asyncio.Queue[Message | None] = asyncio.Queue(maxsize=queue_size)
+        self._stop = asyncio.Event()
+        self._subscribed = asyncio.Event()
+        # (pattern, handler) -> when its last error was logged and how many errors were not logged since.
+        self._error_log: dict[tuple[str, Handler], tuple[float, int]] = {}
+
+    def add_handler(self, pattern: str, handler: Handler) -> None:
+        self._handlers.setdefault(pattern, []).append(handler)
+
+    def handler(self, pattern: str) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            self.add_handler(pattern, handler)
+            return handler
+
+        return register
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    async def wait_subscribed(self) -> None:
+        await self._subscribed.wait()
+
+    async def run(self) -> None:
+        """Reads and dispatches until stop(); raises what ended the subscription if it ends by itself."""
+        if not self._handlers:
+            raise ValueError("register at least one handler before run()")
+        pubsub = self.client.pubsub()
+        await pubsub.psubscribe(*self._handlers)
+        reader = asyncio.create_task(self._read(pubsub))
+        dispatcher = asyncio.create_task(self._dispatch())
+        stopped = asyncio.create_task(self._stop.wait())
+        self._subscribed.set()
+        try:
+            # A reader that dies (connection lost) or a dispatcher that dies ends the run as stop() does.
+            done, _ = await asyncio.wait({stopped, reader, dispatcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopped.cancel()
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            if not dispatcher.done():
+                # Hand what is already queued to the handlers before returning.
+                await self._queue.put(None)
+                await dispatcher
+            await pubsub.aclose()
+        if dispatcher in done:
+            dispatcher.result()
+        if reader in done:
+            reader.result()
+            raise redis.ConnectionError("the subscription ended before stop()")
+
+    async def _read(self, pubsub: aioredis.client.PubSub) -> None:
+        async for event in pubsub.listen():
+            if event["type"] not in ("message", "pmessage"):
+                continue
+            self.metrics.received += 1
+            message = Message(event["channel"], event["pattern"], event["data"], time.monotonic())
+            if self._queue.full():
+                self.metrics.dropped += 1
+                if self.drop == "newest":
+                    continue
+                self._queue.get_nowait()
+            self._queue.put_nowait(message)
+            self.metrics.queue_high_water = max(self.metrics.queue_high_water, self._queue.qsize())
+            if self.metrics.received % self.batch_size == 0:
+                # listen() does not suspend while the socket buffer holds data; yield so handlers get to run.
+                await asyncio.sleep(0)
+
+    async def _dispatch(self) -> None:
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            done = self._take_queued(batch)
+            if not done and len(batch) < self.batch_size and self.batch_interval > 0:
+                # One short sleep lets the reader top the batch up; cheaper than waiting per message.
+                await asyncio.sleep(self.batch_interval)
+                done = self._take_queued(batch)
+
+            # Lag is how long the oldest message of the batch waited in the queue.
+            self.metrics.observe_batch(len(batch), time.monotonic() - batch[0].received_at)
+            await self._deliver(batch)
+            if done:
+                return
+
+    def _take_queued(self, batch: list[Message]) -> bool:
+        while len(batch) < self.batch_size:
+            try:
+                message = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if message is None:
+                return True
+            batch.append(message)
+        return False
+
+    async def _deliver(self, batch: list[Message]) -> None:
+        by_pattern: dict[str, list[Message]] = {}
+        for message in batch:
+            pattern = message.pattern.decode() if isinstance(message.pattern, bytes) else message.pattern
+            by_pattern.setdefault(pattern, []).append(message)
+        targets = [
+            (pattern, handler, messages)
+            for pattern, messages in by_pattern.items()
+            for handler in self._handlers.get(pattern, [])
+        ]
+        results = await asyncio.gather(*(handler(messages) for _, handler, messages in targets), return_exceptions=True)
+        for (pattern, handler, _), result in zip(targets, results):
+            if isinstance(result, Exception):
+                self.metrics.handler_errors += 1
+                self._log_handler_error(pattern, handler, result)
+
+    def _log_handler_error(self, pattern: str, handler: Handler, error: Exception) -> None:
+        now = time.monotonic()
+        logged_at, suppressed = self._error_log.get((pattern, handler), (None, 0))
+        if logged_at is not None and now - logged_at < self.error_log_interval:
+            self._error_log[(pattern, handler)] = (logged_at, suppressed + 1)
+            return
+        self._error_log[(pattern, handler)] = (now, 0)
+        name = getattr(handler, "__qualname__", repr(handler))
+        logger.error(
+            "handler %s for %r failed (%d more errors since the last report)", name, pattern, suppressed, exc_info=error
+        )
+
+
+def publish_batches(client: redis.Redis, channel: str, messages: Iterable[str | bytes], batch_size: int) -> dict:
+    """PUBLISH through non-transactional pipelines: one round trip per batch instead of per message."""
+    started = time.perf_counter()
+    published = 0
+    receivers = 0
+    pipe = client.pipeline(transaction=False)
+    for message in messages:
+        pipe.publish(channel, message)
+        published += 1
+        if len(pipe) >= batch_size:
+            receivers += sum(pipe.execute())
+    if len(pipe):
+        receivers += sum(pipe.execute())
+
+    elapsed = time.perf_counter() - started
+    return {
+        "messages": published,
+        "receivers": receivers,
+        "seconds": round(elapsed, 3),
+        "messages_per_second": round(published / elapsed, 1) if elapsed else 0.0,
+    }
@@ -0,0 +1,91 @@
+import argparse
+import multiprocessing as mp
+import time
+from uuid import uuid4
+
+from queue_worker import process_raw_task
+from redis_clients import get_client
+from task_codec import encode_task
+from task_queues import open_queue
+
+PUSH_BATCH = 1000
+
+
+def consume(
+    redis_url: str, backend: str, queue_name: str, prefetch: int, total: int, counter, finished_at, ready, start
+) -> None:
+    client = get_client(redis_url)
+    queue = open_queue(client, backend, queue_name, consumer=f"bench-{uuid4().hex[:8]}")
+    ready.release()
+    start.wait()
+
+    while counter.value < total:
+        deliveries = queue.fetch(prefetch, timeout=1)
+        if not deliveries:
+            continue
+        for _, raw_task in deliveries:
+            process_raw_task(raw_task)
+        queue.ack([delivery_id for delivery_id, _ in deliveries])
+        with counter.get_lock():
+            counter.value += len(deliveries)
+            if counter.value >= total:
+                # Other consumers may still sit in a blocking pop; stop the clock at the last task.
+                finished_at.value = time.monotonic()
+
+
+def run_case(args: argparse.Namespace, backend: str, consumers: int) -> float:
+    client = get_client(args.redis_url)
+    queue = open_queue(client, backend, args.queue)
+    queue.clear()
+
+    raw_tasks = [
+        encode_task({"id": str(i), "type": "upper", "payload": f"task-{i}"}, args.codec) for i in range(args.tasks)
+    ]
+    for offset in range(0, len(raw_tasks), PUSH_BATCH):
+        queue.push_many(raw_tasks[offset : offset + PUSH_BATCH])
+
+    counter = mp.Value("q", 0)
+    finished_at = mp.Value("d", 0.0)
+    ready = mp.Semaphore(0)
+    start = mp.Event()
+    processes = [
+        mp.Process(
+            target=consume,
+            args=(args.redis_url, backend, args.queue, args.prefetch, args.tasks, counter, finished_at, ready, start),
+        )
+        for _ in range(consumers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.acquire()
+
+    started = time.monotonic()
+    start.set()
+    for process in processes:
+        process.join()
+    queue.clear()
+    return counter.value / (finished_at.value - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Throughput of the list and stream task queue backends")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--queue", default="bench:tasks")
+    parser.add_argument("--tasks", type=int, default=50000)
+    parser.add_argument("--prefetch", type=int, default=32)
+    parser.add_argument("--consumers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--codec", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--backends", nargs="+", choices=["list", "stream"], default=["list", "stream"])
+    args = parser.parse_args()
+
+    print(f"{args.tasks} tasks, prefetch={args.prefetch}, codec={args.codec}")
+    print(f"{'backend':>8} {'consumers':>9} {'tasks/s':>10}")
+    for backend in args.backends:
+        for consumers in args.consumers:
+            rate = run_case(args, backend, consumers)
+            print(f"{backend:>8} {consumers:>9} {rate:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
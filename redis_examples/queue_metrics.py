@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+THROUGHPUT_WINDOW_SECONDS = 10.0
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        rows = []
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            total += count
+            rows.append((bound, total))
+        return rows
+
+
+def histogram_quantile(quantile: float, cumulative: list[tuple[float, int]]) -> float | None:
+    """Linear interpolation inside the bucket holding the quantile, like PromQL histogram_quantile."""
+    if not cumulative or cumulative[-1][1] == 0:
+        return None
+    rank = quantile * cumulative[-1][1]
+    lower_bound, lower_count = 0.0, 0
+    for bound, count in cumulative:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return lower_bound
+
+
+class WorkerMetrics:
+    """In-process metrics for one worker, rendered in the Prometheus text exposition format."""
+
+    def __init__(self, queue_name: str) -> None:
+        self.queue_name = queue_name
+        self._lock = threading.Lock()
+        self._tasks: dict[tuple[str, str], int] = {}
+        self._handler_seconds: dict[str, Histogram] = {}
+        self._lag_seconds = Histogram(LAG_BUCKETS)
+        self._completions: deque[float] = deque()
+        self._gauges: dict[str, tuple[str, Callable[[], float]]] = {}
+        self._started = time.monotonic()
+
+    def observe_task(self, task_type: str, status: str, handler_seconds: float, lag_seconds: float | None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._tasks[(task_type, status)] = self._tasks.get((task_type, status), 0) + 1
+            self._handler_seconds.setdefault(task_type, Histogram(LATENCY_BUCKETS)).observe(handler_seconds)
+            if lag_seconds is not None:
+                self._lag_seconds.observe(max(0.0, lag_seconds))
+            self._completions.append(now)
+            self._trim(now)
+
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        """Gauges are read at scrape time, e.g. queue depth straight from Redis."""
+        self._gauges[name] = (help_text, read)
+
+    def tasks_per_second(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            # A worker younger than the window would otherwise under-report.
+            window = min(THROUGHPUT_WINDOW_SECONDS, max(now - self._started, 1.0))
+            return len(self._completions) / window
+
+    def _trim(self, now: float) -> None:
+        while self._completions and self._completions[0] < now - THROUGHPUT_WINDOW_SECONDS:
+            self._completions.popleft()
+
+    def render(self) -> str:
+        queue = f'queue="{self.queue_name}"'
+        lines = [
+            "# HELP queue_worker_tasks_total Tasks finished by this worker.",
+            "# TYPE queue_worker_tasks_total counter",
+        ]
+        with self._lock:
+            for (task_type, status), count in sorted(self._tasks.items()):
+                lines.append(f'queue_worker_tasks_total{{{queue},type="{task_type}",status="{status}"}} {count}')
+
+            lines += [
+                "# HELP queue_worker_handler_seconds Handler run time per task type.",
+                "# TYPE queue_worker_handler_seconds histogram",
+            ]
+            for task_type, histogram in sorted(self._handler_seconds.items()):
+                lines += _histogram_lines("queue_worker_handler_seconds", f'{queue},type="{task_type}"', histogram)
+
+            lines += [
+                "# HELP queue_worker_lag_seconds Time from enqueued_at to the start of the handler.",
+                "# TYPE queue_worker_lag_seconds histogram",
+                *_histogram_lines("queue_worker_lag_seconds", queue, self._lag_seconds),
+            ]
+
+        lines += [
+            f"# HELP queue_worker_tasks_per_second Tasks finished over the last {THROUGHPUT_WINDOW_SECONDS:g}s.",
+            "# TYPE queue_worker_tasks_per_second gauge",
+            f"queue_worker_tasks_per_second{{{queue}}} {self.tasks_per_second():.3f}",
+        ]
+        for name, (help_text, read) in sorted(self._gauges.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{{{queue}}} {read()}"]
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> list[str]:
+    lines = [f'{name}_bucket{{{labels},le="{bound}"}} {count}' for bound, count in histogram.cumulative()]
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def serve_metrics(metrics: WorkerMetrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def parse_metrics(text: str) -> dict[str, list[tuple[dict[str, str], float]]]:
+    """Minimal parser for the text format produced above: metric name -> [(labels, value)]."""
+    samples: dict[str, list[tuple[dict[str, str], float]]] = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, _, raw_labels = series.partition("{")
+        labels = {}
+        for pair in raw_labels.rstrip("}").split(","):
+            if "=" in pair:
+                key, label_value = pair.split("=", 1)
+                labels[key] = label_value.strip('"')
+        samples.setdefault(name, []).append((labels, float(value)))
+    return samples
+
+
+def merged_buckets(
+    samples: dict[str, list[tuple[dict[str, str], float]]], name: str, **match: str
+) -> list[tuple[float, int]]:
+    """Cumulative buckets of a histogram summed over every series (and worker) matching the labels."""
+    totals: dict[float, float] = {}
+    for labels, value in samples.get(f"{name}_bucket", []):
+        if all(labels.get(key) == expected for key, expected in match.items()):
+            bound = float(labels["le"])
+            totals[bound] = totals.get(bound, 0) + value
+    return [(bound, int(count)) for bound, count in sorted(totals.items())]
@@ -1,26 +1,93 @@
 import argparse
 import json
+import sys
+import time
+from typing import Iterable, Iterator, TextIO
 from uuid import uuid4
 
-import redis
+from redis_clients import get_client
+from task_codec import COMPRESSIONS, FORMATS, encode_task
+from task_queues import DelayedQueue, ListQueue, StreamQueue, open_queue
 
 
 def build_task(raw_text: str) -> dict:
     payload = raw_text.strip()
+    # enqueued_at lets workers report enqueue-to-start lag.
     if payload.startswith("upper "):
-        return {"id": str(uuid4()), "type": "upper", "payload": payload[6:]}
+        return {"id": str(uuid4()), "type": "upper", "payload": payload[6:], "enqueued_at": time.time()}
     if payload.startswith("reverse "):
-        return {"id": str(uuid4()), "type": "reverse", "payload": payload[8:]}
-    return {"id": str(uuid4()), "type": "echo", "payload": payload}
+        return {"id": str(uuid4()), "type": "reverse", "payload": payload[8:], "enqueued_at": time.time()}
+    return {"id": str(uuid4()), "type": "echo", "payload": payload, "enqueued_at": time.time()}
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Redis queue producer")
-    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
-    parser.add_argument("--queue", default="demo:tasks")
-    args = parser.parse_args()
+def read_tasks(lines: Iterable[str]) -> Iterator[dict]:
+    # NDJSON lines are taken as ready tasks; anything else goes through build_task like interactive input.
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            task = json.loads(line)
+        except json.JSONDecodeError:
+            task = None
+        if isinstance(task, dict):
+            task.setdefault("id", str(uuid4()))
+            task.setdefault("enqueued_at", time.time())
+            yield task
+        else:
+            yield build_task(line)
+
+
+def push_batches(
+    queue: ListQueue | StreamQueue,
+    tasks: Iterable[dict],
+    batch_size: int,
+    codec: str,
+    compression: str,
+    delay_seconds: float = 0.0,
+) -> dict:
+    delayed = DelayedQueue(queue) if delay_seconds > 0 else None
+    started = time.perf_counter()
+    pushed = 0
+    payload_bytes = 0
+    batch: list[bytes] = []
+
+    def flush() -> None:
+        nonlocal pushed
+        if delayed is not None:
+            delayed.schedule_many(batch, delay_seconds)
+        else:
+            queue.push_many(batch)
+        pushed += len(batch)
+        batch.clear()
+
+    for task in tasks:
+        if delayed is not None:
+            # Lag of a delayed task counts from the moment it becomes due.
+            task["enqueued_at"] = time.time() + delay_seconds
+        raw_task = encode_task(task, codec, compression)
+        payload_bytes += len(raw_task)
+        batch.append(raw_task)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "tasks": pushed,
+        "bytes": payload_bytes,
+        "seconds": round(elapsed, 3),
+        "tasks_per_second": round(pushed / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def open_input(path: str) -> TextIO:
+    return sys.stdin if path == "-" else open(path, encoding="utf-8")
 
-    client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+
+def run_interactive(queue: ListQueue | StreamQueue, codec: str, compression: str, delay_seconds: float) -> None:
+    delayed = DelayedQueue(queue)
     print(
         "Enter task text. Prefix with 'upper ' or 'reverse ' for handlers. "
         "Type 'exit' to stop."
@@ -35,8 +102,48 @@ def main() -> None:
             break
 
         task = build_task(line)
-        client.lpush(args.queue, json.dumps(task, ensure_ascii=True))
-        print(f"queued: {task}")
+        if delay_seconds > 0:
+            task["enqueued_at"] += delay_seconds
+            delayed.schedule(encode_task(task, codec, compression), delay_seconds)
+            print(f"scheduled in {delay_seconds}s: {task}")
+        else:
+            queue.push(encode_task(task, codec, compression))
+            print(f"queued: {task}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis queue producer")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--queue", default="demo:tasks")
+    parser.add_argument("--backend", choices=["list", "stream"], default="list")
+    parser.add_argument("--group", default="workers", help="stream consumer group created for workers")
+    parser.add_argument("--input", help="NDJSON or plain text file with one task per line, '-' for stdin")
+    parser.add_argument("--batch-size", type=int, default=500, help="tasks per pipelined push in --input mode")
+    parser.add_argument("--codec", choices=sorted(FORMATS), default="json")
+    parser.add_argument("--compression", choices=sorted(COMPRESSIONS), default="none")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before the tasks become available")
+    args = parser.parse_args()
+
+    client = get_client(args.redis_url)
+    queue = open_queue(client, args.backend, args.queue, args.group)
+
+    if args.input is None:
+        run_interactive(queue, args.codec, args.compression, args.delay)
+        return
+
+    source = open_input(args.input)
+    try:
+        result = push_batches(
+            queue, read_tasks(source), max(1, args.batch_size), args.codec, args.compression, args.delay
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    action = f"scheduled in {args.delay}s" if args.delay > 0 else "queued"
+    print(
+        f"{action}: {result['tasks']} tasks ({result['bytes']} bytes, {args.codec}/{args.compression}) "
+        f"in {result['seconds']}s, {result['tasks_per_second']} tasks/s"
+    )
 
 
 if __name__ == "__main__":
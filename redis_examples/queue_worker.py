@@ -1,8 +1,36 @@
 import argparse
-import json
+import asyncio
+import signal
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import NamedTuple
 
-import redis
+from queue_metrics import WorkerMetrics, serve_metrics
+from redis_clients import get_client, make_async_client
+from task_codec import decode_task, encode_task, encoding_of
+from task_queues import MAX_DELIVERIES, AsyncDelayedQueue, DelayedQueue, Delivery, open_async_queue, open_queue
+
+
+class RetryLater(Exception):
+    """Raised by a handler to run the task again after delay_seconds without holding a worker slot."""
+
+    def __init__(self, delay_seconds: float) -> None:
+        super().__init__(f"retry in {delay_seconds}s")
+        self.delay_seconds = delay_seconds
+
+
+IN_FLIGHT_POLL_SECONDS = 0.1
+
+
+class Outcome(NamedTuple):
+    message: str
+    task_type: str
+    status: str
+    handler_seconds: float
+    lag_seconds: float | None
+    # Re-encoded task and its delay for deferred tasks.
+    retry: tuple[bytes, float] | None = None
 
 
 def handle_task(task: dict) -> str:
@@ -15,38 +43,281 @@ def handle_task(task: dict) -> str:
         return payload[::-1]
     if task_type == "sleep":
         seconds = int(task.get("seconds", 1))
-        time.sleep(max(0, seconds))
+        # Parked in the delayed queue until the wake-up time, which travels with the rescheduled task; a task
+        # that comes back early (a clock step, a manual move) is parked again for the rest.
+        wake_at = float(task.setdefault("wake_at", time.time() + max(0, seconds)))
+        remaining = wake_at - time.time()
+        if remaining > 0:
+            raise RetryLater(remaining)
         return f"slept {seconds}s"
     return payload
 
 
+def parse_task(raw_task: bytes) -> dict | None:
+    try:
+        task = decode_task(raw_task)
+    except ValueError:
+        return None
+    return task if isinstance(task, dict) else None
+
+
+def lag_of(task: dict, started_at: float) -> float | None:
+    # Wall-clock lag, so it is only as accurate as the clock sync between producer and worker hosts.
+    try:
+        return started_at - float(task["enqueued_at"]) if "enqueued_at" in task else None
+    except (TypeError, ValueError):
+        return None
+
+
+def process_raw_task(raw_task: bytes) -> Outcome:
+    started_at = time.time()
+    task = parse_task(raw_task)
+    if task is None:
+        return Outcome(f"skip invalid task: {raw_task!r}", "invalid", "invalid", 0.0, None)
+
+    task_type = str(task.get("type", "echo"))
+    lag_seconds = lag_of(task, started_at)
+    started = time.perf_counter()
+    try:
+        result = handle_task(task)
+    except RetryLater as retry:
+        try:
+            task["attempts"] = int(task.get("attempts", 0)) + 1
+            # The retried attempt measures its lag from the moment it becomes due again.
+            task["enqueued_at"] = time.time() + retry.delay_seconds
+            retry_task = encode_task(task, *encoding_of(raw_task))
+        except Exception as error:
+            return failed_outcome(task, task_type, error, time.perf_counter() - started, lag_seconds)
+        message = f"deferred id={task.get('id')} type={task_type} retry_in={retry.delay_seconds:.3f}s"
+        elapsed = time.perf_counter() - started
+        return Outcome(message, task_type, "deferred", elapsed, lag_seconds, (retry_task, retry.delay_seconds))
+    except Exception as error:
+        # A task the handler cannot run is reported and acked, not retried: it would fail the same way again.
+        return failed_outcome(task, task_type, error, time.perf_counter() - started, lag_seconds)
+    elapsed = time.perf_counter() - started
+    message = f"processed id={task.get('id')} type={task_type} result={result!r}"
+    return Outcome(message, task_type, "ok", elapsed, lag_seconds)
+
+
+def failed_outcome(task: dict, task_type: str, error: Exception, elapsed: float, lag_seconds: float | None) -> Outcome:
+    message = f"failed id={task.get('id')} type={task_type} error={error!r}"
+    return Outcome(message, task_type, "error", elapsed, lag_seconds)
+
+
+def outcome_of(future: "Future[Outcome] | asyncio.Task[Outcome]") -> Outcome:
+    # Handler errors already come back as outcomes; this covers the pool itself failing (a killed process, a
+    # result that cannot be pickled), so one delivery cannot stop the loop or keep the rest of its batch unacked.
+    try:
+        return future.result()
+    except Exception as error:
+        return Outcome(f"failed to run task: {error!r}", "unknown", "error", 0.0, None)
+
+
+def fetch_timeout(timeout: int, next_due: float | None, in_flight: int) -> float:
+    # Wake up in time for the next delayed task and poll briefly while tasks run so their results are
+    # reported and acked promptly. A zero timeout would make BRPOP block forever.
+    limit = float(timeout)
+    if next_due is not None:
+        limit = min(limit, next_due)
+    if in_flight:
+        limit = min(limit, IN_FLIGHT_POLL_SECONDS)
+    return max(0.05, limit)
+
+
+def record_outcome(outcome: Outcome, metrics: WorkerMetrics, quiet: bool) -> None:
+    metrics.observe_task(outcome.task_type, outcome.status, outcome.handler_seconds, outcome.lag_seconds)
+    if not quiet or outcome.status == "error":
+        print(outcome.message)
+
+
+def start_metrics_endpoint(args: argparse.Namespace, metrics: WorkerMetrics) -> None:
+    # Scrapes run on HTTP threads, so depth is read through a separate synchronous client in every mode.
+    queue = open_queue(
+        get_client(args.redis_url), args.backend, args.queue, args.group, args.consumer, args.max_deliveries
+    )
+    delayed = DelayedQueue(queue)
+    metrics.add_gauge("queue_worker_queue_depth", "Tasks waiting in the queue.", queue.depth)
+    metrics.add_gauge("queue_worker_delayed_depth", "Tasks parked in the delayed queue.", delayed.depth)
+    serve_metrics(metrics, args.metrics_port)
+    print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+
+
+def _ignore_sigint() -> None:
+    # The parent decides when to stop; pool processes must finish what they were given.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _install_stop_handlers(stop: threading.Event) -> None:
+    def request_stop(signum: int, _frame: object) -> None:
+        if not stop.is_set():
+            print(f"\nReceived {signal.Signals(signum).name}, draining in-flight tasks...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+
+def run_pool(args: argparse.Namespace, metrics: WorkerMetrics, stop: threading.Event | None = None) -> int:
+    """Runs until `stop` is set (by default on SIGINT/SIGTERM), then drains the tasks already fetched."""
+    client = get_client(args.redis_url)
+    queue = open_queue(client, args.backend, args.queue, args.group, args.consumer, args.max_deliveries)
+    delayed = DelayedQueue(queue)
+    executor: Executor
+    if args.mode == "process":
+        executor = ProcessPoolExecutor(max_workers=args.concurrency, initializer=_ignore_sigint)
+    else:
+        executor = ThreadPoolExecutor(max_workers=args.concurrency)
+
+    if stop is None:
+        stop = threading.Event()
+        _install_stop_handlers(stop)
+    max_in_flight = args.concurrency + args.prefetch
+    pending: dict[Future, bytes | None] = {}
+    processed = 0
+    # Sweep right away so entries left pending by a crashed consumer are picked up on restart.
+    next_claim = time.monotonic()
+
+    def submit(deliveries: list[Delivery]) -> None:
+        for delivery_id, raw_task in deliveries:
+            pending[executor.submit(process_raw_task, raw_task)] = delivery_id
+
+    def report(done: set[Future]) -> int:
+        for future in done:
+            outcome = outcome_of(future)
+            record_outcome(outcome, metrics, args.quiet)
+            if outcome.retry is not None:
+                delayed.schedule(*outcome.retry)
+        # One XACK per batch of finished tasks rather than one per task.
+        queue.ack([pending.pop(future) for future in done])
+        return len(done)
+
+    with executor:
+        while not stop.is_set():
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                processed += report(done)
+                continue
+
+            if time.monotonic() >= next_claim:
+                submit(queue.claim_stale(args.claim_idle_ms, max_in_flight - len(pending)))
+                next_claim = time.monotonic() + args.claim_interval
+            _, next_due = delayed.move_due()
+            batch_size = min(args.prefetch, max_in_flight - len(pending))
+            submit(queue.fetch(batch_size, fetch_timeout(args.timeout, next_due, len(pending))))
+            processed += report({future for future in pending if future.done()})
+
+        # Every fetched task was already submitted, so draining means waiting for the pool.
+        done, _ = wait(pending)
+        processed += report(done)
+    return processed
+
+
+async def run_asyncio(args: argparse.Namespace, metrics: WorkerMetrics, stop: asyncio.Event | None = None) -> int:
+    """Runs until `stop` is set (by default on SIGINT/SIGTERM), then drains the tasks already fetched."""
+    client = make_async_client(args.redis_url)
+    queue = await open_async_queue(
+        client, args.backend, args.queue, args.group, args.consumer, args.max_deliveries
+    )
+    delayed = AsyncDelayedQueue(queue)
+    loop = asyncio.get_running_loop()
+    if stop is None:
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+    # Handlers are synchronous, so they run on threads; on the loop they would run one at a time and hold up
+    # the fetches and acks. The semaphore bounds the tasks handed to the pool.
+    executor = ThreadPoolExecutor(max_workers=args.concurrency)
+    limiter = asyncio.Semaphore(args.concurrency)
+    max_in_flight = args.concurrency + args.prefetch
+    pending: dict[asyncio.Task, bytes | None] = {}
+    processed = 0
+    # Sweep right away so entries left pending by a crashed consumer are picked up on restart.
+    next_claim = time.monotonic()
+
+    async def run_one(raw_task: bytes) -> Outcome:
+        async with limiter:
+            return await loop.run_in_executor(executor, process_raw_task, raw_task)
+
+    def submit(deliveries: list[Delivery]) -> None:
+        for delivery_id, raw_task in deliveries:
+            pending[asyncio.create_task(run_one(raw_task))] = delivery_id
+
+    async def report(done: set[asyncio.Task]) -> int:
+        for task in done:
+            outcome = outcome_of(task)
+            record_outcome(outcome, metrics, args.quiet)
+            if outcome.retry is not None:
+                await delayed.schedule(*outcome.retry)
+        await queue.ack([pending.pop(task) for task in done])
+        return len(done)
+
+    try:
+        while not stop.is_set():
+            if len(pending) >= max_in_flight:
+                done, _ = await asyncio.wait(pending, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+                processed += await report(done)
+                continue
+
+            if time.monotonic() >= next_claim:
+                submit(await queue.claim_stale(args.claim_idle_ms, max_in_flight - len(pending)))
+                next_claim = time.monotonic() + args.claim_interval
+            _, next_due = await delayed.move_due()
+            batch_size = min(args.prefetch, max_in_flight - len(pending))
+            submit(await queue.fetch(batch_size, fetch_timeout(args.timeout, next_due, len(pending))))
+            processed += await report({task for task in pending if task.done()})
+
+        print("\nDraining in-flight tasks...")
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            processed += await report(done)
+    finally:
+        executor.shutdown()
+        await client.aclose()
+    return processed
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Redis queue worker")
     parser.add_argument("--redis-url", default="redis://localhost:6379/0")
     parser.add_argument("--queue", default="demo:tasks")
     parser.add_argument("--timeout", type=int, default=5)
+    parser.add_argument("--mode", choices=["thread", "process", "asyncio"], default="thread")
+    parser.add_argument("--concurrency", type=int, default=1, help="tasks handled at the same time")
+    parser.add_argument("--prefetch", type=int, default=1, help="max tasks popped per round trip")
+    parser.add_argument("--backend", choices=["list", "stream"], default="list")
+    parser.add_argument("--group", default="workers", help="stream consumer group")
+    parser.add_argument("--consumer", default=None, help="stream consumer name, defaults to host-pid")
+    parser.add_argument("--claim-idle-ms", type=int, default=60000, help="claim stream entries idle this long")
+    parser.add_argument("--claim-interval", type=float, default=30.0, help="seconds between XAUTOCLAIM sweeps")
+    parser.add_argument(
+        "--max-deliveries",
+        type=int,
+        default=MAX_DELIVERIES,
+        help="stream entries claimed more often than this go to the <queue>:dead stream",
+    )
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port, 0 = off")
+    parser.add_argument("--quiet", action="store_true", help="do not print a line per task")
     args = parser.parse_args()
+    args.concurrency = max(1, args.concurrency)
+    args.prefetch = max(1, args.prefetch)
 
-    client = redis.Redis.from_url(args.redis_url, decode_responses=True)
-    print(f"Worker started. Waiting for tasks from {args.queue!r}...")
-
-    try:
-        while True:
-            item = client.brpop(args.queue, timeout=args.timeout)
-            if item is None:
-                continue
-
-            _, raw_task = item
-            try:
-                task = json.loads(raw_task)
-            except json.JSONDecodeError:
-                print(f"skip invalid task: {raw_task!r}")
-                continue
+    print(
+        f"Worker started in {args.mode} mode on the {args.backend} backend "
+        f"(concurrency={args.concurrency}, prefetch={args.prefetch}). "
+        f"Waiting for tasks from {args.queue!r}..."
+    )
+    metrics = WorkerMetrics(args.queue)
+    if args.metrics_port:
+        start_metrics_endpoint(args, metrics)
 
-            result = handle_task(task)
-            print(f"processed id={task.get('id')} type={task.get('type')} result={result!r}")
-    except KeyboardInterrupt:
-        print("\nWorker stopped.")
+    started = time.perf_counter()
+    if args.mode == "asyncio":
+        processed = asyncio.run(run_asyncio(args, metrics))
+    else:
+        processed = run_pool(args, metrics)
+    elapsed = time.perf_counter() - started
+    print(f"Worker stopped. processed={processed} in {elapsed:.1f}s ({processed / elapsed:.1f} tasks/s)")
 
 
 if __name__ == "__main__":
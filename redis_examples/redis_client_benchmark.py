@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import threading
+import time
+
+from redis_clients import make_async_client, make_client
+
+KEY_COUNT = 1000
+
+
+def run_threads(args: argparse.Namespace, auto_pipeline: bool, threads: int) -> tuple[float, dict | None]:
+    client = make_client(
+        args.redis_url, auto_pipeline=auto_pipeline, max_connections=threads, auto_pipeline_window=args.window
+    )
+    stop = threading.Event()
+    counts = [0] * threads
+
+    def work(index: int) -> None:
+        key = f"bench:client:{index % KEY_COUNT}"
+        while not stop.is_set():
+            client.set(key, "value")
+            client.get(key)
+            counts[index] += 2
+
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(threads)]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    time.sleep(args.duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - started
+    client.close()
+    return sum(counts) / elapsed, getattr(client, "auto_pipeline_stats", None)
+
+
+async def run_tasks(args: argparse.Namespace, auto_pipeline: bool, tasks: int) -> tuple[float, dict | None]:
+    client = make_async_client(
+        args.redis_url, auto_pipeline=auto_pipeline, max_connections=tasks, auto_pipeline_window=args.window
+    )
+    deadline = time.monotonic() + args.duration
+    counts = [0] * tasks
+
+    async def work(index: int) -> None:
+        key = f"bench:client:{index % KEY_COUNT}"
+        while time.monotonic() < deadline:
+            await client.set(key, "value")
+            await client.get(key)
+            counts[index] += 2
+
+    started = time.monotonic()
+    await asyncio.gather(*(work(index) for index in range(tasks)))
+    elapsed = time.monotonic() - started
+    await client.aclose()
+    return sum(counts) / elapsed, getattr(client, "auto_pipeline_stats", None)
+
+
+def format_batch(stats: dict | None) -> str:
+    if not stats or not stats["flushes"]:
+        return "-"
+    return f"{stats['commands'] / stats['flushes']:.1f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SET+GET ops/s of concurrent callers with and without auto-pipelining")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--tasks", type=int, nargs="+", default=[1, 64, 256])
+    parser.add_argument("--window", type=float, default=0.0, help="auto-pipeline flush window in seconds")
+    args = parser.parse_args()
+
+    print(f"{'callers':>12} {'plain ops/s':>12} {'auto ops/s':>12} {'cmds/flush':>11}")
+    for threads in args.threads:
+        plain, _ = run_threads(args, False, threads)
+        auto, stats = run_threads(args, True, threads)
+        print(f"{f'{threads} threads':>12} {plain:>12.0f} {auto:>12.0f} {format_batch(stats):>11}")
+    for tasks in args.tasks:
+        plain, _ = asyncio.run(run_tasks(args, False, tasks))
+        auto, stats = asyncio.run(run_tasks(args, True, tasks))
+        print(f"{f'{tasks} tasks':>12} {plain:>12.0f} {auto:>12.0f} {format_batch(stats):>11}")
+
+
+if __name__ == "__main__":
+    main()
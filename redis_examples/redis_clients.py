@@ -0,0 +1,210 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any
+
+import redis
+import redis.asyncio as aioredis
+
+MAX_CONNECTIONS = 32
+POOL_TIMEOUT_SECONDS = 5.0
+CONNECT_TIMEOUT_SECONDS = 2.0
+HEALTH_CHECK_INTERVAL_SECONDS = 30
+# 0 batches whatever queued up while the previous flush was on the wire (or within one event-loop pass),
+# so a lone caller pays no added latency; a positive window trades latency for bigger batches.
+AUTO_PIPELINE_WINDOW_SECONDS = 0.0
+AUTO_PIPELINE_MAX_BATCH = 512
+
+# Commands that wait server-side or change connection state cannot share a pipeline with other callers.
+UNPIPELINED_COMMANDS = {
+    "BLPOP", "BRPOP", "BRPOPLPUSH", "BLMOVE", "BLMPOP", "BZPOPMIN", "BZPOPMAX", "BZMPOP",
+    "XREAD", "XREADGROUP", "WAIT", "WATCH", "UNWATCH", "MULTI", "EXEC", "DISCARD", "SELECT",
+}
+
+_clients: dict[tuple[str, bool, bool], redis.Redis] = {}
+_clients_lock = threading.Lock()
+
+
+def pool_kwargs(max_connections: int = MAX_CONNECTIONS) -> dict[str, Any]:
+    """Connection settings shared by the sync and asyncio factories.
+
+    socket_timeout stays unset: workers and subscribers block on BRPOP/XREADGROUP/pub/sub reads for longer
+    than any sensible command timeout. Dead peers are found by TCP keepalive and the PING health check that
+    runs before a connection idle for HEALTH_CHECK_INTERVAL_SECONDS is reused.
+    """
+    return {
+        "max_connections": max_connections,
+        "timeout": POOL_TIMEOUT_SECONDS,
+        "socket_connect_timeout": CONNECT_TIMEOUT_SECONDS,
+        "socket_keepalive": True,
+        "health_check_interval": HEALTH_CHECK_INTERVAL_SECONDS,
+    }
+
+
+def make_client(
+    redis_url: str,
+    decode_responses: bool = False,
+    auto_pipeline: bool = False,
+    max_connections: int = MAX_CONNECTIONS,
+    auto_pipeline_window: float = AUTO_PIPELINE_WINDOW_SECONDS,
+) -> redis.Redis:
+    # A blocking pool waits up to POOL_TIMEOUT_SECONDS for a free connection instead of opening without bound.
+    pool = redis.BlockingConnectionPool.from_url(
+        redis_url, decode_responses=decode_responses, **pool_kwargs(max_connections)
+    )
+    if auto_pipeline:
+        return AutoPipelineRedis(connection_pool=pool, auto_pipeline_window=auto_pipeline_window)
+    return redis.Redis(connection_pool=pool)
+
+
+def get_client(redis_url: str, decode_responses: bool = False, auto_pipeline: bool = False) -> redis.Redis:
+    """Process-wide client per (url, decoding, auto-pipelining), so every caller shares one pool."""
+    key = (redis_url, decode_responses, auto_pipeline)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = make_client(redis_url, decode_responses, auto_pipeline)
+        return _clients[key]
+
+
+def make_async_client(
+    redis_url: str,
+    decode_responses: bool = False,
+    auto_pipeline: bool = False,
+    max_connections: int = MAX_CONNECTIONS,
+    auto_pipeline_window: float = AUTO_PIPELINE_WINDOW_SECONDS,
+) -> aioredis.Redis:
+    # Not cached like get_client: asyncio connections belong to the event loop that opened them.
+    pool = aioredis.BlockingConnectionPool.from_url(
+        redis_url, decode_responses=decode_responses, **pool_kwargs(max_connections)
+    )
+    if auto_pipeline:
+        return AsyncAutoPipelineRedis(connection_pool=pool, auto_pipeline_window=auto_pipeline_window)
+    return aioredis.Redis(connection_pool=pool)
+
+
+def _is_pipelined(args: tuple) -> bool:
+    return str(args[0]).upper() not in UNPIPELINED_COMMANDS
+
+
+class AutoPipelineRedis(redis.Redis):
+    """Redis client that sends commands from concurrent threads to the server as shared pipelines.
+
+    Each call still blocks until its own reply arrives. A flusher thread takes whatever was queued,
+    optionally waits up to `auto_pipeline_window` for more (at most `auto_pipeline_max_batch`), and sends
+    it as one non-transactional pipeline, so N concurrent callers share a round trip instead of paying N.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        auto_pipeline_window: float = AUTO_PIPELINE_WINDOW_SECONDS,
+        auto_pipeline_max_batch: int = AUTO_PIPELINE_MAX_BATCH,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.auto_pipeline_window = auto_pipeline_window
+        self.auto_pipeline_max_batch = auto_pipeline_max_batch
+        self.auto_pipeline_stats = {"commands": 0, "flushes": 0}
+        self._pending: list[tuple[tuple, dict, Future]] = []
+        self._pending_ready = threading.Condition()
+        self._flusher: threading.Thread | None = None
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        if not _is_pipelined(args):
+            return super().execute_command(*args, **options)
+        reply: Future = Future()
+        with self._pending_ready:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_forever, name="redis-autopipeline", daemon=True)
+                self._flusher.start()
+            self._pending.append((args, options, reply))
+            self._pending_ready.notify()
+        return reply.result()
+
+    def _flush_forever(self) -> None:
+        while True:
+            with self._pending_ready:
+                while not self._pending:
+                    self._pending_ready.wait()
+                if self.auto_pipeline_window > 0 and len(self._pending) < self.auto_pipeline_max_batch:
+                    # Wakes early when the batch fills up; a lone caller pays at most the window.
+                    self._pending_ready.wait_for(
+                        lambda: len(self._pending) >= self.auto_pipeline_max_batch, self.auto_pipeline_window
+                    )
+                batch = self._pending[: self.auto_pipeline_max_batch]
+                del self._pending[: self.auto_pipeline_max_batch]
+            self._send(batch)
+
+    def _send(self, batch: list[tuple[tuple, dict, Future]]) -> None:
+        self.auto_pipeline_stats["commands"] += len(batch)
+        self.auto_pipeline_stats["flushes"] += 1
+        try:
+            with self.pipeline(transaction=False) as pipe:
+                for args, options, _ in batch:
+                    pipe.execute_command(*args, **options)
+                results = pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            for _, _, reply in batch:
+                reply.set_exception(exc)
+            return
+        for (_, _, reply), result in zip(batch, results):
+            if isinstance(result, Exception):
+                reply.set_exception(result)
+            else:
+                reply.set_result(result)
+
+
+class AsyncAutoPipelineRedis(aioredis.Redis):
+    """asyncio counterpart: commands awaited by tasks in the same loop iteration (or window) share a pipeline."""
+
+    def __init__(
+        self,
+        *args: Any,
+        auto_pipeline_window: float = AUTO_PIPELINE_WINDOW_SECONDS,
+        auto_pipeline_max_batch: int = AUTO_PIPELINE_MAX_BATCH,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.auto_pipeline_window = auto_pipeline_window
+        self.auto_pipeline_max_batch = auto_pipeline_max_batch
+        self.auto_pipeline_stats = {"commands": 0, "flushes": 0}
+        self._pending: list[tuple[tuple, dict, asyncio.Future]] = []
+        self._flush_task: asyncio.Task | None = None
+
+    async def execute_command(self, *args: Any, **options: Any) -> Any:
+        if not _is_pipelined(args):
+            return await super().execute_command(*args, **options)
+        reply = asyncio.get_running_loop().create_future()
+        self._pending.append((args, options, reply))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+        return await reply
+
+    async def _flush(self) -> None:
+        # With a zero window, sleep(0) still collects every command issued before the loop gets back to us.
+        await asyncio.sleep(self.auto_pipeline_window)
+        while self._pending:
+            batch = self._pending[: self.auto_pipeline_max_batch]
+            del self._pending[: self.auto_pipeline_max_batch]
+            await self._send(batch)
+
+    async def _send(self, batch: list[tuple[tuple, dict, asyncio.Future]]) -> None:
+        self.auto_pipeline_stats["commands"] += len(batch)
+        self.auto_pipeline_stats["flushes"] += 1
+        try:
+            async with self.pipeline(transaction=False) as pipe:
+                for args, options, _ in batch:
+                    pipe.execute_command(*args, **options)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            for _, _, reply in batch:
+                if not reply.done():
+                    reply.set_exception(exc)
+            return
+        for (_, _, reply), result in zip(batch, results):
+            if reply.done():
+                continue
+            if isinstance(result, Exception):
+                reply.set_exception(result)
+            else:
+                reply.set_result(result)
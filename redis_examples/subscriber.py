@@ -1,15 +1,15 @@
 import argparse
+import asyncio
+import signal
 
 import redis
 
+from pubsub_fanout import DROP_POLICIES, FanoutSubscriber, Message
+from redis_clients import get_client, make_async_client
 
-def main() -> None:
-    parser = argparse.ArgumentParser(description="Redis pub/sub subscriber")
-    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
-    parser.add_argument("--channel", default="demo:chat")
-    args = parser.parse_args()
 
-    client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+def run_sync(args: argparse.Namespace) -> None:
+    client = get_client(args.redis_url, decode_responses=True)
     pubsub = client.pubsub()
     pubsub.subscribe(args.channel)
 
@@ -25,5 +25,66 @@ def main() -> None:
         pubsub.close()
 
 
+async def report(subscriber: FanoutSubscriber, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        print(f"queue={subscriber.queue_depth()} {subscriber.metrics.snapshot()}")
+
+
+async def run_asyncio(args: argparse.Namespace) -> None:
+    client = make_async_client(args.redis_url, decode_responses=True)
+    subscriber = FanoutSubscriber(client, args.queue_size, args.batch_size, args.batch_interval, args.drop)
+
+    async def print_batch(batch: list[Message]) -> None:
+        if args.quiet:
+            return
+        for message in batch:
+            print(f"received on {message.channel}: {message.data}")
+
+    patterns = args.pattern or [args.channel]
+    for pattern in patterns:
+        subscriber.add_handler(pattern, print_batch)
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, subscriber.stop)
+
+    reporter = asyncio.create_task(report(subscriber, args.report_interval))
+    print(f"Subscribed to patterns {patterns}. Waiting for messages...")
+    try:
+        while True:
+            try:
+                await subscriber.run()
+                break
+            except redis.ConnectionError as exc:
+                # Pub/sub keeps no backlog: whatever was published while disconnected is gone.
+                print(f"Subscription lost ({exc}), resubscribing in 1s...")
+                await asyncio.sleep(1)
+    finally:
+        reporter.cancel()
+        await client.aclose()
+    print(f"\nSubscriber stopped. {subscriber.metrics.snapshot()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Redis pub/sub subscriber")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--channel", default="demo:chat")
+    parser.add_argument("--mode", choices=["sync", "asyncio"], default="sync")
+    parser.add_argument("--pattern", action="append", help="glob pattern for --mode asyncio, repeatable")
+    parser.add_argument("--batch-size", type=int, default=500, help="max messages per handler call")
+    parser.add_argument("--batch-interval", type=float, default=0.005, help="seconds to wait to fill a batch")
+    parser.add_argument("--queue-size", type=int, default=10000, help="messages buffered before dropping")
+    parser.add_argument("--drop", choices=DROP_POLICIES, default="oldest", help="what to drop when the queue is full")
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--quiet", action="store_true", help="do not print every message")
+    args = parser.parse_args()
+
+    if args.mode == "sync":
+        run_sync(args)
+    else:
+        asyncio.run(run_asyncio(args))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,92 @@
+import json
+import zlib
+
+# Encoded task: b"TQ" + version byte + flags byte + body. Anything without the magic is a legacy JSON task.
+MAGIC = b"TQ"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 2
+
+FORMATS = {"json": 0, "msgpack": 1}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+_FORMAT_MASK = 0x0F
+_COMPRESSION_SHIFT = 4
+
+
+def _serialize(task: dict, codec: str) -> bytes:
+    if codec == "msgpack":
+        import msgpack
+
+        return msgpack.packb(task, use_bin_type=True)
+    return json.dumps(task, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _deserialize(body: bytes, codec: str) -> dict:
+    if codec == "msgpack":
+        import msgpack
+
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def _compress(body: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.compress(body)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(body)
+    return body
+
+
+def _decompress(body: bytes, compression: str) -> bytes:
+    if compression == "zlib":
+        return zlib.decompress(body)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(body)
+    return body
+
+
+def encode_task(task: dict, codec: str = "json", compression: str = "none") -> bytes:
+    if codec not in FORMATS:
+        raise ValueError(f"unknown codec: {codec}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression: {compression}")
+
+    flags = FORMATS[codec] | (COMPRESSIONS[compression] << _COMPRESSION_SHIFT)
+    body = _compress(_serialize(task, codec), compression)
+    return MAGIC + bytes([VERSION, flags]) + body
+
+
+def encoding_of(raw: bytes | str) -> tuple[str, str]:
+    """(codec, compression) a payload was written with; legacy payloads are plain JSON."""
+    if isinstance(raw, str) or not raw.startswith(MAGIC):
+        return "json", "none"
+
+    version, flags = raw[len(MAGIC)], raw[len(MAGIC) + 1]
+    if version != VERSION:
+        raise ValueError(f"unsupported task encoding version: {version}")
+    codecs = {value: name for name, value in FORMATS.items()}
+    compressions = {value: name for name, value in COMPRESSIONS.items()}
+    codec = codecs.get(flags & _FORMAT_MASK)
+    compression = compressions.get(flags >> _COMPRESSION_SHIFT)
+    if codec is None or compression is None:
+        raise ValueError(f"unknown task encoding flags: {flags:#04x}")
+    return codec, compression
+
+
+def decode_task(raw: bytes | str) -> dict:
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    if not raw.startswith(MAGIC):
+        return json.loads(raw)
+
+    codec, compression = encoding_of(raw)
+    try:
+        return _deserialize(_decompress(raw[HEADER_SIZE:], compression), codec)
+    except (ValueError, ImportError):
+        raise
+    except Exception as exc:
+        # zlib, zstandard and msgpack each have their own error types; callers only need one.
+        raise ValueError(f"corrupt {codec}/{compression} task body") from exc
@@ -0,0 +1,375 @@
+import os
+import socket
+import time
+from uuid import uuid4
+
+import redis
+import redis.asyncio as aioredis
+
+# (delivery id, raw task). The id is what a backend needs to acknowledge the task; lists have none.
+# Tasks are binary (see task_codec), so queues expect clients created without decode_responses.
+Delivery = tuple[bytes | None, bytes]
+
+STREAM_FIELD = b"task"
+# A stream entry delivered this many times without an ack is moved to the dead-letter stream instead of rerun.
+MAX_DELIVERIES = 5
+
+# Delayed zset members are a random id followed by the task, so identical tasks scheduled together stay distinct.
+DELAYED_ID_BYTES = 16
+
+# Moves up to ARGV[2] tasks due by ARGV[1] (ms) from the delayed zset onto the ready queue in one atomic step,
+# and reports when the next remaining task is due so workers know how long they may block. ARGV[5] is the length
+# of the id in front of each task.
+MOVE_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    local tasks = {}
+    for i, member in ipairs(due) do
+        tasks[i] = string.sub(member, tonumber(ARGV[5]) + 1)
+    end
+    if ARGV[3] == 'stream' then
+        for _, task in ipairs(tasks) do
+            redis.call('XADD', KEYS[2], '*', ARGV[4], task)
+        end
+    else
+        redis.call('LPUSH', KEYS[2], unpack(tasks))
+    end
+end
+local next_due = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {#due, next_due[2] or '-1'}
+"""
+
+
+def default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _stream_deliveries(entries: list) -> list[Delivery]:
+    # XAUTOCLAIM reports entries trimmed from the stream with empty fields; there is nothing to run for those.
+    return [(entry_id, fields[STREAM_FIELD]) for entry_id, fields in entries if fields and STREAM_FIELD in fields]
+
+
+def _split_over_delivered(
+    deliveries: list[Delivery], pending: list[list[dict]], max_deliveries: int
+) -> tuple[list[Delivery], list[tuple[bytes, bytes, int]]]:
+    """Claimed deliveries to run, and (id, task, deliveries) of those past max_deliveries.
+
+    `pending` holds one XPENDING reply per delivery. XAUTOCLAIM already counted the claim as a delivery.
+    """
+    runnable, dead = [], []
+    for (entry_id, raw_task), reply in zip(deliveries, pending):
+        times_delivered = int(reply[0]["times_delivered"]) if reply else 0
+        if times_delivered > max_deliveries:
+            dead.append((entry_id, raw_task, times_delivered))
+        else:
+            runnable.append((entry_id, raw_task))
+    return runnable, dead
+
+
+def _dead_letter_fields(entry_id: bytes, raw_task: bytes, times_delivered: int) -> dict[bytes, bytes]:
+    return {STREAM_FIELD: raw_task, b"id": entry_id, b"deliveries": str(times_delivered).encode()}
+
+
+class ListQueue:
+    """LPUSH/BRPOP queue. A task is gone from Redis as soon as a worker pops it."""
+
+    def __init__(self, client: redis.Redis, name: str) -> None:
+        self.client = client
+        self.key = name
+
+    def push(self, raw_task: bytes) -> None:
+        self.client.lpush(self.key, raw_task)
+
+    def push_many(self, raw_tasks: list[bytes]) -> None:
+        if raw_tasks:
+            self.client.lpush(self.key, *raw_tasks)
+
+    def fetch(self, max_tasks: int, timeout: float) -> list[Delivery]:
+        # Non-blocking RPOP with COUNT drains a backlog in one round trip; BRPOP only when the queue is empty.
+        items = self.client.rpop(self.key, max_tasks)
+        if not items:
+            item = self.client.brpop(self.key, timeout=timeout)
+            if item is None:
+                return []
+            rest = self.client.rpop(self.key, max_tasks - 1) if max_tasks > 1 else None
+            items = [item[1], *(rest or [])]
+        return [(None, raw_task) for raw_task in items]
+
+    def ack(self, delivery_ids: list[bytes | None]) -> None:
+        pass
+
+    def claim_stale(self, min_idle_ms: int, count: int) -> list[Delivery]:
+        return []
+
+    def depth(self) -> int:
+        return self.client.llen(self.key)
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+
+
+class StreamQueue:
+    """Stream with a consumer group. Entries stay pending until acked and can be claimed from dead consumers.
+
+    Acked entries are deleted, so the stream holds only work not yet done; it is meant for a single group.
+    An entry claimed more than `max_deliveries` times is moved to the `<name>:dead` stream.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        name: str,
+        group: str = "workers",
+        consumer: str | None = None,
+        max_deliveries: int = MAX_DELIVERIES,
+    ) -> None:
+        self.client = client
+        self.key = f"{name}:stream"
+        self.dead_key = f"{name}:dead"
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.max_deliveries = max_deliveries
+        self._claim_cursor = "0-0"
+
+    def ensure_group(self) -> None:
+        try:
+            self.client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    def push(self, raw_task: bytes) -> None:
+        self.client.xadd(self.key, {STREAM_FIELD: raw_task})
+
+    def push_many(self, raw_tasks: list[bytes]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for raw_task in raw_tasks:
+            pipe.xadd(self.key, {STREAM_FIELD: raw_task})
+        pipe.execute()
+
+    def fetch(self, max_tasks: int, timeout: float) -> list[Delivery]:
+        response = self.client.xreadgroup(
+            self.group, self.consumer, {self.key: ">"}, count=max_tasks, block=max(1, int(timeout * 1000))
+        )
+        return [delivery for _, entries in response or [] for delivery in _stream_deliveries(entries)]
+
+    def ack(self, delivery_ids: list[bytes | None]) -> None:
+        ids = [delivery_id for delivery_id in delivery_ids if delivery_id is not None]
+        if ids:
+            # XADD does not trim, so finished entries are deleted here; nothing else reads them after the ack.
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(self.key, self.group, *ids)
+            pipe.xdel(self.key, *ids)
+            pipe.execute()
+
+    def claim_stale(self, min_idle_ms: int, count: int) -> list[Delivery]:
+        # Walks the pending list a page per call; the cursor wraps to 0-0 after the last page.
+        self._claim_cursor, entries, *_ = self.client.xautoclaim(
+            self.key, self.group, self.consumer, min_idle_ms, start_id=self._claim_cursor, count=count
+        )
+        deliveries = _stream_deliveries(entries)
+        if not deliveries:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for entry_id, _ in deliveries:
+            pipe.xpending_range(self.key, self.group, entry_id, entry_id, 1)
+        runnable, dead = _split_over_delivered(deliveries, pipe.execute(), self.max_deliveries)
+        if dead:
+            # The claim made this consumer the owner, so no other worker moves the same entries meanwhile.
+            pipe = self.client.pipeline(transaction=True)
+            for entry_id, raw_task, times_delivered in dead:
+                pipe.xadd(self.dead_key, _dead_letter_fields(entry_id, raw_task, times_delivered))
+                pipe.xack(self.key, self.group, entry_id)
+                pipe.xdel(self.key, entry_id)
+            pipe.execute()
+        return runnable
+
+    def depth(self) -> int:
+        # Entries not yet delivered to the group plus entries delivered but not acked.
+        for group in self.client.xinfo_groups(self.key):
+            name = group["name"].decode() if isinstance(group["name"], bytes) else group["name"]
+            if name == self.group:
+                return int(group.get("lag") or 0) + int(group.get("pending") or 0)
+        return 0
+
+    def clear(self) -> None:
+        # Deleting the stream drops its groups too; recreate ours so the queue stays usable.
+        self.client.delete(self.key, self.dead_key)
+        self._claim_cursor = "0-0"
+        self.ensure_group()
+
+
+class AsyncListQueue:
+    def __init__(self, client: aioredis.Redis, name: str) -> None:
+        self.client = client
+        self.key = name
+
+    async def fetch(self, max_tasks: int, timeout: float) -> list[Delivery]:
+        items = await self.client.rpop(self.key, max_tasks)
+        if not items:
+            item = await self.client.brpop(self.key, timeout=timeout)
+            if item is None:
+                return []
+            rest = await self.client.rpop(self.key, max_tasks - 1) if max_tasks > 1 else None
+            items = [item[1], *(rest or [])]
+        return [(None, raw_task) for raw_task in items]
+
+    async def ack(self, delivery_ids: list[bytes | None]) -> None:
+        pass
+
+    async def claim_stale(self, min_idle_ms: int, count: int) -> list[Delivery]:
+        return []
+
+
+class AsyncStreamQueue:
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        name: str,
+        group: str = "workers",
+        consumer: str | None = None,
+        max_deliveries: int = MAX_DELIVERIES,
+    ) -> None:
+        self.client = client
+        self.key = f"{name}:stream"
+        self.dead_key = f"{name}:dead"
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.max_deliveries = max_deliveries
+        self._claim_cursor = "0-0"
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def fetch(self, max_tasks: int, timeout: float) -> list[Delivery]:
+        response = await self.client.xreadgroup(
+            self.group, self.consumer, {self.key: ">"}, count=max_tasks, block=max(1, int(timeout * 1000))
+        )
+        return [delivery for _, entries in response or [] for delivery in _stream_deliveries(entries)]
+
+    async def ack(self, delivery_ids: list[bytes | None]) -> None:
+        ids = [delivery_id for delivery_id in delivery_ids if delivery_id is not None]
+        if ids:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.xack(self.key, self.group, *ids)
+            pipe.xdel(self.key, *ids)
+            await pipe.execute()
+
+    async def claim_stale(self, min_idle_ms: int, count: int) -> list[Delivery]:
+        self._claim_cursor, entries, *_ = await self.client.xautoclaim(
+            self.key, self.group, self.consumer, min_idle_ms, start_id=self._claim_cursor, count=count
+        )
+        deliveries = _stream_deliveries(entries)
+        if not deliveries:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for entry_id, _ in deliveries:
+            pipe.xpending_range(self.key, self.group, entry_id, entry_id, 1)
+        runnable, dead = _split_over_delivered(deliveries, await pipe.execute(), self.max_deliveries)
+        if dead:
+            pipe = self.client.pipeline(transaction=True)
+            for entry_id, raw_task, times_delivered in dead:
+                pipe.xadd(self.dead_key, _dead_letter_fields(entry_id, raw_task, times_delivered))
+                pipe.xack(self.key, self.group, entry_id)
+                pipe.xdel(self.key, entry_id)
+            await pipe.execute()
+        return runnable
+
+
+class DelayedQueue:
+    """Sorted set of tasks scored by due time (ms). Due tasks are moved onto the ready queue by a Lua script."""
+
+    def __init__(self, queue: ListQueue | StreamQueue) -> None:
+        self.client = queue.client
+        self.key = f"{queue.key}:delayed"
+        self.target_key = queue.key
+        self.target_type = "stream" if isinstance(queue, StreamQueue) else "list"
+        self._move_due = self.client.register_script(MOVE_DUE_SCRIPT)
+
+    def schedule(self, raw_task: bytes, delay_seconds: float) -> None:
+        self.client.zadd(self.key, {_delayed_member(raw_task): _due_at_ms(delay_seconds)})
+
+    def schedule_many(self, raw_tasks: list[bytes], delay_seconds: float) -> None:
+        if raw_tasks:
+            due_at = _due_at_ms(delay_seconds)
+            self.client.zadd(self.key, {_delayed_member(raw_task): due_at for raw_task in raw_tasks})
+
+    def move_due(self, limit: int = 100) -> tuple[int, float | None]:
+        """Returns (tasks moved, seconds until the next delayed task is due or None when nothing is left)."""
+        moved, next_due = self._move_due(
+            keys=[self.key, self.target_key],
+            args=[_due_at_ms(0), limit, self.target_type, STREAM_FIELD, DELAYED_ID_BYTES],
+        )
+        return int(moved), _seconds_until(next_due)
+
+    def depth(self) -> int:
+        return self.client.zcard(self.key)
+
+
+class AsyncDelayedQueue:
+    def __init__(self, queue: "AsyncListQueue | AsyncStreamQueue") -> None:
+        self.client = queue.client
+        self.key = f"{queue.key}:delayed"
+        self.target_key = queue.key
+        self.target_type = "stream" if isinstance(queue, AsyncStreamQueue) else "list"
+        self._move_due = self.client.register_script(MOVE_DUE_SCRIPT)
+
+    async def schedule(self, raw_task: bytes, delay_seconds: float) -> None:
+        await self.client.zadd(self.key, {_delayed_member(raw_task): _due_at_ms(delay_seconds)})
+
+    async def move_due(self, limit: int = 100) -> tuple[int, float | None]:
+        moved, next_due = await self._move_due(
+            keys=[self.key, self.target_key],
+            args=[_due_at_ms(0), limit, self.target_type, STREAM_FIELD, DELAYED_ID_BYTES],
+        )
+        return int(moved), _seconds_until(next_due)
+
+
+def _delayed_member(raw_task: bytes) -> bytes:
+    return uuid4().bytes + raw_task
+
+
+def _due_at_ms(delay_seconds: float) -> int:
+    return int((time.time() + max(0.0, delay_seconds)) * 1000)
+
+
+def _seconds_until(due_at_ms: bytes | str) -> float | None:
+    due_at = float(due_at_ms)
+    if due_at < 0:
+        return None
+    return max(0.0, due_at / 1000 - time.time())
+
+
+def open_queue(
+    client: redis.Redis,
+    backend: str,
+    name: str,
+    group: str = "workers",
+    consumer: str | None = None,
+    max_deliveries: int = MAX_DELIVERIES,
+) -> ListQueue | StreamQueue:
+    if backend == "stream":
+        queue = StreamQueue(client, name, group, consumer, max_deliveries)
+        queue.ensure_group()
+        return queue
+    return ListQueue(client, name)
+
+
+async def open_async_queue(
+    client: aioredis.Redis,
+    backend: str,
+    name: str,
+    group: str = "workers",
+    consumer: str | None = None,
+    max_deliveries: int = MAX_DELIVERIES,
+) -> AsyncListQueue | AsyncStreamQueue:
+    if backend == "stream":
+        queue = AsyncStreamQueue(client, name, group, consumer, max_deliveries)
+        await queue.ensure_group()
+        return queue
+    return AsyncListQueue(client, name)
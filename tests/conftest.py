@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import os
+import sys
 import uuid
+from pathlib import Path
 from typing import Generator
 
 import pytest
@@ -13,6 +15,11 @@ from sqlalchemy.orm import Session
 
 from orm_app.base import Base
 
+ROOT = Path(__file__).resolve().parents[1]
+# These directories hold scripts that import their siblings by plain module name, as they do when run from there.
+for script_dir in ("analysis", "redis_examples", "scripts"):
+    sys.path.insert(0, str(ROOT / script_dir))
+
 
 @pytest.fixture(scope="session")
 def db_engine() -> Generator[Engine, None, None]:
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import avocado_analysis
+from avocado_analysis import (
+    StageCache,
+    append_clean_stats,
+    clean_data,
+    compute_category_stats,
+    fetch_from_sqlite,
+    file_sha256,
+    iqr_fences,
+    iqr_outlier_mask,
+    load_columnar,
+    read_appended_rows,
+    read_csv_typed,
+)
+from avocado_sqlite import bulk_load_sqlite
+
+CSV_TEXT = """,Date,AveragePrice,Total Volume,type,year,region
+0,2015-12-27,1.33,64236.62,conventional,2015,Albany
+1,2015-12-20,1.35,54876.98,conventional,2015,Albany
+2,2015-12-20,1.35,54876.98,conventional,2015,Albany
+3,2015-12-27,1.83,989.55,organic,2015,Boston
+"""
+
+
+def write_csv(tmp_path: Path) -> Path:
+    csv_path = tmp_path / "avocado.csv"
+    csv_path.write_text(CSV_TEXT, encoding="utf-8")
+    return csv_path
+
+
+def test_read_csv_typed_parses_dates_and_categories_and_drops_row_index(tmp_path: Path) -> None:
+    df = read_csv_typed(write_csv(tmp_path))
+
+    assert "Unnamed: 0" not in df.columns
+    assert pd.api.types.is_datetime64_any_dtype(df["Date"])
+    assert isinstance(df["type"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+
+
+def test_load_columnar_reuses_parquet_and_matches_the_sqlite_round_trip(tmp_path: Path) -> None:
+    csv_path = write_csv(tmp_path)
+    parquet_path = tmp_path / "avocado.parquet"
+
+    typed = load_columnar(csv_path, parquet_path)
+    assert parquet_path.exists()
+    pd.testing.assert_frame_equal(load_columnar(csv_path, parquet_path), typed)
+
+    db_path = tmp_path / "avocado.sqlite"
+    bulk_load_sqlite([typed], db_path, "avocado")
+    columnar_clean, columnar_report = clean_data(typed)
+    legacy_clean, legacy_report = clean_data(fetch_from_sqlite(db_path, "avocado"))
+
+    assert columnar_report == legacy_report
+    assert columnar_report["duplicates_removed"] == 1
+    pd.testing.assert_frame_equal(
+        columnar_clean.reset_index(drop=True),
+        legacy_clean.reset_index(drop=True),
+        check_dtype=False,
+        check_categorical=False,
+    )
+
+
+def test_iqr_outlier_mask_matches_the_column_by_column_filter() -> None:
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({"a": rng.lognormal(size=500), "b": rng.normal(size=500), "c": rng.exponential(size=500)})
+    expected = df.copy()
+    for col in ["a", "b", "c"]:
+        q1, q3 = expected[col].quantile(0.25), expected[col].quantile(0.75)
+        expected = expected[expected[col].between(q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))]
+
+    assert df.index[iqr_outlier_mask(df, ["a", "b", "c"])].equals(expected.index)
+    fences = iqr_fences(df, ["a", "b", "c"])
+    assert all(expected[col].between(*fences[col]).all() for col in ["a", "b", "c"])
+    joint = iqr_outlier_mask(df, ["a", "b", "c"], sequential=False)
+    assert joint.sum() <= len(df) and not joint.all()
+
+
+def test_compute_category_stats_groups_by_several_keys() -> None:
+    df = pd.DataFrame(
+        {"type": ["a", "a", "b", "b"], "year": [2015, 2016, 2015, 2015], "AveragePrice": [1.0, 2.0, 3.0, 5.0]}
+    )
+    stats = compute_category_stats(df, ["type", "year"])
+
+    assert stats[["type", "year"]].values.tolist() == [["a", 2015], ["a", 2016], ["b", 2015]]
+    assert stats["AveragePrice_mean"].tolist() == [1.0, 2.0, 4.0]
+    assert "year_mean" not in stats.columns
+
+
+def test_stage_cache_skips_only_while_parameters_and_outputs_are_unchanged(tmp_path: Path) -> None:
+    manifest = tmp_path / "stages.json"
+    output = tmp_path / "stats.csv"
+    output.write_text("a\n1\n", encoding="utf-8")
+    params = {"source": "abc", "pipeline": "columnar"}
+
+    cache = StageCache(manifest)
+    assert not cache.fresh("stats", params, [output])
+    cache.record("stats", params, [output], {"rows_before": 1})
+
+    reopened = StageCache(manifest)
+    assert reopened.fresh("stats", params, [output])
+    assert reopened.result("stats") == {"rows_before": 1}
+    assert not reopened.fresh("stats", {**params, "source": "abd"}, [output])
+    assert not StageCache(manifest, force=True).fresh("stats", params, [output])
+
+    output.write_text("a\n2\n3\n", encoding="utf-8")
+    assert not reopened.fresh("stats", params, [output])
+    output.unlink()
+    assert not reopened.fresh("stats", params, [output])
+
+
+def test_appended_rows_are_read_past_the_previous_end_of_the_file(tmp_path: Path) -> None:
+    csv_path = write_csv(tmp_path)
+    size = csv_path.stat().st_size
+    digest = file_sha256(csv_path)
+    with csv_path.open("a", encoding="utf-8") as handle:
+        handle.write("4,2016-01-03,1.41,51039.60,conventional,2016,Albany\n")
+
+    assert file_sha256(csv_path, size) == digest
+    assert file_sha256(csv_path) != digest
+    appended = read_appended_rows(csv_path, size)
+    assert appended["Date"].tolist() == [pd.Timestamp("2016-01-03")]
+    assert appended["type"].astype(str).tolist() == ["conventional"]
+
+
+def test_append_run_folds_new_rows_and_rebuilds_when_earlier_bytes_change(tmp_path: Path) -> None:
+    csv_path, state_path = write_csv(tmp_path), tmp_path / "append_state.pkl"
+    _, report, mode = append_clean_stats(csv_path, state_path, ["type"])
+    assert (mode, report["rows_before"]) == ("full", 4)
+
+    with csv_path.open("a", encoding="utf-8") as handle:
+        handle.write("4,2016-01-03,1.41,51039.60,conventional,2016,Albany\n")
+    stats, report, mode = append_clean_stats(csv_path, state_path, ["type"])
+    assert (mode, report["rows_before"], report["duplicates_removed"]) == ("append", 5, 1)
+    conventional = stats[stats["type"] == "conventional"].iloc[0]
+    assert conventional["AveragePrice_count"] == 3
+    assert conventional["AveragePrice_mean"] == pytest.approx(np.mean([1.33, 1.35, 1.41]))
+
+    unchanged, unchanged_report, mode = append_clean_stats(csv_path, state_path, ["type"])
+    assert mode == "unchanged"
+    pd.testing.assert_frame_equal(unchanged, stats)
+    assert unchanged_report == report
+
+    csv_path.write_text(csv_path.read_text(encoding="utf-8").replace("1.33", "1.31"), encoding="utf-8")
+    stats, _, mode = append_clean_stats(csv_path, state_path, ["type"])
+    assert mode == "full"
+    assert stats.loc[stats["type"] == "conventional", "AveragePrice_min"].item() == 1.31
+
+
+def test_unchanged_run_returns_the_exact_stats_of_the_full_build(tmp_path: Path) -> None:
+    csv_path, state_path = write_csv(tmp_path), tmp_path / "append_state.pkl"
+    built, report, _ = append_clean_stats(csv_path, state_path, ["type"])
+
+    stats, unchanged_report, mode = append_clean_stats(csv_path, state_path, ["type"])
+
+    assert mode == "unchanged"
+    pd.testing.assert_frame_equal(stats, built)
+    assert unchanged_report == report
+
+
+@pytest.mark.parametrize("contents", [b"not a pickle", b"\x80\x05\x95"])
+def test_unreadable_append_state_triggers_a_full_build(tmp_path: Path, contents: bytes) -> None:
+    csv_path, state_path = write_csv(tmp_path), tmp_path / "append_state.pkl"
+    state_path.write_bytes(contents)
+
+    assert append_clean_stats(csv_path, state_path, ["type"])[2] == "full"
+    assert append_clean_stats(csv_path, state_path, ["type"])[2] == "unchanged"
+
+
+def test_append_state_from_another_layout_version_triggers_a_full_build(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    csv_path, state_path = write_csv(tmp_path), tmp_path / "append_state.pkl"
+    append_clean_stats(csv_path, state_path, ["type"])
+
+    monkeypatch.setattr(avocado_analysis, "APPEND_STATE_VERSION", avocado_analysis.APPEND_STATE_VERSION + 1)
+
+    assert append_clean_stats(csv_path, state_path, ["type"])[2] == "full"
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import avocado_analysis
+from avocado_cli import build_parser, main
+from import_benchmark import parse_importtime
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def modules_after_import(module: str) -> set[str]:
+    # A fresh interpreter: this one already has pandas loaded by the other test modules.
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT / "analysis", capture_output=True, text=True, check=True
+    )
+    return set(result.stdout.split())
+
+
+def test_cli_import_leaves_heavy_libraries_to_the_subcommands() -> None:
+    loaded = modules_after_import("avocado_cli")
+
+    assert not {"pandas", "numpy", "matplotlib"} & loaded
+    args = build_parser().parse_args(["chart", "--pipeline", "columnar", "--no-cache"])
+    assert (args.command, args.pipeline, args.no_cache, args.refresh) == ("chart", "columnar", True, False)
+
+
+def test_analysis_module_imports_matplotlib_only_for_the_chart() -> None:
+    assert "matplotlib" not in modules_after_import("avocado_analysis")
+
+
+def test_stats_subcommand_writes_the_category_stats(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    csv_path, stats_path = tmp_path / "avocado.csv", tmp_path / "stats.csv"
+    csv_path.write_text(
+        ",Date,AveragePrice,Total Volume,type,year,region\n"
+        "0,2015-12-27,1.33,64236.62,conventional,2015,Albany\n"
+        "1,2015-12-20,1.35,54876.98,conventional,2015,Albany\n"
+        "2,2015-12-27,1.83,989.55,organic,2015,Boston\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(avocado_analysis, "CSV_PATH", csv_path)
+    monkeypatch.setattr(avocado_analysis, "STATS_PATH", stats_path)
+
+    main(["stats", "--pipeline", "streaming", "--no-cache"])
+
+    stats = pd.read_csv(stats_path)
+    assert sorted(stats["type"]) == ["conventional", "organic"]
+    assert f"- Stats CSV: {stats_path}" in capsys.readouterr().out
+
+
+def test_parse_importtime_reads_depth_and_times() -> None:
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:       300 |        420 | avocado_cli\n"
+        "import time:        50 |         50 |     deep.module\n"
+    )
+    records = parse_importtime(stderr)
+
+    assert [(record.module, record.depth) for record in records] == [
+        ("_io", 1),
+        ("avocado_cli", 0),
+        ("deep.module", 2),
+    ]
+    assert records[1].cumulative_us == 420
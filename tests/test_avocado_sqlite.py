@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from avocado_analysis import clean_data, compute_category_stats
+from avocado_sqlite import SqlFilter, bulk_load_sqlite, sql_clean_category_stats
+
+
+def sample_frame(rows: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(17)
+    df = pd.DataFrame(
+        {
+            "Date": pd.Timestamp("2016-01-03") + pd.to_timedelta(rng.integers(0, 104, size=rows) * 7, unit="D"),
+            "AveragePrice": rng.normal(1.4, 0.3, size=rows).round(2),
+            "Total Volume": rng.lognormal(9, 1.2, size=rows).round(2),
+            "type": pd.Categorical(rng.choice(["conventional", "organic"], size=rows)),
+            "year": rng.choice([2016, 2017], size=rows),
+            "region": pd.Categorical(rng.choice(["Albany", "Boston", "Chicago"], size=rows)),
+        }
+    )
+    return pd.concat([df, df.iloc[:15]], ignore_index=True)
+
+
+def test_bulk_load_creates_typed_indexed_table(tmp_path: Path) -> None:
+    db_path = tmp_path / "avocado.sqlite"
+    df = sample_frame()
+
+    assert bulk_load_sqlite([df.iloc[:200], df.iloc[200:]], db_path, "avocado") == len(df)
+    with sqlite3.connect(db_path) as conn:
+        columns = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(avocado)")}
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(avocado)")}
+        (count,) = conn.execute("SELECT COUNT(*) FROM avocado").fetchone()
+        (date,) = conn.execute('SELECT MIN("Date") FROM avocado').fetchone()
+
+    assert columns == {
+        "Date": "TEXT",
+        "AveragePrice": "REAL",
+        "Total Volume": "REAL",
+        "type": "TEXT",
+        "year": "INTEGER",
+        "region": "TEXT",
+    }
+    assert indexes == {"avocado_type_idx", "avocado_region_idx", "avocado_date_idx"}
+    assert count == len(df)
+    assert date == df["Date"].min().strftime("%Y-%m-%d")
+
+
+def test_pushdown_matches_the_in_memory_path(tmp_path: Path) -> None:
+    db_path = tmp_path / "avocado.sqlite"
+    df = sample_frame()
+    bulk_load_sqlite([df], db_path, "avocado")
+
+    filters = SqlFilter(regions=["Albany", "Boston"], date_from="2016-06-01")
+    stats, report = sql_clean_category_stats(db_path, "avocado", ["region", "type"], filters)
+
+    subset = df[df["region"].isin(["Albany", "Boston"]) & (df["Date"] >= "2016-06-01")]
+    clean, expected_report = clean_data(subset)
+    expected = compute_category_stats(clean, ["region", "type"])
+
+    assert report == expected_report
+    assert report["duplicates_removed"] > 0
+    assert stats[["region", "type"]].values.tolist() == expected[["region", "type"]].astype(str).values.tolist()
+    np.testing.assert_allclose(
+        stats.drop(columns=["region", "type"]).to_numpy(float),
+        expected.drop(columns=["region", "type"]).to_numpy(float),
+        rtol=1e-9,
+    )
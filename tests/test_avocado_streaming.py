@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from avocado_analysis import clean_data, compute_category_stats
+from avocado_streaming import (
+    GroupAggregates,
+    HashDeduplicator,
+    IncrementalStats,
+    KLLSketch,
+    RunningStats,
+    parallel_group_stats,
+    stream_clean_stats,
+)
+
+
+def test_kll_sketch_stays_small_and_within_rank_error() -> None:
+    values = np.random.default_rng(7).lognormal(size=200_000)
+    left, right = KLLSketch(k=200, seed=1), KLLSketch(k=200, seed=2)
+    for offset in range(0, len(values), 5000):
+        (left if offset % 10000 else right).update(values[offset : offset + 5000])
+    left.merge(right)
+
+    ordered = np.sort(values)
+    assert left.count == len(values)
+    assert sum(len(items) for items in left.levels) < 3 * 200
+    for q in (0.25, 0.5, 0.75):
+        assert abs(np.searchsorted(ordered, left.quantile(q)) / len(values) - q) < 0.02
+
+
+def test_running_stats_merge_matches_numpy() -> None:
+    values = np.random.default_rng(3).normal(10, 4, size=1000)
+    merged = RunningStats()
+    for part in np.array_split(values, 7):
+        partial = RunningStats()
+        partial.merge_partial(len(part), part.mean(), ((part - part.mean()) ** 2).sum(), part.min(), part.max())
+        merged.merge(partial)
+
+    assert merged.count == 1000
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.std == pytest.approx(values.std(ddof=1))
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_hash_deduplicator_keeps_first_occurrence_across_chunks() -> None:
+    deduplicator = HashDeduplicator()
+    first = pd.DataFrame({"a": [1, 2, 1], "b": ["x", "y", "x"]})
+    second = pd.DataFrame({"a": [2, 3], "b": ["y", "z"]})
+
+    assert deduplicator.first_occurrences(first).tolist() == [True, True, False]
+    assert deduplicator.first_occurrences(second).tolist() == [False, True]
+
+
+def test_hash_deduplicator_matches_pandas_and_keeps_few_sorted_runs() -> None:
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame({"a": rng.integers(0, 20_000, 60_000), "b": rng.integers(0, 3, 60_000)})
+    deduplicator = HashDeduplicator()
+
+    chunks = [df.iloc[start : start + 1000] for start in range(0, len(df), 1000)]
+    keep = np.concatenate([deduplicator.first_occurrences(chunk) for chunk in chunks])
+
+    assert keep.tolist() == (~df.duplicated()).tolist()
+    assert len(deduplicator) == int(keep.sum())
+    assert len(deduplicator._runs) <= np.log2(len(deduplicator)) + 1
+    assert all(np.all(run[1:] > run[:-1]) for run in deduplicator._runs)
+
+
+def test_stream_clean_stats_matches_exact_path_when_the_same_rows_survive() -> None:
+    rng = np.random.default_rng(11)
+    df = pd.DataFrame(
+        {
+            "Date": pd.Timestamp("2017-01-01") + pd.to_timedelta(rng.integers(0, 52, size=600) * 7, unit="D"),
+            "AveragePrice": rng.normal(1.5, 0.2, size=600),
+            "Total Volume": rng.normal(1000, 50, size=600),
+            "type": pd.Categorical(rng.choice(["conventional", "organic"], size=600)),
+            "year": rng.choice([2016, 2017], size=600),
+        }
+    )
+    df.loc[[5, 50], "AveragePrice"] = 40.0
+    df = pd.concat([df, df.iloc[:20]], ignore_index=True)
+
+    exact_clean, exact_report = clean_data(df)
+    exact = compute_category_stats(exact_clean)
+    stats, report = stream_clean_stats(lambda: (df.iloc[i : i + 128] for i in range(0, len(df), 128)))
+
+    assert report == exact_report
+    for suffix in ("count", "mean", "min", "max", "std"):
+        cols = [col for col in exact.columns if col.endswith(f"_{suffix}")]
+        np.testing.assert_allclose(stats[cols].to_numpy(float), exact[cols].to_numpy(float), rtol=1e-9)
+    np.testing.assert_allclose(stats["AveragePrice_median"], exact["AveragePrice_median"], rtol=0.05)
+
+
+def test_parallel_group_stats_merges_partitions_exactly(tmp_path: Path) -> None:
+    rng = np.random.default_rng(13)
+    df = pd.DataFrame(
+        {
+            "region": rng.choice(["Albany", "Boston", "Chicago"], size=3000),
+            "type": rng.choice(["conventional", "organic"], size=3000),
+            "AveragePrice": rng.normal(1.5, 0.3, size=3000),
+            "Total Volume": rng.lognormal(8, 1, size=3000),
+        }
+    )
+    paths = []
+    for index in range(3):
+        paths.append(tmp_path / f"part-{index}.parquet")
+        df.iloc[index * 1000 : (index + 1) * 1000].to_parquet(paths[-1], index=False)
+    bounds = {"AveragePrice": (1.0, 2.0)}
+
+    stats = parallel_group_stats(paths, ["region", "type"], bounds=bounds, workers=2)
+    kept = df[df["AveragePrice"].between(1.0, 2.0)]
+    exact = compute_category_stats(kept, ["region", "type"])
+
+    assert stats[["region", "type"]].values.tolist() == exact[["region", "type"]].values.tolist()
+    for suffix in ("count", "mean", "min", "max", "std"):
+        cols = [col for col in exact.columns if col.endswith(f"_{suffix}")]
+        np.testing.assert_allclose(stats[cols].to_numpy(float), exact[cols].to_numpy(float), rtol=1e-9)
+    # About 500 values per group: the median sketches were compacted but stay close.
+    np.testing.assert_allclose(stats["AveragePrice_median"], exact["AveragePrice_median"], rtol=0.02)
+
+
+def test_incremental_stats_fold_appended_rows_like_one_pass_over_all_of_them() -> None:
+    rng = np.random.default_rng(17)
+    df = pd.DataFrame(
+        {
+            "Date": pd.Timestamp("2017-01-01") + pd.to_timedelta(np.repeat(np.arange(60), 10) * 7, unit="D"),
+            "AveragePrice": rng.normal(1.5, 0.2, size=600),
+            "type": rng.choice(["conventional", "organic"], size=600),
+        }
+    )
+    df.loc[[3, 400], "AveragePrice"] = 40.0
+    # A week re-exported with the new rows repeats rows that were already folded in.
+    appended = pd.concat([df.iloc[500:], df.iloc[490:495]], ignore_index=True)
+    bounds = {"AveragePrice": (1.0, 2.0)}
+
+    incremental = IncrementalStats(["type"], bounds, ["AveragePrice"])
+    incremental.add(df.iloc[:500])
+    assert incremental.watermark == df["Date"].iloc[499]
+    incremental.add(appended)
+
+    kept = df[df["AveragePrice"].between(1.0, 2.0)]
+    exact = compute_category_stats(kept, "type")
+    stats = incremental.stats()
+    assert incremental.watermark == df["Date"].max()
+    assert incremental.report["duplicates_removed"] == 5
+    assert incremental.report["rows_after_outlier_filter"] == len(kept)
+    for suffix in ("count", "mean", "min", "max", "std"):
+        cols = [col for col in exact.columns if col.endswith(f"_{suffix}")]
+        np.testing.assert_allclose(stats[cols].to_numpy(float), exact[cols].to_numpy(float), rtol=1e-9)
+
+
+def test_group_sketches_skip_rows_with_a_missing_key() -> None:
+    df = pd.DataFrame({"key": ["a", None, "a", "b", np.nan, "b"], "value": [1.0, 500.0, 3.0, 10.0, 700.0, 20.0]})
+    aggregates = GroupAggregates(["key"], ["value"])
+    aggregates.add(df)
+
+    stats = aggregates.stats().set_index("key")
+    assert stats.loc["a", "value_median"] == 2.0
+    assert stats.loc["b", "value_median"] == 15.0
+    assert stats["value_count"].tolist() == [2, 2]
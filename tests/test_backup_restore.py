@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+import backup_restore
+from backup_restore import describe_files, load_manifest, pending_collections, save_manifest, verify_run
+
+
+def write_run(tmp_path: Path) -> dict:
+    (tmp_path / "mongodb").mkdir()
+    parts = {}
+    for name in ("orders", "customers"):
+        path = tmp_path / "mongodb" / f"{name}.archive.zst"
+        path.write_bytes(name.encode() * 100)
+        parts[name] = {"raw_bytes": 4096, "seconds": 0.5, "files": describe_files(tmp_path, [path])}
+    manifest = {"level": 3, "mongodb": {"database": "training_db", "collections": parts}}
+    save_manifest(tmp_path, manifest)
+    return manifest
+
+
+def test_resume_redoes_only_missing_or_damaged_collections(tmp_path: Path) -> None:
+    write_run(tmp_path)
+    manifest = load_manifest(tmp_path)
+    assert manifest["mongodb"]["collections"]["orders"]["files"]["mongodb/orders.archive.zst"]["bytes"] == 600
+
+    collections = ["customers", "orders", "products"]
+    assert pending_collections(tmp_path, manifest, collections) == ["products"]
+
+    # Same size, different content: only the checksum catches it.
+    (tmp_path / "mongodb" / "orders.archive.zst").write_bytes(b"x" * 600)
+    assert pending_collections(tmp_path, manifest, collections) == ["orders", "products"]
+
+
+def test_verify_reports_checksum_mismatches_before_decompressing(tmp_path: Path) -> None:
+    write_run(tmp_path)
+    (tmp_path / "mongodb" / "customers.archive.zst").unlink()
+
+    with pytest.raises(SystemExit, match="mongodb.customers: mongodb/customers.archive.zst"):
+        verify_run(tmp_path)
+
+
+def test_backup_keeps_the_collections_that_finished_when_one_dump_fails(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    for name in ("customers", "orders", "products"):
+        client[backup_restore.MONGO_DB][name].insert_one({"name": name})
+
+    def dump(run_dir: Path, collection: str, level: int) -> dict:
+        if collection == "orders":
+            raise subprocess.CalledProcessError(1, ["mongodump"])
+        path = run_dir / "mongodb" / f"{collection}.archive.zst"
+        path.write_bytes(collection.encode())
+        return {"raw_bytes": 100, "seconds": 0.1, "files": describe_files(run_dir, [path])}
+
+    monkeypatch.setattr(backup_restore, "require_tools", lambda *tools: None)
+    monkeypatch.setattr(backup_restore, "MongoClient", lambda uri: client)
+    monkeypatch.setattr(backup_restore, "dump_collection", dump)
+
+    with pytest.raises(SystemExit, match="failed for orders"):
+        backup_restore.backup_mongodb(tmp_path, {}, jobs=2, level=3)
+    manifest = load_manifest(tmp_path)
+    assert sorted(manifest["mongodb"]["collections"]) == ["customers", "products"]
+    assert pending_collections(tmp_path, manifest, ["customers", "orders", "products"]) == ["orders"]
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+from cache_ttl import LocalLRU, RedisTTLCache, should_refresh_early
+
+
+def near_cached(client: Any, invalidation: str = "pubsub") -> RedisTTLCache:
+    # The listener connects through the client's pool, so it subscribes on the same (fake) server.
+    cache = RedisTTLCache(
+        "redis://stand-in",
+        near_cache_size=100,
+        near_cache_ttl=60,
+        invalidation=invalidation,
+        client=client,
+        listener_pool=client.connection_pool,
+    )
+    assert cache._listening.is_set()
+    return cache
+
+
+def wait_until(condition: Any, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_xfetch_refreshes_only_near_expiry() -> None:
+    # rand=1 gives no head start, so a live key is never refreshed early.
+    assert not should_refresh_early(0.5, 0.001, 1.0, 1.0)
+    # With rand=1/e the head start equals delta * beta.
+    assert should_refresh_early(0.5, 0.5, 1.0, 1 / math.e)
+    assert not should_refresh_early(0.5, 0.6, 1.0, 1 / math.e)
+    assert should_refresh_early(0.5, 0.6, 2.0, 1 / math.e)
+
+
+def test_local_lru_bounds_size_and_skips_values_invalidated_mid_read() -> None:
+    local = LocalLRU(max_entries=2, ttl_seconds=60)
+    for key in ("a", "b", "c"):
+        local.store(key, key.upper(), local.begin(key))
+    assert local.get("a") is None
+    assert local.get("c") == "C"
+
+    token = local.begin("b")
+    local.evict(["b"])
+    local.store("b", "stale", token)
+    assert local.get("b") is None
+
+    local.store("d", "D", local.begin("d"), ttl_seconds=0)
+    assert local.get("d") is None
+
+    token = local.begin("e")
+    local.clear()
+    local.store("e", "stale", token)
+    assert local.get("e") is None
+
+
+def test_reads_that_store_nothing_locally_leave_no_pending_token() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    cache = near_cached(client)
+    # Written around the cache so no invalidation of our own is in flight while the local tier fills.
+    client.set("ttl", "T", ex=60)
+    client.set("persistent", "P")
+
+    assert cache.get_many(["missing", "persistent", "ttl"]) == {"missing": None, "persistent": "P", "ttl": "T"}
+    assert cache.get_or_compute("persistent", lambda: "recomputed", 60) == "P"
+    assert cache.get_or_compute("computed", lambda: "C", 60) == "C"
+
+    assert cache.local._pending == {}
+    assert cache.local.get("ttl") == "T"
+    assert cache.local.get("persistent") is None
+
+
+def test_invalidation_during_a_read_keeps_the_value_out_of_the_local_tier(monkeypatch: pytest.MonkeyPatch) -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = near_cached(fakeredis.FakeRedis(decode_responses=True))
+    cache.set("key", "old", 60)
+    read = cache._read_with_metadata
+
+    def read_then_invalidate(key: str) -> tuple[str | None, float | None, int]:
+        result = read(key)
+        # Another client's write lands after our read; the listener evicts the key.
+        cache.local.evict([key])
+        return result
+
+    monkeypatch.setattr(cache, "_read_with_metadata", read_then_invalidate)
+    assert cache.get_or_compute("key", lambda: "new", 60) == "old"
+    assert cache.local.get("key") is None
+    assert cache.local._pending == {}
+
+
+def test_set_many_writes_with_ttl_and_get_many_reads_in_one_batch() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+    cache = RedisTTLCache("redis://stand-in", client=client)
+
+    cache.set_many({"a": "1", "b": "2"}, 30)
+    assert cache.get_many(["a", "missing", "b"]) == {"a": "1", "missing": None, "b": "2"}
+    assert cache.get_many([]) == {}
+    assert 0 < client.ttl("a") <= 30
+    assert cache.stats["redis_hits"] == 2 and cache.stats["redis_misses"] == 1
+
+
+def test_concurrent_misses_compute_the_value_once() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    cache = RedisTTLCache("redis://stand-in", client=fakeredis.FakeRedis(decode_responses=True))
+    calls = 0
+    calls_lock = threading.Lock()
+
+    def compute() -> str:
+        nonlocal calls
+        with calls_lock:
+            calls += 1
+        time.sleep(0.2)
+        return "value"
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: cache.get_or_compute("key", compute, 30), range(8)))
+
+    assert results == ["value"] * 8
+    assert calls == 1
+    # The lock is released once the value is stored.
+    assert cache.client.get("key:xfetch:lock") is None
+
+
+@pytest.mark.parametrize("invalidation", ["pubsub", "tracking"])
+def test_write_from_another_client_evicts_the_local_copy(invalidation: str) -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    reader = near_cached(fakeredis.FakeRedis(server=server, decode_responses=True), invalidation)
+    writer = RedisTTLCache("redis://stand-in", invalidation="pubsub", client=fakeredis.FakeRedis(server=server))
+    try:
+        # fakeredis has no CLIENT TRACKING, so the tracking mode falls back to the invalidation channel.
+        assert reader.invalidation == "pubsub"
+        writer.set("key", "old", 60)
+        assert reader.get("key") == "old"
+        assert reader.local.get("key") == "old"
+
+        writer.set("key", "new", 60)
+
+        assert wait_until(lambda: reader.local.get("key") is None)
+        assert reader.get("key") == "new"
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+import load_harness
+from load_harness import Recorder, format_report, load_scenario, merge_results, run_load
+
+
+def test_scenario_file_and_overrides_fill_in_the_defaults(tmp_path: Path) -> None:
+    path = tmp_path / "scenario.json"
+    path.write_text(json.dumps({"arrival": {"model": "open"}, "operations": {"cache.get": 3, "cache.set": 1}}))
+
+    scenario = load_scenario(path, {"processes": 4, "rate_per_second": 50.0, "threads": None})
+    assert scenario["arrival"] == {"model": "open", "rate_per_second": 50.0, "think_time_ms": 0}
+    assert scenario["processes"] == 4
+    assert scenario["threads"] == 8
+    assert scenario["operations"] == {"cache.get": 3, "cache.set": 1}
+
+    path.write_text(json.dumps({"operations": {"cache.delete": 1}}))
+    with pytest.raises(ValueError, match="unknown operations"):
+        load_scenario(path)
+    with pytest.raises(ValueError, match="arrival model"):
+        load_scenario(None, {"model": "burst"})
+
+
+def test_process_histograms_merge_into_operation_and_total_percentiles() -> None:
+    first, second = Recorder(["cache.get", "mongo.gmv_by_day"]), Recorder(["cache.get"])
+    for latency_us in range(1, 1001):
+        first.record("cache.get", latency_us)
+    second.record("cache.get", 50_000)
+    second.record("cache.get", 0, RuntimeError("connection reset"))
+    first.record("mongo.gmv_by_day", 200_000)
+
+    report = merge_results([first.export(), second.export()], seconds=2.0)
+    cache_get = report["operations"]["cache.get"]
+    assert cache_get["count"] == 1001
+    assert cache_get["errors"] == 1
+    assert cache_get["first_error"] == "RuntimeError('connection reset')"
+    assert cache_get["throughput_per_second"] == 500.5
+    assert cache_get["p50_ms"] == pytest.approx(0.5, rel=0.01)
+    assert cache_get["max_ms"] == pytest.approx(50.0, rel=0.001)
+    assert report["total"]["count"] == 1002
+    assert report["total"]["max_ms"] == pytest.approx(200.0, rel=0.001)
+
+
+def test_stand_in_run_covers_every_store(tmp_path: Path) -> None:
+    pytest.importorskip("mongomock")
+    pytest.importorskip("fakeredis")
+
+    operations = {"orm.get_user_with_posts": 1, "orm.create_post": 1, "mongo.get_by_order_id": 1, "cache.get": 1}
+    overrides = {"duration_seconds": 1, "warmup_seconds": 0, "processes": 1, "threads": 2, "orm_users": 5}
+    scenario = load_scenario(None, {**overrides, "cache_keys": 100, "operations": operations})
+    urls = {"database": f"sqlite:///{tmp_path / 'load.sqlite'}", "mongo": "", "redis": "redis://stand-in"}
+
+    report = run_load(scenario, urls, stand_ins=True)
+    assert set(report["operations"]) == set(operations)
+    assert all(summary["count"] > 0 and summary["errors"] == 0 for summary in report["operations"].values())
+    assert "total" in format_report(report)
+
+
+class FailingStack:
+    def __init__(self, *args: Any) -> None:
+        raise ConnectionError("mongo is down")
+
+
+class IdleStack:
+    def __init__(self, *args: Any) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def crash(*args: Any) -> None:
+    os._exit(3)
+
+
+def short_scenario() -> dict[str, Any]:
+    return load_scenario(None, {"duration_seconds": 0.2, "warmup_seconds": 0, "processes": 2, "threads": 1})
+
+
+def test_a_process_failing_to_connect_fails_the_run_with_its_traceback(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(load_harness, "Stack", FailingStack)
+    monkeypatch.setattr(load_harness, "prepare_fixtures", lambda *args: {})
+
+    with pytest.raises(RuntimeError, match="(?s)load process . failed.*mongo is down"):
+        run_load(short_scenario(), {})
+
+
+def test_a_process_dying_without_a_report_fails_the_run(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(load_harness, "Stack", IdleStack)
+    monkeypatch.setattr(load_harness, "prepare_fixtures", lambda *args: {})
+    monkeypatch.setattr(load_harness, "run_closed", crash)
+
+    with pytest.raises(RuntimeError, match="exit code 3"):
+        run_load(short_scenario(), {})
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import pytest
+
+from mongo_index_advisor import (
+    find_redundant_indexes,
+    index_supports_shape,
+    keys_per_document,
+    shape_from_filter,
+    suggest_esr_index,
+    writes_touching_index,
+)
+from mongo_order_schema import FIELD_PATHS, SCHEMA_V1, SCHEMA_V2
+from mongo_orders_repository import order_indexes, query_shapes, write_shapes
+
+
+def test_shape_from_filter_orders_fields_by_esr() -> None:
+    shape = shape_from_filter(
+        "customer_orders",
+        {
+            "order.created_at": {"$gte": 1, "$lte": 2},
+            "customer.id": "CUS-00001",
+            "order.status": {"$in": ["paid"]},
+        },
+        {"order.created_at": -1},
+    )
+
+    assert shape["equality"] == ["customer.id"]
+    assert shape["range"] == ["order.created_at", "order.status"]
+    assert suggest_esr_index(shape) == [
+        ("customer.id", 1),
+        ("order.created_at", -1),
+        ("order.status", 1),
+    ]
+
+
+def test_find_redundant_indexes_reports_prefix_overlap() -> None:
+    indexes = {
+        "_id_": {"key": [("_id", 1)]},
+        "ux_order_id": {"key": [("order_id", 1)], "unique": True},
+        "idx_customer": {"key": [("customer.id", 1)]},
+        "idx_customer_created": {"key": [("customer.id", 1), ("order.created_at", -1)]},
+        "idx_created_asc": {"key": [("order.created_at", 1)]},
+        "idx_created_status": {"key": [("order.created_at", -1), ("order.status", 1)]},
+    }
+
+    assert find_redundant_indexes(indexes) == [{"index": "idx_customer", "covered_by": "idx_customer_created"}]
+
+
+def test_keys_per_document_counts_multikey_entries() -> None:
+    document = {"order": {"items": [{"sku": "A"}, {"sku": "B"}, {"sku": "C"}], "status": "paid"}}
+
+    assert keys_per_document(document, ["order.items.sku"]) == 3
+    assert keys_per_document(document, ["order.status"]) == 1
+    assert keys_per_document(document, ["missing.field"]) == 1
+
+
+def test_writes_touching_index() -> None:
+    assert writes_touching_index(["order.created_at", "order.status"]) == ["insert", "set_order_status"]
+    assert writes_touching_index(["order.items.sku"]) == ["insert"]
+
+
+@pytest.mark.parametrize("schema_version", [SCHEMA_V1, SCHEMA_V2])
+def test_repository_indexes_support_every_repository_query(schema_version: int) -> None:
+    fields = FIELD_PATHS[schema_version]
+    index_keys = [list(model.document["key"].items()) for model in order_indexes(fields)]
+
+    for shape in query_shapes(fields):
+        assert any(index_supports_shape(keys, shape) for keys in index_keys), shape["name"]
+    assert writes_touching_index([fields["notes"]], write_shapes(fields)) == ["insert", "add_order_note"]
+
+
+def test_index_supports_shape_requires_the_esr_prefix() -> None:
+    shape = {
+        "name": "find_customer_orders",
+        "equality": ["customer.id"],
+        "sort": [("order.created_at", -1)],
+        "range": ["order.created_at", "order.status"],
+    }
+
+    assert index_supports_shape([("customer.id", 1), ("order.created_at", -1)], shape)
+    assert index_supports_shape([("customer.id", 1), ("order.created_at", 1), ("order.status", 1)], shape)
+    # The range field before the sort key leaves the sort to memory.
+    assert not index_supports_shape([("customer.id", 1), ("order.status", 1), ("order.created_at", -1)], shape)
+    # Sort key first: the equality match is no longer a bounded prefix.
+    assert not index_supports_shape([("order.created_at", -1), ("customer.id", 1)], shape)
+    assert not index_supports_shape([("customer.id", 1)], shape)
+
+    range_only = {"name": "gmv_by_day", "equality": [], "sort": [], "range": ["order.created_at", "order.status"]}
+    assert index_supports_shape([("order.created_at", -1), ("order.status", 1)], range_only)
+    assert not index_supports_shape([("customer.id", 1), ("order.created_at", -1)], range_only)
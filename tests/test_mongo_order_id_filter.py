@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from mongo_order_id_filter import (
+    REBUILD_TTL_SECONDS,
+    RedisBloomFilter,
+    bloom_offsets,
+    bloom_parameters,
+    expected_false_positive_rate,
+    filter_key,
+)
+
+
+def test_bloom_parameters_meet_target_rate_at_capacity() -> None:
+    bits, hashes = bloom_parameters(1_000_000, 0.001)
+
+    assert (bits, hashes) == (14377588, 10)
+    assert expected_false_positive_rate(bits, hashes, 1_000_000) == pytest.approx(0.001, rel=1e-3)
+    assert math.isclose(bits / 8 / 1024 / 1024, 1.71, abs_tol=0.01)
+
+
+def test_bloom_offsets_are_stable_and_in_range() -> None:
+    offsets = bloom_offsets("ORD-000001", 1000, 7)
+
+    assert offsets == bloom_offsets("ORD-000001", 1000, 7)
+    assert len(offsets) == 7
+    assert all(0 <= offset < 1000 for offset in offsets)
+    assert offsets != bloom_offsets("ORD-000002", 1000, 7)
+
+
+def test_rebuild_keeps_every_id_including_those_added_while_it_runs() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    bloom = RedisBloomFilter(fakeredis.FakeRedis(), key=filter_key("db.orders"), capacity=5000, error_rate=0.01)
+    old_ids = [f"ORD-{index:06d}" for index in range(1000)]
+    # Before the first build the filter is inactive and answers "maybe" for everything.
+    assert bloom.add_many(old_ids) == 0
+    assert all(bloom.might_contain_many([f"ORD-{index:06d}" for index in range(20000, 20100)]))
+    bloom.rebuild(old_ids, batch_size=100)
+    assert all(bloom.might_contain_many(old_ids))
+
+    new_ids = [f"ORD-{index:06d}" for index in range(500, 3000)]
+    live_ids = [f"ORD-{index:06d}" for index in range(9000, 9100)]
+    assert bloom.might_contain_many(new_ids[500:]).count(True) < 50
+
+    def rebuild_source():
+        for index, order_id in enumerate(new_ids):
+            if index == 1000:
+                # An order placed mid-rebuild goes through add_many to the live and the staging filter.
+                bloom.add_many(live_ids)
+            yield order_id
+
+    assert bloom.rebuild(rebuild_source(), batch_size=300) == len(new_ids)
+    assert all(bloom.might_contain_many(new_ids + live_ids))
+    # Ids only in the old build are gone once the new one is published.
+    assert bloom.might_contain_many(old_ids[:500]).count(True) < 50
+    unseen = bloom.might_contain_many([f"ORD-{index:06d}" for index in range(20000, 21000)])
+    assert unseen.count(True) < 50
+    assert not bloom.redis_client.exists(f"{bloom.key}:rebuild")
+
+
+def test_published_filter_has_no_ttl_but_an_abandoned_rebuild_expires() -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis()
+    bloom = RedisBloomFilter(client, key=filter_key("db.orders"), capacity=1000, error_rate=0.01)
+    bloom.rebuild(f"ORD-{index:06d}" for index in range(100))
+
+    assert client.ttl(bloom.key) == -1
+    assert client.ttl(f"{bloom.key}:meta") == -1
+
+    def abandoned():
+        yield "ORD-000001"
+        raise RuntimeError("scan failed")
+
+    with pytest.raises(RuntimeError):
+        bloom.rebuild(abandoned(), batch_size=1)
+    assert 0 < client.ttl(f"{bloom.key}:rebuild") <= REBUILD_TTL_SECONDS
+    assert 0 < client.ttl(f"{bloom.key}:rebuild:meta") <= REBUILD_TTL_SECONDS
+    assert client.ttl(bloom.key) == -1
+
+
+def test_filter_keys_are_per_collection() -> None:
+    assert filter_key("training_db.customer_orders") != filter_key("archive_db.customer_orders")
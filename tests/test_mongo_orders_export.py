@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import random
+from datetime import UTC, date, datetime, timedelta
+from pathlib import Path
+
+import pyarrow.parquet as pq
+import pytest
+
+from mongo_orders_export import ITEMS_SCHEMA, ORDERS_SCHEMA, DayPartitionedWriter, export_orders_parquet, flatten_order
+from seed_mongo import build_order_document
+
+
+def order_rows(count: int, day: date) -> list[dict]:
+    created_at = datetime.combine(day, datetime.min.time(), tzinfo=UTC)
+    return [
+        {name: None for name in ORDERS_SCHEMA.names} | {"order_id": f"ORD-{index}", "created_at": created_at}
+        for index in range(count)
+    ]
+
+
+def test_flatten_order_builds_one_order_row_and_a_row_per_item() -> None:
+    random.seed(21)
+    document = build_order_document(1)
+    # PyMongo hands back naive UTC datetimes.
+    document["order"]["created_at"] = document["order"]["created_at"].replace(tzinfo=None)
+
+    order_row, item_rows = flatten_order(document)
+
+    assert set(order_row) == set(ORDERS_SCHEMA.names)
+    assert order_row["created_at"].tzinfo is UTC
+    assert order_row["customer_id"] == document["customer"]["id"]
+    assert order_row["amount"] == document["order"]["total"]["amount"]
+    assert order_row["item_count"] == len(document["order"]["items"]) == len(item_rows)
+    assert [row["line_no"] for row in item_rows] == list(range(1, len(item_rows) + 1))
+    assert all(set(row) == set(ITEMS_SCHEMA.names) for row in item_rows)
+    assert item_rows[0]["sku"] == document["order"]["items"][0]["sku"]
+
+
+def test_writer_never_overwrites_earlier_files(tmp_path: Path) -> None:
+    first_day, second_day = date(2026, 1, 1), date(2026, 1, 2)
+    for run_id in ("run-a", "run-b"):
+        writer = DayPartitionedWriter(tmp_path, "orders", ORDERS_SCHEMA, 2, "zstd", run_id)
+        writer.add(first_day, order_rows(3, first_day))
+        writer.add(second_day, order_rows(1, second_day))
+        # Input that comes back to a day writes another file instead of truncating the first.
+        writer.add(first_day, order_rows(1, first_day))
+        writer.close()
+        assert writer.partitions == ["2026-01-01", "2026-01-02"]
+        assert writer.rows_written == 5
+
+    day_dir = tmp_path / "orders" / "day=2026-01-01"
+    assert sorted(path.name for path in day_dir.iterdir()) == [
+        "part-run-a-00000.parquet",
+        "part-run-a-00002.parquet",
+        "part-run-b-00000.parquet",
+        "part-run-b-00002.parquet",
+    ]
+    assert sum(pq.read_table(path).num_rows for path in day_dir.iterdir()) == 8
+
+
+def test_aborted_writer_leaves_only_complete_files(tmp_path: Path) -> None:
+    writer = DayPartitionedWriter(tmp_path, "orders", ORDERS_SCHEMA, 100, "zstd", "run")
+    writer.add(date(2026, 1, 1), order_rows(2, date(2026, 1, 1)))
+    writer.add(date(2026, 1, 2), order_rows(2, date(2026, 1, 2)))
+    writer.abort()
+
+    files = sorted(path.relative_to(tmp_path).as_posix() for path in tmp_path.rglob("*") if path.is_file())
+    assert files == ["orders/day=2026-01-01/part-run-00000.parquet"]
+
+
+def test_export_orders_parquet_round_trip(tmp_path: Path) -> None:
+    mongomock = pytest.importorskip("mongomock")
+    from mongo_orders_repository import OrdersRepository
+
+    random.seed(4)
+    documents = [build_order_document(index + 1) for index in range(60)]
+    repo = OrdersRepository(mongomock.MongoClient().db, "orders")
+    repo.replace_all(documents)
+    end = datetime.now(UTC)
+
+    result = export_orders_parquet(repo, tmp_path, end - timedelta(days=400), end, batch_size=16)
+
+    orders = pq.read_table(tmp_path / "orders")
+    items = pq.read_table(tmp_path / "order_items")
+    assert result["orders"] == orders.num_rows == 60
+    assert result["order_items"] == items.num_rows == sum(len(doc["order"]["items"]) for doc in documents)
+    assert sorted(orders.column("order_id").to_pylist()) == sorted(doc["order_id"] for doc in documents)
+    assert not list(tmp_path.rglob(".*"))
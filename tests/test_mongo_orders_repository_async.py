@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+
+from mongo_order_schema import SCHEMA_V1, SCHEMA_V2
+from mongo_orders_repository import OrdersRepository
+from mongo_orders_repository_async import AsyncOrdersRepository
+from seed_mongo import build_order_document
+
+mongomock = pytest.importorskip("mongomock")
+
+
+class AsyncCursor:
+    def __init__(self, cursor: Any) -> None:
+        self._cursor = cursor
+
+    def hint(self, index: str) -> AsyncCursor:
+        return AsyncCursor(self._cursor.hint(index))
+
+    def sort(self, *args: Any) -> AsyncCursor:
+        return AsyncCursor(self._cursor.sort(*args))
+
+    def limit(self, limit: int) -> AsyncCursor:
+        return AsyncCursor(self._cursor.limit(limit))
+
+    async def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        return list(self._cursor)
+
+
+class AsyncFacade:
+    """The call shape of the async driver (awaited calls, awaited aggregate, sync find) over mongomock."""
+
+    def __init__(self, target: Any) -> None:
+        self._target = target
+
+    def __getitem__(self, name: str) -> AsyncFacade:
+        return AsyncFacade(self._target[name])
+
+    def find(self, *args: Any, **kwargs: Any) -> AsyncCursor:
+        return AsyncCursor(self._target.find(*args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._target, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            result = method(*args, **kwargs)
+            return AsyncCursor(result) if name == "aggregate" else result
+
+        return call
+
+
+def seeded_orders(count: int = 200) -> list[dict[str, Any]]:
+    random.seed(7)
+    return [build_order_document(index + 1) for index in range(count)]
+
+
+@pytest.mark.parametrize("schema_version", [SCHEMA_V1, SCHEMA_V2])
+def test_async_repository_matches_the_sync_repository(schema_version: int) -> None:
+    db = mongomock.MongoClient().db
+    sync_repo = OrdersRepository(db, "orders", schema_version=schema_version)
+    async_repo = AsyncOrdersRepository(AsyncFacade(db), "orders", schema_version=schema_version)
+    orders = seeded_orders()
+    end = datetime.now(UTC)
+    start = end - timedelta(days=120)
+    order_id, customer_id = orders[0]["order_id"], orders[0]["customer"]["id"]
+
+    async def scenario() -> dict[str, Any]:
+        assert await async_repo.replace_all(orders) == len(orders)
+        found = await async_repo.get_by_order_id(order_id)
+        customer = await async_repo.find_customer_orders(customer_id, end - timedelta(days=400), end)
+        gmv, top = await asyncio.gather(async_repo.gmv_by_day(start, end), async_repo.top_skus_by_revenue(start, end))
+        changed = await async_repo.set_order_status(order_id, "refunded", end)
+        noted = await async_repo.add_order_note(order_id, {"text": "called the customer"})
+        return {"found": found, "customer": customer, "gmv": gmv, "top": top, "changed": changed, "noted": noted}
+
+    sync_repo.replace_all(orders)
+    expected_customer = sync_repo.find_customer_orders(customer_id, end - timedelta(days=400), end)
+    expected_gmv, expected_top = sync_repo.gmv_by_day(start, end), sync_repo.top_skus_by_revenue(start, end)
+    result = asyncio.run(scenario())
+
+    assert result["found"]["order_id"] == order_id
+    assert result["customer"] == expected_customer
+    assert result["gmv"] and result["gmv"] == expected_gmv
+    assert result["top"] and result["top"] == expected_top
+    assert result["changed"] and result["noted"]
+    assert sync_repo.get_by_order_id(order_id)["order"]["status"] == "refunded"
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from mongo_orders_repository import OrdersRepository
+
+
+def test_analyze_plan_find_with_index_and_in_memory_sort() -> None:
+    explain_doc = {
+        "queryPlanner": {
+            "winningPlan": {
+                "stage": "SORT",
+                "inputStage": {
+                    "stage": "FETCH",
+                    "inputStage": {"stage": "IXSCAN", "indexName": "idx_customer_created"},
+                },
+            },
+            "rejectedPlans": [{"stage": "COLLSCAN"}],
+        },
+        "executionStats": {
+            "nReturned": 4,
+            "executionTimeMillis": 3,
+            "totalKeysExamined": 200,
+            "totalDocsExamined": 200,
+        },
+    }
+
+    report = OrdersRepository.analyze_plan(explain_doc)
+
+    assert report["used_indexes"] == ["idx_customer_created"]
+    assert report["collscan"] is False
+    assert report["keys_examined"] == 200
+    assert report["docs_examined"] == 200
+    assert report["n_returned"] == 4
+    assert report["execution_time_ms"] == 3
+    assert report["blocking_stages"] == ["SORT"]
+    assert report["selectivity"] == 0.02
+    assert report["docs_examined_per_matched"] == 50.0
+
+
+def test_analyze_plan_aggregation_collscan() -> None:
+    explain_doc = {
+        "stages": [
+            {
+                "$cursor": {
+                    "queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}},
+                    "executionStats": {
+                        "nReturned": 120,
+                        "executionTimeMillis": 7,
+                        "totalKeysExamined": 0,
+                        "totalDocsExamined": 2000,
+                    },
+                },
+                "nReturned": 120,
+            },
+            {"$group": {"_id": "$order.channel"}, "nReturned": 3},
+            {"$sort": {"sortKey": {"orders": -1}}, "nReturned": 3},
+        ]
+    }
+
+    report = OrdersRepository.analyze_plan(explain_doc)
+
+    assert report["used_indexes"] == []
+    assert report["collscan"] is True
+    assert report["n_matched"] == 120
+    assert report["n_returned"] == 3
+    assert report["blocking_stages"] == ["$group", "$sort"]
+    assert report["selectivity"] == 0.06
+
+
+def test_analyze_plan_without_execution_stats() -> None:
+    report = OrdersRepository.analyze_plan({"queryPlanner": {"winningPlan": {"stage": "EOF"}}})
+
+    assert report["keys_examined"] == 0
+    assert report["selectivity"] is None
+    assert report["docs_examined_per_matched"] is None
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import random
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+
+from mongo_orders_repository import OrdersRepository
+from mongo_result_cache import AggregationResultCache, closed_date_bucket
+from seed_mongo import build_order_document
+
+
+class DictRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, Any] = {}
+
+    def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    def setex(self, key: str, ttl_seconds: int, value: str) -> None:
+        self.data[key] = value
+
+    def sadd(self, key: str, member: str) -> None:
+        self.data.setdefault(key, set()).add(member)
+
+    def expire(self, key: str, ttl_seconds: int) -> None:
+        pass
+
+    def smembers(self, key: str) -> set[str]:
+        return set(self.data.get(key, set()))
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def test_closed_date_bucket_only_for_past_days() -> None:
+    now = datetime(2026, 3, 10, 15, 0, tzinfo=UTC)
+
+    closed = closed_date_bucket(now - timedelta(days=30), datetime(2026, 3, 9, 23, 59, tzinfo=UTC), now=now)
+    still_open = closed_date_bucket(now - timedelta(days=30), now, now=now)
+
+    assert closed == "2026-02-08..2026-03-09"
+    assert still_open is None
+
+
+def test_cache_key_keeps_the_pipeline_key_order() -> None:
+    cache = AggregationResultCache()
+    scope = {"namespace": "training_db.customer_orders", "hint": "idx_created_status"}
+
+    first = cache.make_key([{"$sort": {"day": 1, "gmv": -1}}], "2026-01-01..2026-01-31", **scope)
+    again = cache.make_key([{"$sort": {"day": 1, "gmv": -1}}], "2026-01-01..2026-01-31", **scope)
+    # A different sort order gives different rows, so it must not share the cached result.
+    reordered = cache.make_key([{"$sort": {"gmv": -1, "day": 1}}], "2026-01-01..2026-01-31", **scope)
+
+    assert first == again
+    assert first != reordered
+    assert first != cache.make_key([{"$sort": {"day": 1, "gmv": -1}}], "2026-01-01..2026-02-01", **scope)
+
+
+def test_cache_key_separates_collections_and_hints() -> None:
+    cache = AggregationResultCache()
+    pipeline = [{"$match": {"a": 1}}]
+    bucket = "2026-01-01..2026-01-31"
+
+    keys = {
+        cache.make_key(pipeline, bucket, namespace="training_db.customer_orders", hint="idx_created_status"),
+        cache.make_key(pipeline, bucket, namespace="training_db.customer_orders_v2", hint="idx_created_status"),
+        cache.make_key(pipeline, bucket, namespace="archive_db.customer_orders", hint="idx_created_status"),
+        cache.make_key(pipeline, bucket, namespace="training_db.customer_orders", hint="idx_country_channel_created"),
+    }
+
+    assert len(keys) == 4
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache = AggregationResultCache(max_entries=2)
+    cache.set("k1", [{"v": 1}])
+    cache.set("k2", [{"v": 2}])
+    cache.get("k1")
+    cache.set("k3", [{"v": 3}])
+
+    assert cache.get("k2") is None
+    assert cache.get("k1") == [{"v": 1}]
+    assert cache.stats == {"local_hits": 2, "redis_hits": 0, "misses": 1}
+
+
+def test_cache_falls_back_to_redis_tier() -> None:
+    redis_client = DictRedis()
+    writer = AggregationResultCache(redis_client=redis_client)
+    writer.set("k", [{"day": "2026-01-01", "gmv": 10.5}])
+
+    reader = AggregationResultCache(redis_client=redis_client)
+
+    assert reader.get("k") == [{"day": "2026-01-01", "gmv": 10.5}]
+    assert reader.get("k") == [{"day": "2026-01-01", "gmv": 10.5}]
+    assert reader.stats == {"local_hits": 1, "redis_hits": 1, "misses": 0}
+
+
+def test_invalidate_drops_one_collection_from_both_tiers() -> None:
+    redis_client = DictRedis()
+    cache = AggregationResultCache(redis_client=redis_client)
+    pipeline = [{"$match": {"a": 1}}]
+    bucket = "2026-01-01..2026-01-31"
+    orders = cache.make_key(pipeline, bucket, namespace="training_db.customer_orders", hint=None)
+    archive = cache.make_key(pipeline, bucket, namespace="archive_db.customer_orders", hint=None)
+    cache.set(orders, [{"v": 1}])
+    cache.set(archive, [{"v": 2}])
+
+    cache.invalidate("training_db.customer_orders")
+
+    assert cache.get(orders) is None
+    assert orders not in redis_client.data
+    assert cache.get(archive) == [{"v": 2}]
+    assert AggregationResultCache(redis_client=redis_client).get(archive) == [{"v": 2}]
+
+
+def test_local_entries_expire_after_local_ttl() -> None:
+    cache = AggregationResultCache(local_ttl_seconds=0)
+    cache.set("k", [{"v": 1}])
+
+    assert cache.get("k") is None
+
+
+def test_late_status_change_of_a_closed_day_order_invalidates_cached_results() -> None:
+    mongomock = pytest.importorskip("mongomock")
+    random.seed(21)
+    now = datetime.now(UTC)
+    documents = [build_order_document(index + 1) for index in range(40)]
+    today_order = build_order_document(41)
+    today_order["order"]["created_at"] = now
+    db = mongomock.MongoClient().db
+    OrdersRepository(db, "orders", schema_version=1).replace_all([*documents, today_order])
+    cache = AggregationResultCache()
+    repo = OrdersRepository(db, "orders", result_cache=cache, schema_version=1)
+    end = datetime.combine(now.date(), datetime.min.time(), tzinfo=UTC) - timedelta(milliseconds=1)
+    start = end - timedelta(days=400)
+    old_order = next(doc for doc in documents if doc["order"]["status"] in ("paid", "shipped", "delivered"))
+
+    before = repo.gmv_by_day(start, end)
+    assert repo.set_order_status(today_order["order_id"], "refunded", now)
+    assert repo.gmv_by_day(start, end) == before
+    assert cache.stats["local_hits"] == 1
+
+    assert repo.set_order_status(old_order["order_id"], "refunded", now)
+    after = repo.gmv_by_day(start, end)
+
+    assert cache.stats["misses"] == 2
+    assert after != before
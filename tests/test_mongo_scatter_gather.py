@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import random
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+
+from mongo_orders_repository import (
+    OrdersRepository,
+    merge_country_channel,
+    merge_gmv_by_day,
+    merge_top_skus,
+    split_window,
+)
+from seed_mongo import build_order_document
+
+AGGREGATIONS = [
+    ("gmv_by_day", {"statuses": ["paid", "shipped", "delivered"]}),
+    ("gmv_by_day", {}),
+    ("top_skus_by_revenue", {"limit": 5}),
+    ("country_channel_efficiency", {"country": "US"}),
+]
+
+
+def test_split_window_day_aligned_and_contiguous() -> None:
+    start = datetime(2026, 1, 1, 13, 30, tzinfo=UTC)
+    end = start + timedelta(days=30)
+
+    segments = split_window(start, end, 4)
+
+    assert len(segments) == 4
+    assert segments[0][0] == start
+    assert segments[-1][1] == end
+    assert [inclusive for _, _, inclusive in segments] == [False, False, False, True]
+    for (_, left_end, _), (right_start, _, _) in zip(segments, segments[1:]):
+        assert left_end == right_start
+        assert (left_end.hour, left_end.minute) == (0, 0)
+
+
+def test_split_window_single_segment() -> None:
+    start = datetime(2026, 1, 1, tzinfo=UTC)
+    end = start + timedelta(hours=5)
+
+    assert split_window(start, end, 1) == [(start, end, True)]
+    assert len(split_window(start, end, 5)) == 5
+
+
+def test_merge_gmv_by_day_sums_shared_keys() -> None:
+    parts = [
+        [{"_id": {"day": "2026-01-02", "status": "paid"}, "orders": 2, "gmv": 20.0}],
+        [
+            {"_id": {"day": "2026-01-01", "status": "paid"}, "orders": 1, "gmv": 5.0},
+            {"_id": {"day": "2026-01-02", "status": "paid"}, "orders": 3, "gmv": 30.0},
+        ],
+    ]
+
+    assert merge_gmv_by_day(parts) == [
+        {"_id": {"day": "2026-01-01", "status": "paid"}, "orders": 1, "gmv": 5.0},
+        {"_id": {"day": "2026-01-02", "status": "paid"}, "orders": 5, "gmv": 50.0},
+    ]
+
+
+def test_merge_top_skus_merges_before_cut() -> None:
+    parts = [
+        [{"_id": "A", "units": 1, "revenue": 100.0}, {"_id": "B", "units": 1, "revenue": 90.0}],
+        [{"_id": "C", "units": 1, "revenue": 95.0}, {"_id": "B", "units": 1, "revenue": 90.0}],
+    ]
+
+    assert merge_top_skus(parts, limit=2) == [
+        {"_id": "B", "units": 2, "revenue": 180.0},
+        {"_id": "A", "units": 1, "revenue": 100.0},
+    ]
+
+
+def test_merge_country_channel_weights_averages_by_orders() -> None:
+    parts = [
+        [{"_id": "web", "orders": 1, "avg_check": 100.0, "high_risk_share": 1.0}],
+        [{"_id": "web", "orders": 3, "avg_check": 20.0, "high_risk_share": 0.0}],
+    ]
+
+    assert merge_country_channel(parts) == [
+        {"_id": "web", "orders": 4, "avg_check": 40.0, "high_risk_share": 0.25},
+    ]
+
+
+def rounded(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Segment partials are summed in a different order than one query sums the rows.
+    return [{key: round(value, 6) if isinstance(value, float) else value for key, value in row.items()} for row in rows]
+
+
+def orders_at(created_at: list[datetime]) -> list[dict[str, Any]]:
+    random.seed(31)
+    documents = []
+    for index, moment in enumerate(created_at):
+        document = build_order_document(index + 1)
+        document["order"]["created_at"] = moment
+        if index % 2 == 0:
+            document["customer"]["profile"]["geo"]["country"] = "US"
+        documents.append(document)
+    return documents
+
+
+@pytest.mark.parametrize(("method_name", "kwargs"), AGGREGATIONS)
+def test_parallel_segments_match_the_single_query(method_name: str, kwargs: dict[str, Any]) -> None:
+    mongomock = pytest.importorskip("mongomock")
+    start = datetime(2026, 1, 1, 13, 30, tzinfo=UTC)
+    end = start + timedelta(days=30)
+    cuts = [segment_start for segment_start, _, _ in split_window(start, end, 4)[1:]]
+    # Orders on every cut, on both ends of the window, just outside it and spread in between.
+    moments = [start, end, start - timedelta(milliseconds=1), end + timedelta(milliseconds=1)]
+    moments += cuts + [cut - timedelta(milliseconds=1) for cut in cuts]
+    moments += [start + timedelta(hours=7 * index) for index in range(100)]
+    db = mongomock.MongoClient().db
+    OrdersRepository(db, "orders", schema_version=1).replace_all(orders_at(moments))
+
+    single = getattr(OrdersRepository(db, "orders", schema_version=1), method_name)(start, end, **kwargs)
+    parallel = getattr(OrdersRepository(db, "orders", schema_version=1, parallel_segments=4), method_name)(
+        start, end, **kwargs
+    )
+
+    assert single
+    assert rounded(parallel) == rounded(single)
+
+
+@pytest.mark.parametrize(("method_name", "kwargs"), AGGREGATIONS)
+def test_parallel_segments_with_empty_segments_match_the_single_query(
+    method_name: str, kwargs: dict[str, Any]
+) -> None:
+    mongomock = pytest.importorskip("mongomock")
+    start = datetime(2026, 3, 1, tzinfo=UTC)
+    end = start + timedelta(days=20)
+    # Everything falls into the first of five segments; the other four return no rows.
+    db = mongomock.MongoClient().db
+    OrdersRepository(db, "orders", schema_version=1).replace_all(
+        orders_at([start + timedelta(hours=index) for index in range(60)])
+    )
+
+    single = getattr(OrdersRepository(db, "orders", schema_version=1), method_name)(start, end, **kwargs)
+    parallel = getattr(OrdersRepository(db, "orders", schema_version=1, parallel_segments=5), method_name)(
+        start, end, **kwargs
+    )
+    empty = getattr(OrdersRepository(db, "orders", schema_version=1, parallel_segments=5), method_name)(
+        end + timedelta(days=1), end + timedelta(days=9), **kwargs
+    )
+
+    assert single
+    assert rounded(parallel) == rounded(single)
+    assert empty == []
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+import redis
+
+from pubsub_fanout import FanoutSubscriber, Message
+
+
+class FakePubSub:
+    def __init__(self, events: list[dict], error: Exception | None = None) -> None:
+        self.events = events
+        self.error = error
+
+    async def psubscribe(self, *patterns: str) -> None:
+        pass
+
+    async def listen(self):
+        for event in self.events:
+            yield event
+        if self.error is not None:
+            raise self.error
+        await asyncio.Event().wait()
+
+    async def aclose(self) -> None:
+        pass
+
+
+class FakeClient:
+    def __init__(self, events: list[dict], error: Exception | None = None) -> None:
+        self.events = events
+        self.error = error
+
+    def pubsub(self) -> FakePubSub:
+        return FakePubSub(self.events, self.error)
+
+
+def pmessage(pattern: str, channel: str, data: str) -> dict:
+    return {"type": "pmessage", "pattern": pattern, "channel": channel, "data": data}
+
+
+def run_subscriber(subscriber: FanoutSubscriber) -> None:
+    async def run() -> None:
+        task = asyncio.create_task(subscriber.run())
+        await subscriber.wait_subscribed()
+        await asyncio.sleep(0.05)
+        subscriber.stop()
+        await task
+
+    asyncio.run(run())
+
+
+def test_batches_are_routed_by_pattern() -> None:
+    events = [
+        {"type": "psubscribe", "pattern": None, "channel": "orders:*", "data": 1},
+        pmessage("orders:*", "orders:paid", "1"),
+        pmessage("users:*", "users:new", "2"),
+        pmessage("orders:*", "orders:shipped", "3"),
+    ]
+    subscriber = FanoutSubscriber(FakeClient(events))
+    seen: dict[str, list[list[str]]] = {"orders": [], "users": []}
+
+    @subscriber.handler("orders:*")
+    async def orders(batch: list[Message]) -> None:
+        seen["orders"].append([message.data for message in batch])
+
+    @subscriber.handler("users:*")
+    async def users(batch: list[Message]) -> None:
+        seen["users"].append([message.data for message in batch])
+
+    run_subscriber(subscriber)
+
+    assert seen == {"orders": [["1", "3"]], "users": [["2"]]}
+    assert subscriber.metrics.snapshot()["delivered"] == 3
+
+
+def test_full_queue_drops_and_counts() -> None:
+    events = [pmessage("orders:*", "orders:paid", str(i)) for i in range(5)]
+    subscriber = FanoutSubscriber(FakeClient(events), queue_size=2, drop="newest")
+    delivered: list[str] = []
+
+    @subscriber.handler("orders:*")
+    async def collect(batch: list[Message]) -> None:
+        delivered.extend(message.data for message in batch)
+
+    run_subscriber(subscriber)
+
+    assert delivered == ["0", "1"]
+    assert subscriber.metrics.received == 5
+    assert subscriber.metrics.dropped == 3
+
+
+def test_lost_connection_ends_the_run_after_delivering_what_was_read() -> None:
+    events = [pmessage("orders:*", "orders:paid", str(i)) for i in range(3)]
+    subscriber = FanoutSubscriber(FakeClient(events, redis.ConnectionError("connection reset")))
+    delivered: list[str] = []
+
+    @subscriber.handler("orders:*")
+    async def collect(batch: list[Message]) -> None:
+        delivered.extend(message.data for message in batch)
+
+    with pytest.raises(redis.ConnectionError, match="connection reset"):
+        asyncio.run(asyncio.wait_for(subscriber.run(), timeout=2))
+    assert delivered == ["0", "1", "2"]
+
+
+def test_handler_errors_are_logged_once_per_interval(caplog: pytest.LogCaptureFixture) -> None:
+    events = [pmessage("orders:*", "orders:paid", str(i)) for i in range(6)]
+    subscriber = FanoutSubscriber(FakeClient(events), batch_size=1, batch_interval=0)
+    delivered: list[str] = []
+
+    @subscriber.handler("orders:*")
+    async def broken(batch: list[Message]) -> None:
+        raise ValueError(f"bad message {batch[0].data}")
+
+    @subscriber.handler("orders:*")
+    async def collect(batch: list[Message]) -> None:
+        delivered.extend(message.data for message in batch)
+
+    with caplog.at_level("ERROR", logger="pubsub_fanout"):
+        run_subscriber(subscriber)
+
+    assert delivered == [str(i) for i in range(6)]
+    assert subscriber.metrics.handler_errors == 6
+    assert len(caplog.records) == 1
+    assert "broken" in caplog.records[0].getMessage()
+    assert str(caplog.records[0].exc_info[1]) == "bad message 0"
+
+
+def test_suppressed_handler_errors_are_counted_in_the_next_report(caplog: pytest.LogCaptureFixture) -> None:
+    subscriber = FanoutSubscriber(FakeClient([]), error_log_interval=0.05)
+
+    async def broken(batch: list[Message]) -> None:
+        raise ValueError("bad message")
+
+    with caplog.at_level("ERROR", logger="pubsub_fanout"):
+        for _ in range(3):
+            subscriber._log_handler_error("orders:*", broken, ValueError("bad message"))
+        time.sleep(0.06)
+        subscriber._log_handler_error("orders:*", broken, ValueError("bad message"))
+
+    assert len(caplog.records) == 2
+    assert "2 more errors" in caplog.records[1].getMessage()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import pytest
+
+from queue_metrics import (
+    Histogram,
+    WorkerMetrics,
+    histogram_quantile,
+    merged_buckets,
+    parse_metrics,
+)
+
+
+def test_histogram_cumulative_buckets() -> None:
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [("0.1", 1), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+
+
+def test_histogram_quantile_interpolates_inside_bucket() -> None:
+    cumulative = [(0.1, 0), (0.2, 10), (float("inf"), 10)]
+
+    assert histogram_quantile(0.5, cumulative) == pytest.approx(0.15)
+    assert histogram_quantile(0.5, [(0.1, 0), (float("inf"), 0)]) is None
+
+
+def test_render_parses_back_and_merges_workers() -> None:
+    first, second = WorkerMetrics("demo:tasks"), WorkerMetrics("demo:tasks")
+    first.observe_task("upper", "ok", 0.0004, 0.002)
+    second.observe_task("upper", "ok", 0.003, None)
+    second.observe_task("sleep", "deferred", 0.0001, 0.5)
+    first.add_gauge("queue_worker_queue_depth", "Tasks waiting in the queue.", lambda: 7)
+
+    samples = parse_metrics(first.render())
+    for name, series in parse_metrics(second.render()).items():
+        samples.setdefault(name, []).extend(series)
+
+    totals: dict[tuple[str, str], float] = {}
+    for labels, value in samples["queue_worker_tasks_total"]:
+        key = (labels["type"], labels["status"])
+        totals[key] = totals.get(key, 0) + value
+    assert totals == {("upper", "ok"): 2, ("sleep", "deferred"): 1}
+    assert samples["queue_worker_queue_depth"] == [({"queue": "demo:tasks"}, 7.0)]
+    assert merged_buckets(samples, "queue_worker_handler_seconds", type="upper")[-1] == (float("inf"), 2)
+    assert merged_buckets(samples, "queue_worker_lag_seconds")[-1] == (float("inf"), 2)
+
+
+def test_every_metric_family_has_help_and_type() -> None:
+    metrics = WorkerMetrics("demo:tasks")
+    metrics.observe_task("upper", "ok", 0.001, 0.01)
+    metrics.add_gauge("queue_worker_queue_depth", "Tasks waiting in the queue.", lambda: 3)
+    metrics.add_gauge("queue_worker_delayed_depth", "Tasks parked in the delayed queue.", lambda: 1)
+    lines = metrics.render().splitlines()
+
+    samples = [line.split("{")[0] for line in lines if not line.startswith("#")]
+    families = {name.removesuffix("_bucket").removesuffix("_sum").removesuffix("_count") for name in samples}
+    assert families == {
+        "queue_worker_tasks_total",
+        "queue_worker_handler_seconds",
+        "queue_worker_lag_seconds",
+        "queue_worker_tasks_per_second",
+        "queue_worker_queue_depth",
+        "queue_worker_delayed_depth",
+    }
+    for family in families:
+        assert any(line.startswith(f"# HELP {family} ") for line in lines)
+        assert any(line.startswith(f"# TYPE {family} ") for line in lines)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import threading
+import time
+
+import pytest
+
+import queue_worker
+from queue_metrics import WorkerMetrics
+from task_codec import encode_task
+from task_queues import open_queue
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def worker_args(**overrides: object) -> argparse.Namespace:
+    defaults = {
+        "redis_url": "redis://stand-in",
+        "queue": "jobs",
+        "timeout": 1,
+        "mode": "thread",
+        "concurrency": 2,
+        "prefetch": 3,
+        "backend": "list",
+        "group": "workers",
+        "consumer": "worker-1",
+        "claim_idle_ms": 60000,
+        "claim_interval": 30.0,
+        "max_deliveries": 5,
+        "quiet": True,
+    }
+    return argparse.Namespace(**{**defaults, **overrides})
+
+
+class SlowHandler:
+    """Stands in for handle_task: takes a while and records how many calls overlapped."""
+
+    def __init__(self, seconds: float, stop_after: int = 0) -> None:
+        self.seconds = seconds
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+        # Set once stop_after calls have started, like a signal arriving mid-run.
+        self.stop = threading.Event()
+        self.stop_after = stop_after
+        self._lock = threading.Lock()
+
+    def __call__(self, task: dict) -> str:
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            self.calls += 1
+            if self.calls == self.stop_after:
+                self.stop.set()
+        time.sleep(self.seconds)
+        with self._lock:
+            self.running -= 1
+        return str(task["id"])
+
+
+def push_tasks(server: object, backend: str, count: int) -> None:
+    queue = open_queue(fakeredis.FakeRedis(server=server), backend, "jobs", consumer="producer")
+    queue.push_many([encode_task({"id": index, "type": "echo"}) for index in range(count)])
+
+
+@pytest.mark.parametrize("backend", ["list", "stream"])
+def test_pool_worker_drains_the_tasks_it_fetched_when_stopped(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(queue_worker, "get_client", lambda url: fakeredis.FakeRedis(server=server))
+    handler = SlowHandler(0.05, stop_after=3)
+    monkeypatch.setattr(queue_worker, "handle_task", handler)
+    push_tasks(server, backend, 20)
+
+    processed = queue_worker.run_pool(worker_args(backend=backend), WorkerMetrics("jobs"), handler.stop)
+
+    queue = open_queue(fakeredis.FakeRedis(server=server), backend, "jobs")
+    # Everything fetched before the stop ran and was acked; the rest is still queued.
+    assert 0 < processed < 20
+    assert processed + queue.depth() == 20
+    assert handler.peak == 2
+    if backend == "stream":
+        assert queue.client.xpending(queue.key, queue.group)["pending"] == 0
+
+
+def test_asyncio_worker_runs_handlers_concurrently(monkeypatch: pytest.MonkeyPatch) -> None:
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(queue_worker, "make_async_client", lambda url: fakeredis.FakeAsyncRedis(server=server))
+    handler = SlowHandler(0.1)
+    monkeypatch.setattr(queue_worker, "handle_task", handler)
+    push_tasks(server, "list", 6)
+
+    async def run() -> int:
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.6, stop.set)
+        return await queue_worker.run_asyncio(worker_args(mode="asyncio", concurrency=3), WorkerMetrics("jobs"), stop)
+
+    assert asyncio.run(run()) == 6
+    assert handler.peak == 3
+
+
+def poison_tasks() -> list[bytes]:
+    return [
+        encode_task({"id": 0, "type": "echo"}),
+        encode_task({"id": 1, "type": "sleep", "seconds": "soon"}),
+        encode_task({"id": 2, "type": "echo", "enqueued_at": "yesterday"}),
+        encode_task({"id": 3, "type": "echo"}),
+    ]
+
+
+def test_handler_errors_become_error_outcomes() -> None:
+    outcomes = [queue_worker.process_raw_task(raw_task) for raw_task in poison_tasks()]
+
+    assert [outcome.status for outcome in outcomes] == ["ok", "error", "ok", "ok"]
+    assert "ValueError" in outcomes[1].message
+    assert outcomes[2].lag_seconds is None
+
+
+@pytest.mark.parametrize("backend", ["list", "stream"])
+def test_pool_worker_acks_deliveries_whose_handler_failed(backend: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(queue_worker, "get_client", lambda url: fakeredis.FakeRedis(server=server))
+    queue = open_queue(fakeredis.FakeRedis(server=server), backend, "jobs", consumer="producer")
+    queue.push_many(poison_tasks())
+    stop = threading.Event()
+    threading.Timer(1.0, stop.set).start()
+    metrics = WorkerMetrics("jobs")
+
+    processed = queue_worker.run_pool(worker_args(backend=backend, prefetch=4), metrics, stop)
+
+    assert processed == 4
+    assert queue.depth() == 0
+    if backend == "stream":
+        assert queue.client.xpending(queue.key, queue.group)["pending"] == 0
+    assert 'type="sleep",status="error"} 1' in metrics.render()
+
+
+def test_asyncio_worker_survives_a_failing_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(queue_worker, "make_async_client", lambda url: fakeredis.FakeAsyncRedis(server=server))
+
+    def broken(raw_task: bytes) -> queue_worker.Outcome:
+        raise RuntimeError("worker process died")
+
+    monkeypatch.setattr(queue_worker, "process_raw_task", broken)
+    push_tasks(server, "list", 3)
+    metrics = WorkerMetrics("jobs")
+
+    async def run() -> int:
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.5, stop.set)
+        return await queue_worker.run_asyncio(worker_args(mode="asyncio"), metrics, stop)
+
+    assert asyncio.run(run()) == 3
+    assert 'type="unknown",status="error"} 3' in metrics.render()
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import redis
+import redis.asyncio as aioredis
+
+from redis_clients import AsyncAutoPipelineRedis, AutoPipelineRedis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def auto_pipeline_client(window: float) -> AutoPipelineRedis:
+    pool = redis.ConnectionPool(connection_class=fakeredis.FakeRedisConnection, server=fakeredis.FakeServer())
+    return AutoPipelineRedis(connection_pool=pool, auto_pipeline_window=window)
+
+
+def async_auto_pipeline_client() -> AsyncAutoPipelineRedis:
+    pool = aioredis.ConnectionPool(connection_class=fakeredis.FakeAsyncRedisConnection, server=fakeredis.FakeServer())
+    return AsyncAutoPipelineRedis(connection_pool=pool)
+
+
+def test_concurrent_threads_share_pipelines_and_get_their_own_replies() -> None:
+    client = auto_pipeline_client(window=0.02)
+    client.set("text", "not a number")
+    barrier = threading.Barrier(16)
+
+    def call(index: int) -> object:
+        barrier.wait()
+        try:
+            # Every fourth caller sends a command that fails; the others must not see its error.
+            return client.incr("text") if index % 4 == 0 else client.incrby(f"counter:{index}", index)
+        except redis.ResponseError as exc:
+            return exc
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(call, range(16)))
+
+    for index, result in enumerate(results):
+        if index % 4 == 0:
+            assert isinstance(result, redis.ResponseError)
+        else:
+            assert result == index
+    stats = client.auto_pipeline_stats
+    assert stats["commands"] == 17
+    assert stats["flushes"] < 17
+    assert client.get("counter:5") == b"5"
+
+
+def test_commands_awaited_together_share_one_pipeline() -> None:
+    async def run() -> tuple[list[object], dict[str, int]]:
+        client = async_auto_pipeline_client()
+        await client.set("text", "not a number")
+        results = await asyncio.gather(
+            *(client.incr("text") if index == 3 else client.incrby(f"counter:{index}", index) for index in range(10)),
+            return_exceptions=True,
+        )
+        stats = dict(client.auto_pipeline_stats)
+        await client.aclose()
+        return results, stats
+
+    results, stats = asyncio.run(run())
+    assert isinstance(results[3], redis.ResponseError)
+    assert [result for index, result in enumerate(results) if index != 3] == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    # The SET went out on its own; the ten gathered commands went out together.
+    assert stats == {"commands": 11, "flushes": 2}
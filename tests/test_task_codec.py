@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from task_codec import MAGIC, VERSION, decode_task, encode_task
+
+TASK = {"id": "t-1", "type": "upper", "payload": "héllo " * 20}
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_json_round_trip(compression: str) -> None:
+    raw = encode_task(TASK, "json", compression)
+
+    assert raw[:2] == MAGIC
+    assert raw[2] == VERSION
+    assert decode_task(raw) == TASK
+
+
+def test_msgpack_and_zstd_round_trip() -> None:
+    pytest.importorskip("msgpack")
+    pytest.importorskip("zstandard")
+
+    raw = encode_task(TASK, "msgpack", "zstd")
+
+    assert decode_task(raw) == TASK
+    assert len(raw) < len(encode_task(TASK))
+
+
+def test_legacy_json_tasks_still_decode() -> None:
+    legacy = json.dumps(TASK, ensure_ascii=True)
+
+    assert decode_task(legacy) == TASK
+    assert decode_task(legacy.encode()) == TASK
+
+
+def test_corrupt_payloads_raise_value_error() -> None:
+    raw = encode_task(TASK, "json", "zlib")
+
+    with pytest.raises(ValueError):
+        decode_task(raw[:-5])
+    with pytest.raises(ValueError):
+        decode_task(MAGIC + bytes([VERSION + 1, 0]) + b"{}")
+    with pytest.raises(ValueError):
+        encode_task(TASK, "xml")
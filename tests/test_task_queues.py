@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from queue_worker import RetryLater, handle_task, process_raw_task
+from task_codec import decode_task, encode_task
+from task_queues import DelayedQueue, ListQueue, StreamQueue
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_stream_ack_deletes_finished_entries() -> None:
+    queue = StreamQueue(fakeredis.FakeRedis(), "jobs", consumer="worker-1")
+    queue.ensure_group()
+    queue.push_many([b"a", b"b", b"c"])
+
+    deliveries = queue.fetch(3, timeout=0.1)
+    assert [raw_task for _, raw_task in deliveries] == [b"a", b"b", b"c"]
+    queue.ack([delivery_id for delivery_id, _ in deliveries[:2]])
+
+    assert queue.client.xlen(queue.key) == 1
+    assert queue.depth() == 1
+
+
+def test_entries_claimed_past_max_deliveries_go_to_the_dead_letter_stream() -> None:
+    client = fakeredis.FakeRedis()
+    crashed = StreamQueue(client, "jobs", consumer="crashed", max_deliveries=2)
+    crashed.ensure_group()
+    crashed.push(b"poison")
+    [(entry_id, _)] = crashed.fetch(1, timeout=0.1)
+
+    sweeper = StreamQueue(client, "jobs", consumer="sweeper", max_deliveries=2)
+    assert sweeper.claim_stale(0, 10) == [(entry_id, b"poison")]
+    assert sweeper.claim_stale(0, 10) == []
+
+    [(_, fields)] = client.xrange(sweeper.dead_key)
+    assert fields == {b"task": b"poison", b"id": entry_id, b"deliveries": b"3"}
+    assert client.xlen(sweeper.key) == 0
+    assert client.xpending(sweeper.key, sweeper.group)["pending"] == 0
+
+
+@pytest.mark.parametrize("backend", ["list", "stream"])
+def test_identical_delayed_tasks_are_each_moved_once_when_due(backend: str) -> None:
+    pytest.importorskip("lupa")
+    client = fakeredis.FakeRedis()
+    queue = ListQueue(client, "jobs") if backend == "list" else StreamQueue(client, "jobs", consumer="worker-1")
+    if backend == "stream":
+        queue.ensure_group()
+    delayed = DelayedQueue(queue)
+    delayed.schedule_many([b"same", b"same"], 0)
+    delayed.schedule(b"same", 0)
+    delayed.schedule(b"later", 60)
+    assert delayed.depth() == 4
+
+    moved, next_due = delayed.move_due()
+    assert moved == 3
+    assert next_due == pytest.approx(60, abs=1)
+    assert [raw_task for _, raw_task in queue.fetch(10, timeout=0.1)] == [b"same", b"same", b"same"]
+    assert delayed.depth() == 1
+
+
+def test_sleep_task_is_parked_until_its_wake_up_time() -> None:
+    with pytest.raises(RetryLater):
+        handle_task({"type": "sleep", "seconds": 1})
+
+    outcome = process_raw_task(encode_task({"id": 1, "type": "sleep", "seconds": 1}))
+    assert outcome.status == "deferred"
+    retry_task, delay_seconds = outcome.retry
+    task = decode_task(retry_task)
+    assert 0 < delay_seconds <= 1
+    assert task["wake_at"] == pytest.approx(time.time() + 1, abs=0.5)
+
+    # Back before its time, it is parked for the rest; once the wake-up time has passed, it completes.
+    assert process_raw_task(retry_task).status == "deferred"
+    task["wake_at"] = time.time() - 0.01
+    assert process_raw_task(encode_task(task)).status == "ok"